@@ -1,10 +1,17 @@
 from datetime import datetime
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from src.auth.service import TokenService
 from src.auth.schemas import TokenCreateSchema
+from src.api.responses import FastJSONResponse
 from src.api.schemas import ResponseData, ResponseOK
+from src.core import get_session, render_metrics
+from src.deadline import DeadlineMiddleware
 
-app = FastAPI()
+app = FastAPI(dependencies=[Depends(get_session)])
+
+# Stops work once the caller's X-Deadline-Ms budget has run out
+app.add_middleware(DeadlineMiddleware)
 
 
 @app.post("/api/v1/tokens", response_model=ResponseOK)
@@ -24,7 +31,7 @@ async def get_all_tokens(
     is_reboked: bool | None = None,
     limit: int | None = None,
     offset: int | None = None,
-) -> dict:
+) -> FastJSONResponse:
     filter = {
         k: v
         for k, v in {
@@ -45,7 +52,13 @@ async def get_all_tokens(
         limit = limit,
         offset = offset
     )
-    return {"success": True, "data": data}
+    return FastJSONResponse({"success": True, "data": data})
+
+@app.get("/api/v1/tokens/export")
+async def export_tokens(after_id: int | None = None) -> StreamingResponse:
+    return StreamingResponse(
+        TokenService.export(after_id=after_id), media_type="application/x-ndjson"
+    )
 
 @app.get("/api/v1/tokens/count", response_model=ResponseData)
 async def count_all_tokens() -> dict:
@@ -66,3 +79,7 @@ async def get_token_by_id(token_id: int) -> dict:
 async def delete_token_by_id(token_id: int) -> dict:
     await TokenService.delete(token_id=token_id)
     return {"success": True}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    return render_metrics()
@@ -1,6 +1,6 @@
 from sqlalchemy import delete, select, func, insert, update
 
-from src.core import async_session_factory
+from src.core import async_session_factory, session_scope
 from src.auth.models import Tokens
 
 
@@ -8,14 +8,14 @@ class TokensRepository:
     @classmethod
     async def add(cls, values: dict):
         stmt = insert(Tokens).values(**values)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             await session.execute(stmt)
             await session.commit()
 
     @classmethod
     async def get(cls, token_id: int):
         query = select(Tokens).where(Tokens.id == token_id)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             query_res = await session.execute(query)
             res = query_res.scalar_one()
         return res
@@ -28,16 +28,38 @@ class TokensRepository:
         limit: int | None = None,
         offset: int | None = None,
     ):
-        query = select(Tokens).filter_by(**filter).limit(limit).offset(offset)
-        async with async_session_factory() as session:
+        # TokenSchema is the whole table, so rows are read without ORM objects
+        query = (
+            select(*Tokens.__table__.c)
+            .filter_by(**filter)
+            .limit(limit)
+            .offset(offset)
+        )
+        async with session_scope() as session:
             query_res = await session.execute(query)
-            res = query_res.scalars().all()
+            res = query_res.mappings().all()
         return res
 
+    @classmethod
+    async def stream(cls, after_id: int | None = None, batch_size: int = 1000):
+        # Rows are pulled through a server-side cursor in batches, so the
+        # export never holds more than one batch in memory.
+        query = (
+            select(Tokens)
+            .order_by(Tokens.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if after_id is not None:
+            query = query.where(Tokens.id > after_id)
+        async with async_session_factory() as session:
+            result = await session.stream_scalars(query)
+            async for row in result:
+                yield row
+
     @classmethod
     async def count(cls) -> int | None:
         query = select(func.count(Tokens.id))
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             query_res = await session.execute(query)
             res = query_res.scalar_one_or_none()
         return res
@@ -45,13 +67,13 @@ class TokensRepository:
     @classmethod
     async def delete(cls, token_id: int):
         stmt = delete(Tokens).where(Tokens.id == token_id)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             await session.execute(stmt)
             await session.commit()
 
     @classmethod
     async def delete_all(cls):
         stmt = delete(Tokens)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             await session.execute(stmt)
             await session.commit()
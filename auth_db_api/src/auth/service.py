@@ -1,3 +1,4 @@
+from src.config import Settings
 from src.auth.repository import TokensRepository
 from src.auth.schemas import TokenCreateSchema, TokenSchema
 
@@ -21,12 +22,17 @@ class TokenService:
         offset: int | None = None,
     ):
         lst = await TokensRepository.list(filter, limit=limit, offset=offset)
-        res = []
-        for item in lst:
-            token = TokenSchema.model_validate(item, from_attributes=True)
-            res.append(token)
+        res = [dict(row) for row in lst]
         return res
 
+    @classmethod
+    async def export(cls, after_id: int | None = None):
+        async for item in TokensRepository.stream(
+            after_id, batch_size=Settings.EXPORT_BATCH_SIZE
+        ):
+            token = TokenSchema.model_validate(item, from_attributes=True)
+            yield token.model_dump_json() + "\n"
+
     @classmethod
     async def count(cls):
         res = await TokensRepository.count()
@@ -1,25 +1,124 @@
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    create_async_engine,
+    async_sessionmaker,
+)
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn, CreateIndex
 
 from src.config import Settings
+from src.metrics import Metrics
+
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            Metrics.inc("db_pool_wait_seconds_total", waited)
+            Metrics.set_max("db_pool_wait_seconds_max", waited)
 
-sync_engine = create_engine(
-    url=Settings.DB_SYNC_URL,
-)
-sync_session_factory = sessionmaker(sync_engine)
 
 async_engine = create_async_engine(
     url=Settings.DB_ASYNC_URL,
+    poolclass=MeteredPool,
+    pool_size=Settings.DB_POOL_SIZE,
+    max_overflow=Settings.DB_MAX_OVERFLOW,
+    pool_timeout=Settings.DB_POOL_TIMEOUT,
+    pool_recycle=Settings.DB_POOL_RECYCLE,
+    pool_pre_ping=Settings.DB_POOL_PRE_PING,
+    connect_args={"prepared_statement_cache_size": Settings.DB_STATEMENT_CACHE_SIZE},
 )
-async_session_factory = async_sessionmaker(async_engine)
+async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+@event.listens_for(async_engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    Metrics.inc("db_pool_checkouts_total")
+
+
+@event.listens_for(async_engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    Metrics.inc("db_pool_checkins_total")
+
+
+def render_metrics() -> str:
+    pool = async_engine.pool
+    Metrics.set("db_pool_size", pool.size())
+    Metrics.set("db_pool_checked_out", pool.checkedout())
+    Metrics.set("db_pool_overflow", pool.overflow())
+    return Metrics.render()
+
+
+request_session: ContextVar[AsyncSession | None] = ContextVar(
+    "request_session", default=None
+)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency that shares one session across a request"""
+    async with async_session_factory() as session:
+        token = request_session.set(session)
+        try:
+            yield session
+        finally:
+            request_session.reset(token)
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """Reuses the request session, or opens one outside of a request"""
+    session = request_session.get()
+    if session is not None:
+        yield session
+        return
+    async with async_session_factory() as session:
+        yield session
 
 class Base(DeclarativeBase):
     pass
 
-def tables_check():
-    inspector = inspect(sync_engine)
-    existing_tables = inspector.get_table_names()
+def upgrade_tables(conn):
+    """Adds the columns and indexes models gained after their table was made
+
+    create_all only creates missing tables. Whatever an existing table lacks
+    is added with IF NOT EXISTS, so replicas starting together do not trip
+    over each other; a new column must be nullable or have a server default.
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ADD COLUMN IF NOT EXISTS {ddl}"
+                    )
+                )
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
 
-    if not existing_tables:
-        Base.metadata.create_all(sync_engine)
+async def tables_check():
+    # Runs before the server starts serving, on its own event loop, so the
+    # connections it opened are dropped instead of being returned to the pool.
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_tables)
+    await async_engine.dispose()
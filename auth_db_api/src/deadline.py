@@ -0,0 +1,110 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+# Milliseconds the caller is still willing to wait for the response. A budget
+# rather than a timestamp, so clock skew between hosts does not matter.
+HEADER = "X-Deadline-Ms"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    """The request's deadline passed before its work could finish"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Deadline exceeded"
+        )
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current request's deadline, if it has one"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def propagate(timeout: float) -> Dict[str, str]:
+    """Headers passing a downstream call's `timeout` on as its deadline"""
+    return {HEADER: str(max(int(timeout * 1000), 1))}
+
+
+class DeadlineMiddleware:
+    """Cancels a request once its deadline passes and answers 504
+
+    The deadline comes from the X-Deadline-Ms header, raised to at least
+    MIN_BUDGET_MS, or `default` seconds when the caller sent none (no
+    deadline if `default` is None). Calls made while handling the request
+    see it through `remaining()`. Endless event streams are left alone.
+    """
+
+    EXEMPT = ("/health", "/metrics")
+    BODY = b'{"detail":"Deadline exceeded"}'
+    # Anyone can send the header, and a budget too short to do anything in
+    # would only turn requests into timeouts
+    MIN_BUDGET_MS = 100
+
+    def __init__(self, app, default: Optional[float] = None):
+        self.app = app
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        budget = self._budget(scope)
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        if budget <= 0:
+            await self._send_timeout(send)
+            return
+        started = False
+
+        async def send_started(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        token = _deadline.set(time.monotonic() + budget)
+        timeout = asyncio.timeout(budget)
+        try:
+            async with timeout:
+                await self.app(scope, receive, send_started)
+        except TimeoutError:
+            # Half a response cannot be taken back; the connection is dropped
+            if not timeout.expired() or started:
+                raise
+            await self._send_timeout(send)
+        finally:
+            _deadline.reset(token)
+
+    def _budget(self, scope) -> Optional[float]:
+        if (
+            scope["type"] != "http"
+            or scope["path"] in self.EXEMPT
+            or scope["path"].endswith(("/stream", "/events"))
+        ):
+            return None
+        for name, value in scope["headers"]:
+            if name == b"x-deadline-ms":
+                try:
+                    return max(int(value), self.MIN_BUDGET_MS) / 1000
+                except ValueError:
+                    break
+        return self.default
+
+    async def _send_timeout(self, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(self.BODY)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": self.BODY})
@@ -1,8 +1,14 @@
+import math
 from fastapi import FastAPI, Depends, Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from src.authenticator.schemas import RegisterSchema, LoginSchema, RefreshTokenSchema, TokenResponse, UserInfo
 from src.authenticator.service import AuthService
 from src.authenticator.middleware import get_current_user, get_current_user_optional
+from src.config import Settings
+from src.deadline import DeadlineMiddleware
+from src.metrics import Metrics
+from src.rate_limit import Limit, RateLimitMiddleware, get_client_ip, limiter
 
 app = FastAPI(
     title="Auth Service",
@@ -10,6 +16,23 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Deadlines, innermost so that shed and rate-limited requests skip them
+app.add_middleware(DeadlineMiddleware, default=Settings.REQUEST_DEADLINE_SECONDS)
+
+# Rate limiting; added before CORS so that 429 responses carry its headers
+app.add_middleware(
+    RateLimitMiddleware,
+    service="auth",
+    ip=Limit(Settings.RATE_LIMIT_IP_PER_SECOND, Settings.RATE_LIMIT_IP_BURST),
+    user=Limit(Settings.RATE_LIMIT_USER_PER_SECOND, Settings.RATE_LIMIT_USER_BURST),
+    paths={
+        path: Limit(
+            Settings.RATE_LIMIT_LOGIN_PER_SECOND, Settings.RATE_LIMIT_LOGIN_BURST
+        )
+        for path in ("/api/v1/auth/login", "/api/v1/auth/register")
+    },
+)
+
 # CORS settings
 app.add_middleware(
     CORSMiddleware,
@@ -20,24 +43,6 @@ app.add_middleware(
 )
 
 
-def get_client_ip(request: Request) -> str:
-    """Extracts the client's IP address from the request"""
-    # Check proxy headers
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
-    
-    real_ip = request.headers.get("X-Real-IP")
-    if real_ip:
-        return real_ip
-    
-    # Fallback to the direct client IP
-    if request.client:
-        return request.client.host
-    
-    return "unknown"
-
-
 def get_user_agent(request: Request) -> str:
     """Extracts the User-Agent from the request"""
     return request.headers.get("User-Agent", "unknown")
@@ -100,6 +105,18 @@ async def login(
     Raises:
         HTTPException: If credentials are invalid
     """
+    # Per account, before the password hash is checked
+    wait = await limiter.take(
+        f"rl:auth:account:{login_data.login.strip().lower()}",
+        Limit(Settings.RATE_LIMIT_ACCOUNT_PER_SECOND, Settings.RATE_LIMIT_ACCOUNT_BURST)
+    )
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
     ip_address = get_client_ip(request)
     user_agent = get_user_agent(request)
     
@@ -204,3 +221,9 @@ async def health_check():
     """Service health check"""
     return {"status": "healthy", "service": "auth-service"}
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Process-local counters in the Prometheus text format"""
+    return Metrics.render()
+
@@ -1,13 +1,13 @@
 import httpx
 from typing import Optional, Dict, Any, List
 from src.config import Settings
+from src.upstream import auth_db, users_db
+from src.authenticator.batching import BatchLoader
 
 
 class UsersDBClient:
     """HTTP client for interacting with users_db_api"""
 
-    BASE_URL = Settings.USERS_DB_API_URL
-
     @staticmethod
     async def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -19,12 +19,9 @@ class UsersDBClient:
         Returns:
             API response containing the created user
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{UsersDBClient.BASE_URL}/api/v1/users", json=user_data, timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await users_db.post("/api/v1/users", json=user_data)
+        response.raise_for_status()
+        return response.json()
 
     @staticmethod
     async def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
@@ -37,16 +34,33 @@ class UsersDBClient:
         Returns:
             User data or None if not found
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{UsersDBClient.BASE_URL}/api/v1/users/{user_id}", timeout=10.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("data") if data.get("success") else None
-            except httpx.HTTPStatusError:
-                return None
+        # Concurrent lookups are coalesced into one batchGet request
+        try:
+            return await _user_loader.load(user_id)
+        except httpx.HTTPStatusError:
+            return None
+
+    @staticmethod
+    async def get_users_by_ids(
+        user_ids: List[int], fields: List[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves up to 1000 users by ID in one request
+
+        Args:
+            user_ids: User IDs
+            fields: Columns to return (all if None)
+
+        Returns:
+            Users that were found, in the order of user_ids
+        """
+        response = await users_db.post(
+            "/api/v1/users:batchGet",
+            json={"ids": user_ids, "fields": fields},
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get("data", []) if data.get("success") else []
 
     @staticmethod
     async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
@@ -59,21 +73,19 @@ class UsersDBClient:
         Returns:
             User data or None if not found
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{UsersDBClient.BASE_URL}/api/v1/users",
-                    params={"email": email, "limit": 1},
-                    timeout=10.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                if data.get("success") and data.get("data"):
-                    users = data["data"]
-                    return users[0] if users else None
-                return None
-            except httpx.HTTPStatusError:
-                return None
+        try:
+            response = await users_db.get(
+                "/api/v1/users",
+                params={"email": email, "limit": 1},
+            )
+            response.raise_for_status()
+            data = response.json()
+            if data.get("success") and data.get("data"):
+                users = data["data"]
+                return users[0] if users else None
+            return None
+        except httpx.HTTPStatusError:
+            return None
 
     @staticmethod
     async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
@@ -86,21 +98,19 @@ class UsersDBClient:
         Returns:
             User data or None if not found
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{UsersDBClient.BASE_URL}/api/v1/users",
-                    params={"username": username, "limit": 1},
-                    timeout=10.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                if data.get("success") and data.get("data"):
-                    users = data["data"]
-                    return users[0] if users else None
-                return None
-            except httpx.HTTPStatusError:
-                return None
+        try:
+            response = await users_db.get(
+                "/api/v1/users",
+                params={"username": username, "limit": 1},
+            )
+            response.raise_for_status()
+            data = response.json()
+            if data.get("success") and data.get("data"):
+                users = data["data"]
+                return users[0] if users else None
+            return None
+        except httpx.HTTPStatusError:
+            return None
 
     @staticmethod
     async def update_user(user_id: int, user_data: Dict[str, Any]) -> bool:
@@ -114,21 +124,27 @@ class UsersDBClient:
         Returns:
             True if the update succeeded
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                # users_db_api has no PUT endpoint yet,
-                # so we need to extend the API or reuse existing methods later
-                # Returning False for now
-                return False
-            except httpx.HTTPStatusError:
-                return False
+        try:
+            # Only the given fields are written
+            response = await users_db.patch(
+                f"/api/v1/users/{user_id}", json=user_data
+            )
+            response.raise_for_status()
+            return response.json().get("success", False)
+        except httpx.HTTPStatusError:
+            return False
+
+
+_user_loader = BatchLoader(
+    UsersDBClient.get_users_by_ids,
+    window=Settings.USERS_BATCH_WINDOW_MS / 1000,
+    max_size=Settings.USERS_BATCH_MAX_SIZE,
+)
 
 
 class AuthDBClient:
     """HTTP client for interacting with auth_db_api"""
 
-    BASE_URL = Settings.AUTH_DB_API_URL
-
     @staticmethod
     async def create_token(token_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -140,12 +156,9 @@ class AuthDBClient:
         Returns:
             API response
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{AuthDBClient.BASE_URL}/api/v1/tokens", json=token_data, timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await auth_db.post("/api/v1/tokens", json=token_data)
+        response.raise_for_status()
+        return response.json()
 
     @staticmethod
     async def get_tokens_by_user_id(user_id: int) -> List[Dict[str, Any]]:
@@ -158,18 +171,16 @@ class AuthDBClient:
         Returns:
             List of token records
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{AuthDBClient.BASE_URL}/api/v1/tokens",
-                    params={"user_id": user_id},
-                    timeout=10.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("data", []) if data.get("success") else []
-            except httpx.HTTPStatusError:
-                return []
+        try:
+            response = await auth_db.get(
+                "/api/v1/tokens",
+                params={"user_id": user_id},
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data.get("data", []) if data.get("success") else []
+        except httpx.HTTPStatusError:
+            return []
 
     @staticmethod
     async def revoke_token(token_id: int) -> bool:
@@ -182,15 +193,12 @@ class AuthDBClient:
         Returns:
             True if the operation succeeded
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.delete(
-                    f"{AuthDBClient.BASE_URL}/api/v1/tokens/{token_id}", timeout=10.0
-                )
-                response.raise_for_status()
-                return True
-            except httpx.HTTPStatusError:
-                return False
+        try:
+            response = await auth_db.delete(f"/api/v1/tokens/{token_id}")
+            response.raise_for_status()
+            return True
+        except httpx.HTTPStatusError:
+            return False
 
     @staticmethod
     async def find_token_by_hash(refresh_token_hash: str) -> Optional[Dict[str, Any]]:
@@ -203,18 +211,16 @@ class AuthDBClient:
         Returns:
             Token data or None
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{AuthDBClient.BASE_URL}/api/v1/tokens",
-                    params={"refresh_token_hash": refresh_token_hash, "limit": 1},
-                    timeout=10.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                if data.get("success") and data.get("data"):
-                    tokens = data["data"]
-                    return tokens[0] if tokens else None
-                return None
-            except httpx.HTTPStatusError:
-                return None
+        try:
+            response = await auth_db.get(
+                "/api/v1/tokens",
+                params={"refresh_token_hash": refresh_token_hash, "limit": 1},
+            )
+            response.raise_for_status()
+            data = response.json()
+            if data.get("success") and data.get("data"):
+                tokens = data["data"]
+                return tokens[0] if tokens else None
+            return None
+        except httpx.HTTPStatusError:
+            return None
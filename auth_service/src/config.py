@@ -7,9 +7,61 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
     REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
     
+    # Shared with the gateway: a request carrying it in X-Gateway-Secret came
+    # through the gateway, so its X-Forwarded-For is the client's address
+    GATEWAY_SECRET = os.getenv("GATEWAY_SECRET", "")
+
     # URLs of other microservices
     AUTH_DB_API_URL = os.getenv("AUTH_DB_API_URL", "http://auth_db_api:8000")
     USERS_DB_API_URL = os.getenv("USERS_DB_API_URL", "http://users_db_api:8000")
     
     # Password hashing settings
     PASSWORD_HASH_ALGORITHM = "bcrypt"
+
+    # Single-user lookups arriving within this window go out as one batchGet
+    USERS_BATCH_WINDOW_MS = float(os.getenv("USERS_BATCH_WINDOW_MS", "2"))
+    USERS_BATCH_MAX_SIZE = int(os.getenv("USERS_BATCH_MAX_SIZE", "1000"))
+
+    # Token buckets: "memory://" counts per process, "redis://host:6379/0"
+    # shares the counts between replicas
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "memory://")
+    RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "100000"))
+    RATE_LIMIT_IP_PER_SECOND = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "20"))
+    RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "40"))
+    RATE_LIMIT_USER_PER_SECOND = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "10"))
+    RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+    # Login and registration each cost a bcrypt hash: a much smaller budget
+    # per address, and one per account against spread-out guessing
+    RATE_LIMIT_LOGIN_PER_SECOND = float(os.getenv("RATE_LIMIT_LOGIN_PER_SECOND", "0.2"))
+    RATE_LIMIT_LOGIN_BURST = float(os.getenv("RATE_LIMIT_LOGIN_BURST", "10"))
+    RATE_LIMIT_ACCOUNT_PER_SECOND = float(
+        os.getenv("RATE_LIMIT_ACCOUNT_PER_SECOND", "0.05")
+    )
+    RATE_LIMIT_ACCOUNT_BURST = float(os.getenv("RATE_LIMIT_ACCOUNT_BURST", "5"))
+
+    # Deadlines: a request without an X-Deadline-Ms header gets this budget,
+    # and each upstream call waits at most the smaller of it and
+    # UPSTREAM_TIMEOUT_SECONDS. Only a call that timed out after the full
+    # UPSTREAM_TIMEOUT_SECONDS counts against the breaker, so it is kept
+    # below the deadline.
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+    UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "5"))
+    UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    # Idle pooled connections are dropped before the upstream's 5s keep-alive
+    # closes them, so a request never goes out on a socket being shut
+    UPSTREAM_KEEPALIVE_SECONDS = float(os.getenv("UPSTREAM_KEEPALIVE_SECONDS", "2"))
+    # Circuit breakers: open after this many failures in a row, probe again
+    # after BREAKER_OPEN_SECONDS
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "5"))
+
+    # Serving mode
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+    SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(
+        os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "25")
+    )
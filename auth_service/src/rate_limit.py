@@ -0,0 +1,232 @@
+import hmac
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.requests import Request
+
+from src.config import Settings
+from src.metrics import Metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class Limit:
+    """Token bucket: refills `rate` tokens a second and holds at most `burst`"""
+
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+
+
+class Limiter(ABC):
+    """Store of token buckets that RateLimitMiddleware draws from"""
+
+    @abstractmethod
+    async def take(self, key: str, limit: Limit) -> float:
+        """Takes a token; returns 0, or how many seconds until one is due"""
+
+
+class MemoryLimiter(Limiter):
+    """Process-local buckets, the default when no Redis is configured"""
+
+    def __init__(self, max_keys: int):
+        self._max_keys = max_keys
+        # key -> (tokens, monotonic time they were counted at); the least
+        # recently used bucket goes first, and it has refilled the longest
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, limit: Limit) -> float:
+        now = time.monotonic()
+        tokens, stamp = self._buckets.pop(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - stamp) * limit.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / limit.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisLimiter(Limiter):
+    """Buckets shared by every replica, updated atomically by a script"""
+
+    # Redis' own clock keeps replicas with skewed clocks from minting tokens
+    SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] + clock[2] / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(bucket[1]) or burst
+local stamp = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'stamp', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        # Imported here so the in-memory default works without redis installed
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._failing = False
+
+    async def take(self, key: str, limit: Limit) -> float:
+        try:
+            wait = float(await self._script(keys=[key], args=[limit.rate, limit.burst]))
+        except Exception as e:
+            # An unreachable store must not take the service down with it
+            Metrics.inc("rate_limit_errors_total")
+            if not self._failing:
+                logger.warning("Rate limit store failed, letting requests in: %s", e)
+            self._failing = True
+            return 0.0
+        if self._failing:
+            logger.warning("Rate limit store is back")
+        self._failing = False
+        return wait
+
+
+def create_limiter(url: str) -> Limiter:
+    if url.startswith("memory://"):
+        return MemoryLimiter(Settings.RATE_LIMIT_MEMORY_MAX_KEYS)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisLimiter(url)
+    raise ValueError(f"Unsupported RATE_LIMIT_URL: {url}")
+
+
+limiter = create_limiter(Settings.RATE_LIMIT_URL)
+
+
+def from_gateway(request: Request) -> bool:
+    """Whether the request carries the gateway's secret"""
+    secret = request.headers.get("X-Gateway-Secret")
+    if not Settings.GATEWAY_SECRET or secret is None:
+        return False
+    return hmac.compare_digest(secret.encode(), Settings.GATEWAY_SECRET.encode())
+
+
+def get_client_ip(request: Request) -> str:
+    """Extracts the client's IP address from the request"""
+    # Anyone can send X-Forwarded-For, and a new address each time would be a
+    # fresh bucket each time; only the hop the gateway appended is believed
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for and from_gateway(request):
+        return forwarded_for.split(",")[-1].strip()
+
+    if request.client:
+        return request.client.host
+
+    return "unknown"
+
+
+# Verified tokens -> (user_id, expiry); a client sends the same token on
+# every request, and checking its signature costs more than the bucket
+_verified: OrderedDict[str, Tuple[Optional[int], float]] = OrderedDict()
+VERIFIED_MAX_TOKENS = 10000
+
+
+def get_token_user_id(request: Request) -> Optional[int]:
+    """user_id of a valid access token in the request, if there is one"""
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    entry = _verified.get(token)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    try:
+        payload = jwt.decode(
+            token, Settings.JWT_SECRET_KEY, algorithms=[Settings.JWT_ALGORITHM]
+        )
+    except JWTError:
+        return None
+    user_id = payload.get("user_id") if payload.get("type") == "access" else None
+    _verified[token] = (user_id, payload.get("exp", math.inf))
+    if len(_verified) > VERIFIED_MAX_TOKENS:
+        _verified.popitem(last=False)
+    return user_id
+
+
+class RateLimitMiddleware:
+    """Answers 429 before routing once a client's token bucket runs dry
+
+    Every request draws from a bucket for its client IP and, when it carries
+    a valid access token, one for its user, so neither rotating tokens from
+    one address nor spreading one account over many addresses gets around
+    the limits. `paths` adds a stricter per-IP bucket for expensive routes.
+    """
+
+    EXEMPT = ("/health", "/metrics")
+    BODY = b'{"detail":"Too many requests"}'
+
+    def __init__(
+        self,
+        app,
+        service: str,
+        ip: Limit,
+        user: Limit,
+        paths: Optional[Dict[str, Limit]] = None,
+    ):
+        self.app = app
+        self.service = service
+        self.ip = ip
+        self.user = user
+        self.paths = paths or {}
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not Settings.RATE_LIMIT_ENABLED
+            or scope["path"] in self.EXEMPT
+        ):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        ip = get_client_ip(request)
+        checks = []
+        path_limit = self.paths.get(scope["path"])
+        if path_limit is not None:
+            checks.append((f"path:{scope['path']}:{ip}", path_limit))
+        checks.append((f"ip:{ip}", self.ip))
+        user_id = get_token_user_id(request)
+        if user_id is not None:
+            checks.append((f"user:{user_id}", self.user))
+        for key, limit in checks:
+            wait = await limiter.take(f"rl:{self.service}:{key}", limit)
+            if wait:
+                Metrics.inc("rate_limited_total", bucket=key.split(":", 1)[0])
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 429,
+                        "headers": [
+                            (b"content-type", b"application/json"),
+                            (b"content-length", str(len(self.BODY)).encode()),
+                            (b"retry-after", str(math.ceil(wait)).encode()),
+                        ],
+                    }
+                )
+                await send({"type": "http.response.body", "body": self.BODY})
+                return
+        await self.app(scope, receive, send)
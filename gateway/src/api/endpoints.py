@@ -0,0 +1,68 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from src.gateway.identity import get_token_user_id
+from src.gateway.proxy import forward
+from src.gateway.schemas import ProfileSchema
+from src.gateway.service import GatewayService
+from src.deadline import DeadlineMiddleware
+from src.upstream import aclose_pool
+from src.config import Settings
+from src.metrics import Metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await aclose_pool()
+
+
+app = FastAPI(
+    title="API Gateway",
+    description="Single entry point for the auth, posts and users services",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+# Deadlines; what is left of them is passed on to the services
+app.add_middleware(DeadlineMiddleware, default=Settings.REQUEST_DEADLINE_SECONDS)
+
+# CORS settings
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Specify concrete domains in production
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@app.get("/api/v1/profiles/{user_id}", response_model=ProfileSchema)
+async def get_profile(request: Request, user_id: int):
+    """Retrieves a user's profile page: user, counters and latest posts"""
+    return await GatewayService.get_profile(
+        request, user_id, get_token_user_id(request)
+    )
+
+
+@app.api_route(
+    "/api/v1/{path:path}",
+    methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"],
+    include_in_schema=False,
+)
+async def proxy(request: Request):
+    """Routes everything else to the service that serves it"""
+    return await forward(request)
+
+
+@app.get("/health")
+async def health_check():
+    """Service health check"""
+    return {"status": "healthy", "service": "gateway"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Process-local counters in the Prometheus text format"""
+    return Metrics.render()
@@ -0,0 +1,46 @@
+import os
+
+
+class Settings:
+    # URLs of the services behind the gateway
+    AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth_service:8000")
+    POSTS_SERVICE_URL = os.getenv("POSTS_SERVICE_URL", "http://posts_service:8000")
+    USERS_SERVICE_URL = os.getenv("USERS_SERVICE_URL", "http://users_service:8000")
+
+    # JWT settings for token validation
+    JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
+    JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+
+    # Shared with the services: requests carrying it name their user in
+    # X-User-Id, so a token is verified once here. Empty passes tokens on.
+    GATEWAY_SECRET = os.getenv("GATEWAY_SECRET", "")
+
+    # Deadlines: a request without an X-Deadline-Ms header gets this budget,
+    # and each upstream call waits at most the smaller of it and
+    # UPSTREAM_TIMEOUT_SECONDS. Only a call that timed out after the full
+    # UPSTREAM_TIMEOUT_SECONDS counts against the breaker, so it is kept
+    # below the deadline.
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+    UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "8"))
+    # Size of the one keep-alive pool shared by all upstreams
+    UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "300"))
+    # Idle pooled connections are dropped before the upstream's 5s keep-alive
+    # closes them, so a request never goes out on a socket being shut
+    UPSTREAM_KEEPALIVE_SECONDS = float(os.getenv("UPSTREAM_KEEPALIVE_SECONDS", "2"))
+    # Circuit breakers: open after this many failures in a row, probe again
+    # after BREAKER_OPEN_SECONDS
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "5"))
+
+    # Aggregated profile page
+    PROFILE_POSTS_LIMIT = int(os.getenv("PROFILE_POSTS_LIMIT", "10"))
+
+    # Serving mode
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+    SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(
+        os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "25")
+    )
@@ -0,0 +1,56 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.requests import Request
+
+from src.config import Settings
+
+# Headers the services trust only alongside the gateway's secret; whatever a
+# client sends under these names is dropped before the request goes on
+USER_ID_HEADER = "X-User-Id"
+SECRET_HEADER = "X-Gateway-Secret"
+
+# Verified tokens -> (user_id, expiry); a client sends the same token on
+# every request, and checking its signature is the costly part
+_verified: OrderedDict[str, Tuple[Optional[int], float]] = OrderedDict()
+VERIFIED_MAX_TOKENS = 10000
+
+
+def get_token_user_id(request: Request) -> Optional[int]:
+    """user_id of a valid access token in the request, if there is one"""
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    entry = _verified.get(token)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    try:
+        payload = jwt.decode(
+            token, Settings.JWT_SECRET_KEY, algorithms=[Settings.JWT_ALGORITHM]
+        )
+    except JWTError:
+        return None
+    user_id = payload.get("user_id") if payload.get("type") == "access" else None
+    _verified[token] = (user_id, payload.get("exp", math.inf))
+    if len(_verified) > VERIFIED_MAX_TOKENS:
+        _verified.popitem(last=False)
+    return user_id
+
+
+def identity_headers(user_id: Optional[int]) -> dict:
+    """Headers vouching for the request, and for `user_id` if there is one
+
+    The secret goes on every request, signed in or not, so the services
+    also believe the client address the gateway puts in X-Forwarded-For.
+    """
+    if not Settings.GATEWAY_SECRET:
+        return {}
+    if user_id is None:
+        return {SECRET_HEADER: Settings.GATEWAY_SECRET}
+    return {USER_ID_HEADER: str(user_id), SECRET_HEADER: Settings.GATEWAY_SECRET}
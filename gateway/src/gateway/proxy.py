@@ -0,0 +1,115 @@
+import re
+from typing import List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException, status
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from src.gateway.identity import (
+    SECRET_HEADER,
+    USER_ID_HEADER,
+    get_token_user_id,
+    identity_headers,
+)
+from src.metrics import Metrics
+from src.upstream import Upstream, auth_service, posts_service, users_service
+
+# First match wins, so a user's posts go to posts_service before the rest of
+# /users goes to users_service
+ROUTES: List[Tuple[re.Pattern, Upstream]] = [
+    (re.compile(r"/api/v1/auth(/|$)"), auth_service),
+    (re.compile(r"/api/v1/users/[^/]+/posts(/|$)"), posts_service),
+    (re.compile(r"/api/v1/(posts|notifications|media)(/|$)"), posts_service),
+    (re.compile(r"/api/v1/users(/|$)"), users_service),
+]
+
+# Hop-by-hop headers belong to one connection and are not passed on
+HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+# Set again by the gateway itself: the pool's host, the deadline it has left,
+# the client address it saw, and the identity it verified. CORS is answered
+# here, so the services never see an Origin.
+REPLACED = {
+    "host",
+    "origin",
+    "x-deadline-ms",
+    "x-forwarded-for",
+    "x-real-ip",
+    USER_ID_HEADER.lower(),
+    SECRET_HEADER.lower(),
+}
+# Written by the gateway's own server on the way back
+REPLACED_IN_RESPONSE = {"date", "server"}
+
+
+def resolve(path: str) -> Optional[Upstream]:
+    """The service that serves `path`, if any does"""
+    for pattern, upstream in ROUTES:
+        if pattern.match(path):
+            return upstream
+    return None
+
+
+def forwarded_headers(request: Request, user_id: Optional[int]) -> httpx.Headers:
+    """The client's request headers as the services should see them"""
+    headers = httpx.Headers(
+        [
+            (name, value)
+            for name, value in request.headers.items()
+            if name not in HOP_BY_HOP and name not in REPLACED
+        ]
+    )
+    # Bodies are relayed as they come, so the services may only compress them
+    # for a client that asked; httpx would otherwise offer its own codings
+    headers.setdefault("Accept-Encoding", "identity")
+    # The gateway is the edge, so the address it saw is the client's own
+    if request.client:
+        headers["X-Forwarded-For"] = request.client.host
+    headers.update(identity_headers(user_id))
+    return headers
+
+
+async def forward(request: Request) -> StreamingResponse:
+    """Relays a request to its service and streams the answer back"""
+    upstream = resolve(request.url.path)
+    if upstream is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    user_id = None
+    if upstream is not auth_service:
+        # Tokens for auth_service (refresh, logout) are its own business
+        user_id = get_token_user_id(request)
+    headers = forwarded_headers(request, user_id)
+    has_body = "content-length" in headers or "transfer-encoding" in request.headers
+    response = await upstream.request(
+        request.method,
+        request.url.path,
+        headers=headers,
+        params=request.url.query,
+        content=request.stream() if has_body else None,
+        stream=True,
+    )
+    Metrics.inc(
+        "gateway_requests_total",
+        upstream=upstream.name,
+        status=f"{response.status_code // 100}xx",
+    )
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers={
+            name: value
+            for name, value in response.headers.items()
+            if name not in HOP_BY_HOP and name not in REPLACED_IN_RESPONSE
+        },
+        background=BackgroundTask(response.aclose),
+    )
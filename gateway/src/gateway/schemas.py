@@ -0,0 +1,23 @@
+from typing import Any, Dict, List
+from pydantic import BaseModel
+
+
+class ProfileStatsSchema(BaseModel):
+    """Counters shown on a profile page"""
+
+    followers_count: int = 0
+    following_count: int = 0
+    posts_count: int = 0
+
+
+class ProfileSchema(BaseModel):
+    """Profile page: the user, their counters and their latest posts
+
+    `user` and `posts` are passed on as the users and posts services return
+    them; `unread_notifications` is only filled in on one's own profile.
+    """
+
+    user: Dict[str, Any]
+    stats: ProfileStatsSchema
+    posts: List[Dict[str, Any]]
+    unread_notifications: int | None = None
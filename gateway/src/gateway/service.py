@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Optional
+
+import httpx
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.config import Settings
+from src.gateway.proxy import forwarded_headers
+from src.gateway.schemas import ProfileSchema, ProfileStatsSchema
+from src.upstream import posts_service, users_service
+
+
+class GatewayService:
+    """Service for pages aggregated from several services"""
+
+    @staticmethod
+    def _json(response: httpx.Response) -> Any:
+        """Body of a successful answer; a failed one fails the whole page"""
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail")
+            except ValueError:
+                detail = response.text
+            retry_after = response.headers.get("Retry-After")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=detail,
+                headers={"Retry-After": retry_after} if retry_after else None,
+            )
+        return response.json()
+
+    @staticmethod
+    async def get_profile(
+        request: Request, user_id: int, viewer_id: Optional[int]
+    ) -> ProfileSchema:
+        """Retrieves a profile page, calling the services concurrently"""
+        headers = forwarded_headers(request, viewer_id)
+        calls = [
+            users_service.get(f"/api/v1/users/{user_id}", headers=headers),
+            posts_service.get(
+                f"/api/v1/users/{user_id}/posts",
+                headers=headers,
+                params={"limit": Settings.PROFILE_POSTS_LIMIT},
+            ),
+            users_service.get(
+                f"/api/v1/users/{user_id}/follows/count", headers=headers
+            ),
+            posts_service.get(f"/api/v1/users/{user_id}/posts/count", headers=headers),
+        ]
+        if viewer_id == user_id:
+            calls.append(
+                posts_service.get("/api/v1/notifications/unread_count", headers=headers)
+            )
+        # Let every call finish before failing, so none is left running
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        user, posts, follows, posts_count, *unread = [
+            GatewayService._json(result) for result in results
+        ]
+
+        return ProfileSchema(
+            user=user,
+            stats=ProfileStatsSchema(**follows, **posts_count),
+            posts=posts,
+            unread_notifications=unread[0]["unread_count"] if unread else None,
+        )
@@ -0,0 +1,19 @@
+import uvicorn
+from src.config import Settings
+from src.api.endpoints import app
+
+
+def main():
+    uvicorn.run(
+        "src.main:app",
+        host=Settings.SERVER_HOST,
+        port=Settings.SERVER_PORT,
+        workers=Settings.SERVER_WORKERS,
+        loop=Settings.SERVER_LOOP,
+        http=Settings.SERVER_HTTP,
+        timeout_graceful_shutdown=Settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
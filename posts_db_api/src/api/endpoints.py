@@ -1,10 +1,40 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import List
-from fastapi import FastAPI
-from src.posts.schemas import PostSchema
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from src.posts.schemas import LikeSchema, PostSchema, PostUpdateSchema
+from src.posts.models import Posts
 from src.posts.service import PostService
+from src.notifications.schemas import MarkReadSchema
+from src.notifications.service import NotificationService
+from src.outbox.service import OutboxService
+from src.api.fields import fields_param
+from src.api.responses import FastJSONResponse
 from src.api.schemas import ResponseData, ResponseOK
+from src.config import Settings
+from src.core import get_session, render_metrics
+from src.deadline import DeadlineMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [
+        asyncio.create_task(PostService.purge_tombstones_periodically()),
+        asyncio.create_task(OutboxService.listen()),
+        asyncio.create_task(OutboxService.relay()),
+    ]
+    if Settings.NOTIFICATIONS_ENABLED:
+        tasks.append(asyncio.create_task(NotificationService.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+
+
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(get_session)])
+
+# Stops work once the caller's X-Deadline-Ms budget has run out
+app.add_middleware(DeadlineMiddleware)
 
 
 @app.post("/api/v1/posts", response_model=ResponseOK)
@@ -12,6 +42,11 @@ async def add_post(new_post: PostSchema) -> dict:
     await PostService.add(new_post)
     return {"success": True}
 
+@app.post("/api/v1/posts/bulk", response_model=ResponseData)
+async def bulk_add_posts(request: Request) -> dict:
+    data = await PostService.bulk_add(request.stream())
+    return {"success": True, "data": data}
+
 @app.get("/api/v1/posts", response_model=ResponseData)
 async def get_all_posts(
     author_id: int | None = None,
@@ -24,7 +59,9 @@ async def get_all_posts(
     is_visible: bool | None = None,
     limit: int | None = None,
     offset: int | None = None,
-) -> dict:
+    fields: List[str] | None = Depends(fields_param(Posts.__table__)),
+    with_counts: bool = False,
+) -> FastJSONResponse:
     data = await PostService.list(
         author_id = author_id,
         parent_post_id = parent_post_id,
@@ -35,13 +72,21 @@ async def get_all_posts(
         is_deleted = is_deleted,
         is_visible = is_visible,
         limit = limit,
-        offset = offset
+        offset = offset,
+        fields = fields,
+        with_counts = with_counts,
+    )
+    return FastJSONResponse({"success": True, "data": data})
+
+@app.get("/api/v1/posts/export")
+async def export_posts(after_id: int | None = None) -> StreamingResponse:
+    return StreamingResponse(
+        PostService.export(after_id=after_id), media_type="application/x-ndjson"
     )
-    return {"success": True, "data": data}
 
 @app.get("/api/v1/posts/count", response_model=ResponseData)
-async def count_all_posts() -> dict:
-    count = await PostService.count()
+async def count_all_posts(author_id: int | None = None) -> dict:
+    count = await PostService.count(author_id)
     return {"success": True, "data": count}
 
 
@@ -51,10 +96,44 @@ async def get_post_by_id(post_id: int) -> dict:
     return {"success": True, "data": data}
 
 @app.get("/api/v1/posts/{post_id}/comments", response_model=ResponseData)
-async def get_comments(post_id: int) -> dict:
-    data = await PostService.get_comments(post_id)
+async def get_comments(post_id: int, with_counts: bool = False) -> FastJSONResponse:
+    data = await PostService.get_comments(post_id, with_counts=with_counts)
+    return FastJSONResponse({"success": True, "data": data})
+
+@app.get("/api/v1/posts/{post_id}/thread", response_model=ResponseData)
+async def get_thread(
+    post_id: int,
+    depth: int = Query(default=10, ge=1, le=50),
+    breadth: int = Query(default=50, ge=1, le=200),
+    cursor: int | None = None,
+) -> dict:
+    data = await PostService.get_thread(
+        post_id, depth=depth, breadth=breadth, cursor=cursor
+    )
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+        )
     return {"success": True, "data": data}
 
+@app.patch("/api/v1/posts/{post_id}", response_model=ResponseData)
+async def update_post(post_id: int, changes: PostUpdateSchema) -> dict:
+    post, current = await PostService.update(post_id, changes)
+    if post is not None:
+        return {"success": True, "data": post}
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+        )
+    if current["author_id"] != changes.author_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not the author of the post"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Post is at version {current['version']}",
+    )
+
 @app.delete("/api/v1/posts", response_model=ResponseOK)
 async def delete_all_posts() -> dict:
     await PostService.delete_all()
@@ -64,3 +143,54 @@ async def delete_all_posts() -> dict:
 async def delete_post_by_id(post_id: int) -> dict:
     await PostService.delete(post_id=post_id)
     return {"success": True}
+
+@app.post("/api/v1/posts/{post_id}/likes", response_model=ResponseData)
+async def like_post(post_id: int, like: LikeSchema) -> dict:
+    liked = await PostService.like(post_id, like.user_id)
+    if liked is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+        )
+    return {"success": True, "data": liked}
+
+@app.delete("/api/v1/posts/{post_id}/likes/{user_id}", response_model=ResponseData)
+async def unlike_post(post_id: int, user_id: int) -> dict:
+    unliked = await PostService.unlike(post_id, user_id)
+    return {"success": True, "data": unliked}
+
+@app.get("/api/v1/users/{user_id}/notifications", response_model=ResponseData)
+async def get_notifications(
+    user_id: int,
+    cursor: int | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+) -> FastJSONResponse:
+    data = await NotificationService.list(user_id, cursor=cursor, limit=limit)
+    return FastJSONResponse({"success": True, "data": data})
+
+@app.get(
+    "/api/v1/users/{user_id}/notifications/unread_count", response_model=ResponseData
+)
+async def get_unread_notifications_count(user_id: int) -> dict:
+    count = await NotificationService.unread_count(user_id)
+    return {"success": True, "data": count}
+
+@app.post("/api/v1/users/{user_id}/notifications/read", response_model=ResponseData)
+async def mark_notifications_read(user_id: int, body: MarkReadSchema) -> dict:
+    read = await NotificationService.mark_read(user_id, up_to=body.up_to)
+    return {"success": True, "data": read}
+
+@app.get("/api/v1/events")
+async def stream_events(
+    after: int | None = None,
+    last_event_id: int | None = Header(default=None),
+) -> StreamingResponse:
+    # A reconnecting EventSource sends Last-Event-ID, which wins over `after`
+    return StreamingResponse(
+        OutboxService.stream(last_event_id if last_event_id is not None else after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    return render_metrics()
@@ -0,0 +1,39 @@
+from typing import Iterable, List
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Table
+
+
+def project(table: Table, requested: Iterable[str]) -> List[str]:
+    """Checks requested names against `table` and returns them in table order"""
+    columns = list(table.c.keys())
+    requested = set(requested)
+    unknown = requested.difference(columns)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    # `id` is always part of a projection.
+    requested.add("id")
+    return [name for name in columns if name in requested]
+
+
+def fields_param(table: Table):
+    """Query dependency resolving `fields=a,b` to column names of `table`"""
+    columns = list(table.c.keys())
+
+    def parse(
+        fields: str | None = Query(
+            default=None,
+            description=f"Comma-separated subset of: {', '.join(columns)}",
+        ),
+    ) -> List[str] | None:
+        # No parameter means every column.
+        if fields is None:
+            return None
+        return project(
+            table, (name.strip() for name in fields.split(",") if name.strip())
+        )
+
+    return parse
@@ -7,5 +7,57 @@ class Settings:
     DB_HOST = os.environ["DB_HOST"]
     DB_PORT = os.environ["DB_PORT"]
 
-    DB_SYNC_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     DB_ASYNC_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+    TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+    TOMBSTONE_PURGE_BATCH_SIZE = int(os.getenv("TOMBSTONE_PURGE_BATCH_SIZE", "500"))
+    TOMBSTONE_PURGE_INTERVAL_SECONDS = int(
+        os.getenv("TOMBSTONE_PURGE_INTERVAL_SECONDS", "3600")
+    )
+
+    BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    OUTBOX_RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", "1000"))
+    OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+    OUTBOX_READ_BATCH_SIZE = int(os.getenv("OUTBOX_READ_BATCH_SIZE", "500"))
+    OUTBOX_HEARTBEAT_SECONDS = float(os.getenv("OUTBOX_HEARTBEAT_SECONDS", "15"))
+    OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", "72"))
+    OUTBOX_PURGE_INTERVAL_SECONDS = int(
+        os.getenv("OUTBOX_PURGE_INTERVAL_SECONDS", "600")
+    )
+
+    # Notifications are built from this API's change feed and the follows in
+    # users_db_api's; an empty URL leaves follows out
+    USERS_DB_API_URL = os.getenv("USERS_DB_API_URL", "http://users_db_api:8000")
+    NOTIFICATIONS_ENABLED = os.getenv("NOTIFICATIONS_ENABLED", "true").lower() == "true"
+    NOTIFICATIONS_WINDOW_SECONDS = float(os.getenv("NOTIFICATIONS_WINDOW_SECONDS", "2"))
+    NOTIFICATIONS_MAX_PENDING = int(os.getenv("NOTIFICATIONS_MAX_PENDING", "10000"))
+    NOTIFICATIONS_ACTORS_KEPT = int(os.getenv("NOTIFICATIONS_ACTORS_KEPT", "3"))
+    NOTIFICATIONS_WRITE_BATCH_SIZE = int(
+        os.getenv("NOTIFICATIONS_WRITE_BATCH_SIZE", "1000")
+    )
+    NOTIFICATIONS_LEADER_RETRY_SECONDS = float(
+        os.getenv("NOTIFICATIONS_LEADER_RETRY_SECONDS", "5")
+    )
+    NOTIFICATIONS_FEED_READ_TIMEOUT_SECONDS = float(
+        os.getenv("NOTIFICATIONS_FEED_READ_TIMEOUT_SECONDS", "45")
+    )
+
+    # Serving mode
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+    SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(
+        os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "25")
+    )
@@ -1,11 +1,22 @@
+import asyncio
 import uvicorn
+from src.config import Settings
 from src.core import tables_check
 from src.api.endpoints import app
 
 
 def main():
-    tables_check()
-    uvicorn.run("src.main:app", host="0.0.0.0", port=8000)
+    # Runs once in the supervisor process; workers only import `app`.
+    asyncio.run(tables_check())
+    uvicorn.run(
+        "src.main:app",
+        host=Settings.SERVER_HOST,
+        port=Settings.SERVER_PORT,
+        workers=Settings.SERVER_WORKERS,
+        loop=Settings.SERVER_LOOP,
+        http=Settings.SERVER_HTTP,
+        timeout_graceful_shutdown=Settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,98 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import (
+    TIMESTAMP,
+    BigInteger,
+    Index,
+    Integer,
+    Sequence,
+    String,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.core import Base
+
+# Drawn again whenever a notification gains actors, so the inbox is ordered by
+# latest activity and pages by a single integer cursor.
+notifications_seq = Sequence("notifications_seq")
+
+
+class Notifications(Base):
+    __tablename__ = "notifications"
+    __table_args__ = (
+        # One unread group per recipient, kind and subject; later bursts fold
+        # into it until it is read.
+        Index(
+            "ux_notifications_unread",
+            "user_id",
+            "kind",
+            "subject_id",
+            unique=True,
+            postgresql_where=text("read_at IS NULL"),
+        ),
+        Index("ix_notifications_inbox", "user_id", "seq"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    seq: Mapped[int] = mapped_column(
+        BigInteger,
+        notifications_seq,
+        server_default=notifications_seq.next_value(),
+        nullable=False,
+    )
+
+    user_id: Mapped[int] = mapped_column(nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    # The liked or commented post, or the followed user
+    subject_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    actor_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Most recent actors first, capped at NOTIFICATIONS_ACTORS_KEPT
+    actor_ids: Mapped[List[int]] = mapped_column(ARRAY(BigInteger), nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+    read_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+    )
+
+
+class NotificationActors(Base):
+    __tablename__ = "notification_actors"
+
+    # Everyone already counted in the unread notification of a recipient,
+    # kind and subject; its actor_ids only keeps the latest few. Dropped
+    # when the notification is read.
+    user_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    kind: Mapped[str] = mapped_column(String(16), primary_key=True)
+    subject_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    actor_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+
+class NotificationCounters(Base):
+    __tablename__ = "notification_counters"
+
+    user_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    unread: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class NotificationOffsets(Base):
+    __tablename__ = "notification_offsets"
+
+    # Change feed the notifications are built from, and the last position
+    # folded into the table
+    source: Mapped[str] = mapped_column(String(32), primary_key=True)
+    position: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -0,0 +1,226 @@
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from sqlalchemy import BigInteger, delete, func, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.config import Settings
+from src.core import async_session_factory, session_scope
+from src.notifications.models import (
+    NotificationActors,
+    NotificationCounters,
+    NotificationOffsets,
+    Notifications,
+    notifications_seq,
+)
+
+
+class NotificationsRepository:
+    LEADER_LOCK_ID = 0x6E6F74696679  # "notify"
+
+    @classmethod
+    async def lead(cls, conn: AsyncConnection) -> bool:
+        # A session-level lock, held for as long as `conn` stays checked out
+        lock_res = await conn.execute(
+            select(func.pg_try_advisory_lock(cls.LEADER_LOCK_ID))
+        )
+        await conn.commit()
+        return lock_res.scalar_one()
+
+    @classmethod
+    async def step_down(cls, conn: AsyncConnection):
+        await conn.execute(select(func.pg_advisory_unlock(cls.LEADER_LOCK_ID)))
+        await conn.commit()
+
+    @classmethod
+    async def ping(cls, conn: AsyncConnection):
+        await conn.execute(select(1))
+        await conn.commit()
+
+    @classmethod
+    async def offsets(cls) -> Dict[str, int]:
+        query = select(NotificationOffsets.source, NotificationOffsets.position)
+        async with async_session_factory() as session:
+            query_res = await session.execute(query)
+            res = dict(query_res.tuples().all())
+        return res
+
+    @classmethod
+    async def apply(
+        cls, groups: List[dict], offsets: Dict[str, Tuple[int | None, int]]
+    ) -> bool:
+        # Folds `groups` in and moves each source from its old offset to the
+        # new one in a single transaction, so a restarted consumer replays
+        # exactly what was not applied. False, with nothing written, when an
+        # offset is no longer the one this consumer started from.
+        async with async_session_factory() as session:
+            for source, (old, new) in offsets.items():
+                if old is None:
+                    stmt = (
+                        pg_insert(NotificationOffsets)
+                        .values(source=source, position=new)
+                        .on_conflict_do_nothing()
+                    )
+                else:
+                    stmt = (
+                        update(NotificationOffsets)
+                        .where(
+                            NotificationOffsets.source == source,
+                            NotificationOffsets.position == old,
+                        )
+                        .values(position=new)
+                    )
+                res = await session.execute(stmt)
+                if res.rowcount != 1:
+                    await session.rollback()
+                    return False
+
+            batch_size = Settings.NOTIFICATIONS_WRITE_BATCH_SIZE
+            # Only actors the unread notification has not counted yet, in
+            # an earlier window, count and go to the front of actor_ids
+            actors = [
+                {
+                    "user_id": group["user_id"],
+                    "kind": group["kind"],
+                    "subject_id": group["subject_id"],
+                    "actor_id": actor_id,
+                }
+                for group in groups
+                for actor_id in group["actor_ids"]
+            ]
+            new_actors = set()
+            for start in range(0, len(actors), batch_size):
+                stmt = (
+                    pg_insert(NotificationActors)
+                    .values(actors[start : start + batch_size])
+                    .on_conflict_do_nothing()
+                    .returning(*NotificationActors.__table__.c)
+                )
+                res = await session.execute(stmt)
+                new_actors.update(res.tuples().all())
+            rows = []
+            kept = Settings.NOTIFICATIONS_ACTORS_KEPT
+            for group in groups:
+                key = (group["user_id"], group["kind"], group["subject_id"])
+                actor_ids = [
+                    actor_id
+                    for actor_id in group["actor_ids"]
+                    if (*key, actor_id) in new_actors
+                ]
+                if actor_ids:
+                    rows.append(
+                        {
+                            "user_id": group["user_id"],
+                            "kind": group["kind"],
+                            "subject_id": group["subject_id"],
+                            "actor_count": len(actor_ids),
+                            "actor_ids": actor_ids[:kept],
+                        }
+                    )
+
+            created: Counter = Counter()
+            for start in range(0, len(rows), batch_size):
+                stmt = pg_insert(Notifications).values(rows[start : start + batch_size])
+                # Disjoint: the new actors were not counted in the row before
+                actor_ids = func.array_cat(
+                    stmt.excluded.actor_ids,
+                    Notifications.actor_ids,
+                    type_=ARRAY(BigInteger),
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[
+                        Notifications.user_id,
+                        Notifications.kind,
+                        Notifications.subject_id,
+                    ],
+                    index_where=Notifications.read_at.is_(None),
+                    set_={
+                        "actor_count": Notifications.actor_count
+                        + stmt.excluded.actor_count,
+                        "actor_ids": actor_ids[1:kept],
+                        "updated_at": func.now(),
+                        "seq": notifications_seq.next_value(),
+                    },
+                ).returning(
+                    Notifications.user_id,
+                    # xmax is 0 only on rows this statement inserted
+                    literal_column("xmax = 0").label("inserted"),
+                )
+                res = await session.execute(stmt)
+                created.update(
+                    row.user_id for row in res.all() if row.inserted
+                )
+
+            if created:
+                stmt = pg_insert(NotificationCounters).values(
+                    [
+                        {"user_id": user_id, "unread": unread}
+                        for user_id, unread in created.items()
+                    ]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[NotificationCounters.user_id],
+                    set_={"unread": NotificationCounters.unread + stmt.excluded.unread},
+                )
+                await session.execute(stmt)
+            await session.commit()
+        return True
+
+    @classmethod
+    async def list(cls, user_id: int, cursor: int | None, limit: int):
+        query = (
+            select(*Notifications.__table__.c)
+            .where(Notifications.user_id == user_id)
+            .order_by(Notifications.seq.desc())
+            .limit(limit)
+        )
+        if cursor is not None:
+            query = query.where(Notifications.seq < cursor)
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = query_res.mappings().all()
+        return res
+
+    @classmethod
+    async def unread_count(cls, user_id: int) -> int:
+        query = select(NotificationCounters.unread).where(
+            NotificationCounters.user_id == user_id
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = query_res.scalar_one_or_none()
+        return res or 0
+
+    @classmethod
+    async def mark_read(cls, user_id: int, up_to: int | None = None) -> int:
+        stmt = (
+            update(Notifications)
+            .where(Notifications.user_id == user_id, Notifications.read_at.is_(None))
+            .values(read_at=func.now())
+            .returning(Notifications.kind, Notifications.subject_id)
+        )
+        if up_to is not None:
+            stmt = stmt.where(Notifications.seq <= up_to)
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            subjects = query_res.tuples().all()
+            read = len(subjects)
+            if read:
+                # A read notification is closed; the next actor starts a new one
+                await session.execute(
+                    delete(NotificationActors).where(
+                        NotificationActors.user_id == user_id,
+                        tuple_(
+                            NotificationActors.kind, NotificationActors.subject_id
+                        ).in_(subjects),
+                    )
+                )
+                await session.execute(
+                    update(NotificationCounters)
+                    .where(NotificationCounters.user_id == user_id)
+                    .values(unread=func.greatest(NotificationCounters.unread - read, 0))
+                )
+            await session.commit()
+        return read
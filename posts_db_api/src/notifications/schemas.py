@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class MarkReadSchema(BaseModel):
+    # Marks notifications up to this seq as read; all of them when omitted
+    up_to: int | None = None
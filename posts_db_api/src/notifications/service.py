@@ -0,0 +1,232 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+import httpx
+import orjson
+
+from src.config import Settings
+from src.core import async_engine
+from src.notifications.repository import NotificationsRepository
+from src.outbox.repository import OutboxRepository
+from src.outbox.service import OutboxService
+from src.posts.repository import PostsRepository
+
+# (kind, subject_id, recipient or None when it is the subject's author, actor)
+Note = Tuple[str, int, int | None, int]
+
+
+class NotificationAggregator:
+    """Buffers notes between flushes, with the feed positions they cover"""
+
+    def __init__(self, committed: Dict[str, int]):
+        self.committed = dict(committed)
+        self.seen = dict(committed)
+        self.notes: List[Note] = []
+        self.lock = asyncio.Lock()
+
+    def add(self, source: str, position: int, note: Note | None):
+        if note is not None:
+            self.notes.append(note)
+        self.seen[source] = position
+
+    def take(self) -> Tuple[List[Note], Dict[str, int]]:
+        notes, self.notes = self.notes, []
+        return notes, dict(self.seen)
+
+
+class NotificationService:
+    @staticmethod
+    def _note(topic: str, payload: dict) -> Note | None:
+        if topic == "post.created" and payload["parent_post_id"] is not None:
+            return ("comment", payload["parent_post_id"], None, payload["author_id"])
+        if topic == "like.created":
+            return (
+                "like",
+                payload["post_id"],
+                payload["author_id"],
+                payload["user_id"],
+            )
+        if topic == "follow.created":
+            return (
+                "follow",
+                payload["following_id"],
+                payload["following_id"],
+                payload["follower_id"],
+            )
+        return None
+
+    @classmethod
+    async def run(cls):
+        # Every worker of every replica runs this; the advisory lock picks the
+        # one that consumes the feeds, the others wait to take over.
+        while True:
+            try:
+                async with async_engine.connect() as conn:
+                    if await NotificationsRepository.lead(conn):
+                        try:
+                            await cls._consume(conn)
+                        finally:
+                            await NotificationsRepository.step_down(conn)
+            except Exception as e:
+                print(f"Warning: Notifications consumer stopped: {str(e)}")
+            await asyncio.sleep(Settings.NOTIFICATIONS_LEADER_RETRY_SECONDS)
+
+    @classmethod
+    async def _consume(cls, conn):
+        aggregator = NotificationAggregator(await NotificationsRepository.offsets())
+        readers = [asyncio.create_task(cls._read_posts(aggregator))]
+        if Settings.USERS_DB_API_URL:
+            readers.append(asyncio.create_task(cls._read_users(aggregator)))
+        try:
+            while True:
+                done, _ = await asyncio.wait(
+                    readers,
+                    timeout=Settings.NOTIFICATIONS_WINDOW_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for reader in done:
+                    reader.result()
+                # Fails once the lock connection is gone, and with it the lock
+                await NotificationsRepository.ping(conn)
+                await cls._flush(aggregator)
+        finally:
+            for reader in readers:
+                reader.cancel()
+
+    @classmethod
+    async def _add(
+        cls,
+        aggregator: NotificationAggregator,
+        source: str,
+        position: int,
+        note: Note | None,
+    ):
+        aggregator.add(source, position, note)
+        if len(aggregator.notes) >= Settings.NOTIFICATIONS_MAX_PENDING:
+            await cls._flush(aggregator)
+
+    @classmethod
+    async def _flush(cls, aggregator: NotificationAggregator):
+        async with aggregator.lock:
+            notes, seen = aggregator.take()
+            offsets = {
+                source: (aggregator.committed.get(source), position)
+                for source, position in seen.items()
+                if position != aggregator.committed.get(source)
+            }
+            if not offsets:
+                return
+            groups = await cls._group(notes)
+            if not await NotificationsRepository.apply(groups, offsets):
+                raise RuntimeError("notification offsets moved under this consumer")
+            aggregator.committed.update(seen)
+
+    @classmethod
+    async def _group(cls, notes: List[Note]) -> List[dict]:
+        # One row per recipient, kind and subject for the whole window: a
+        # burst of likes on one post becomes a single "X and N others" write.
+        authors = await PostsRepository.authors(
+            {subject_id for _, subject_id, recipient, _ in notes if recipient is None}
+        )
+        groups: Dict[Tuple[int, str, int], dict] = {}
+        actors: Dict[Tuple[int, str, int], set] = {}
+        for kind, subject_id, recipient, actor_id in notes:
+            if recipient is None:
+                recipient = authors.get(subject_id)
+            if recipient is None or recipient == actor_id:
+                continue
+            key = (recipient, kind, subject_id)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    "user_id": recipient,
+                    "kind": kind,
+                    "subject_id": subject_id,
+                    "actor_ids": [],
+                }
+                actors[key] = set()
+            if actor_id in actors[key]:
+                continue
+            actors[key].add(actor_id)
+            group["actor_ids"].append(actor_id)
+        for group in groups.values():
+            # Newest first, every actor of the window: apply() checks each
+            # against the ones counted before
+            group["actor_ids"].reverse()
+        return list(groups.values())
+
+    @classmethod
+    async def _read_posts(cls, aggregator: NotificationAggregator):
+        after = aggregator.committed.get("posts")
+        if after is None:
+            # First run: start from now rather than notify about the past
+            after = await OutboxRepository.head()
+            aggregator.add("posts", after, None)
+        async for event in OutboxService.events(
+            after, Settings.NOTIFICATIONS_WINDOW_SECONDS
+        ):
+            if event is not None:
+                await cls._add(
+                    aggregator,
+                    "posts",
+                    event["position"],
+                    cls._note(event["topic"], event["payload"]),
+                )
+
+    @classmethod
+    async def _read_users(cls, aggregator: NotificationAggregator):
+        # users_db_api's change feed; follows are written there. Reconnects
+        # from the last position seen, the stream itself announces where it
+        # starts on the first run.
+        timeout = httpx.Timeout(
+            10.0, read=Settings.NOTIFICATIONS_FEED_READ_TIMEOUT_SECONDS
+        )
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            after = aggregator.seen.get("users")
+            if after is not None:
+                headers["Last-Event-ID"] = str(after)
+            try:
+                async with httpx.AsyncClient(timeout=timeout) as client:
+                    async with client.stream(
+                        "GET",
+                        f"{Settings.USERS_DB_API_URL}/api/v1/events",
+                        headers=headers,
+                    ) as response:
+                        response.raise_for_status()
+                        frame: Dict[str, str] = {}
+                        async for line in response.aiter_lines():
+                            if line:
+                                if not line.startswith(":"):
+                                    field, _, value = line.partition(":")
+                                    frame[field] = value.removeprefix(" ")
+                                continue
+                            if "id" in frame:
+                                note = None
+                                if "data" in frame:
+                                    event = orjson.loads(frame["data"])
+                                    note = cls._note(event["topic"], event["payload"])
+                                await cls._add(
+                                    aggregator, "users", int(frame["id"]), note
+                                )
+                            frame = {}
+            except httpx.HTTPError as e:
+                print(f"Warning: Users change feed disconnected: {str(e)}")
+            await asyncio.sleep(Settings.NOTIFICATIONS_LEADER_RETRY_SECONDS)
+
+    @classmethod
+    async def list(cls, user_id: int, cursor: int | None = None, limit: int = 20):
+        rows = await NotificationsRepository.list(user_id, cursor, limit)
+        items = [dict(row) for row in rows]
+        next_cursor = items[-1]["seq"] if len(items) == limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    @classmethod
+    async def unread_count(cls, user_id: int) -> int:
+        res = await NotificationsRepository.unread_count(user_id)
+        return res
+
+    @classmethod
+    async def mark_read(cls, user_id: int, up_to: int | None = None) -> int:
+        res = await NotificationsRepository.mark_read(user_id, up_to)
+        return res
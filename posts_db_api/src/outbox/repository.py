@@ -0,0 +1,113 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core import async_session_factory, session_scope
+from src.outbox.models import OutboxEvents
+
+
+class OutboxRepository:
+    # Writers notify PENDING_CHANNEL to wake the relay; the relay notifies
+    # PUBLISHED_CHANNEL to wake the change-feed streams of every worker.
+    PENDING_CHANNEL = "outbox_pending"
+    PUBLISHED_CHANNEL = "outbox_published"
+
+    RELAY_LOCK_ID = 0x6F7574626F78  # "outbox"
+
+    @classmethod
+    async def record(cls, session: AsyncSession, events: List[dict]):
+        # Runs inside the caller's transaction, so the events commit or roll
+        # back together with the write they describe.
+        if not events:
+            return
+        await session.execute(insert(OutboxEvents), events)
+        await session.execute(select(func.pg_notify(cls.PENDING_CHANNEL, "")))
+
+    @classmethod
+    async def publish(cls, batch_size: int) -> int:
+        # Positions continue from the last published one without holes, so a
+        # subscriber can tell a gap in its stream from a quiet period.
+        pending = (
+            select(
+                OutboxEvents.id,
+                func.row_number().over(order_by=OutboxEvents.id).label("n"),
+            )
+            .where(OutboxEvents.position.is_(None))
+            .order_by(OutboxEvents.id)
+            .limit(batch_size)
+            .subquery()
+        )
+        last_position = select(
+            func.coalesce(func.max(OutboxEvents.position), 0)
+        ).scalar_subquery()
+        stmt = (
+            update(OutboxEvents)
+            .where(OutboxEvents.id == pending.c.id)
+            .values(position=last_position + pending.c.n, published_at=func.now())
+        )
+        async with session_scope() as session:
+            # Every worker runs the relay; the advisory lock makes one of them
+            # assign positions at a time.
+            lock_res = await session.execute(
+                select(func.pg_try_advisory_xact_lock(cls.RELAY_LOCK_ID))
+            )
+            if not lock_res.scalar_one():
+                await session.rollback()
+                return 0
+            res = await session.execute(stmt)
+            if res.rowcount:
+                await session.execute(
+                    select(func.pg_notify(cls.PUBLISHED_CHANNEL, ""))
+                )
+            await session.commit()
+        return res.rowcount
+
+    @classmethod
+    async def read(cls, after: int, limit: int):
+        # Streams live far longer than a request, so every read uses its own
+        # short session instead of holding the request's connection.
+        query = (
+            select(
+                OutboxEvents.position,
+                OutboxEvents.topic,
+                OutboxEvents.aggregate_id,
+                OutboxEvents.payload,
+                OutboxEvents.created_at,
+            )
+            .where(OutboxEvents.position > after)
+            .order_by(OutboxEvents.position)
+            .limit(limit)
+        )
+        async with async_session_factory() as session:
+            query_res = await session.execute(query)
+            res = query_res.mappings().all()
+        return res
+
+    @classmethod
+    async def head(cls) -> int:
+        query = select(func.coalesce(func.max(OutboxEvents.position), 0))
+        async with async_session_factory() as session:
+            query_res = await session.execute(query)
+            res = query_res.scalar_one()
+        return res
+
+    @classmethod
+    async def purge(cls, published_before: datetime, batch_size: int) -> int:
+        # The newest published event is always kept, it carries the position
+        # the relay continues from.
+        last_position = select(func.max(OutboxEvents.position)).scalar_subquery()
+        expired = (
+            select(OutboxEvents.id)
+            .where(
+                OutboxEvents.position < last_position,
+                OutboxEvents.published_at < published_before,
+            )
+            .limit(batch_size)
+        )
+        stmt = delete(OutboxEvents).where(OutboxEvents.id.in_(expired))
+        async with session_scope() as session:
+            res = await session.execute(stmt)
+            await session.commit()
+        return res.rowcount
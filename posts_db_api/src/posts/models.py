@@ -7,8 +7,11 @@ from sqlalchemy import (
     TIMESTAMP,
     Boolean,
     ForeignKey,
+    Index,
+    Integer,
     String,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -17,11 +20,32 @@ from src.core import Base
 
 class Posts(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Readers only ever look at live posts, so keep tombstones out of
+        # the author and reply lookups.
+        Index(
+            "ix_posts_author_live",
+            "author_id",
+            "id",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        Index(
+            "ix_posts_parent_live",
+            "parent_post_id",
+            "id",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        Index(
+            "ix_posts_tombstones",
+            "deleted_at",
+            postgresql_where=text("is_deleted"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     author_id: Mapped[int]
     parent_post_id: Mapped[int | None] = mapped_column(
-        ForeignKey("posts.id"), nullable=True
+        ForeignKey("posts.id"), nullable=True, index=True
     )
 
     header: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -36,6 +60,15 @@ class Posts(Base):
     )
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
     is_visible: Mapped[bool] = mapped_column(Boolean, default=True)
+    deleted_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True),
+        default=None,
+        nullable=True,
+    )
+    # Bumped by every write that changes the post; ETags are built from it
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default=text("1")
+    )
 
 
 class Likes(Base):
@@ -44,7 +77,9 @@ class Likes(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(nullable=False)
-    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id"), nullable=False)
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("posts.id"), nullable=False, index=True
+    )
 
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True),
@@ -59,7 +94,9 @@ class Reposts(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(nullable=False)
-    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id"), nullable=False)
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("posts.id"), nullable=False, index=True
+    )
 
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True),
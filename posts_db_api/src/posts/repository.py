@@ -1,31 +1,195 @@
-from sqlalchemy import delete, select, func, insert
+import json
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
 
-from src.core import async_session_factory
-from src.posts.models import Posts
+from sqlalchemy import (
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+
+from src.core import async_session_factory, session_scope
+from src.outbox.repository import OutboxRepository
+from src.posts.models import Likes, Posts, Reposts
 
 
 class PostsRepository:
     @classmethod
     async def add(cls, values: dict):
-        stmt = insert(Posts).values(**values)
-        async with async_session_factory() as session:
-            await session.execute(stmt)
+        stmt = (
+            insert(Posts)
+            .values(**values)
+            .returning(Posts.id, Posts.author_id, Posts.parent_post_id)
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            post = query_res.mappings().one()
+            await OutboxRepository.record(session, [cls._event("post.created", post)])
             await session.commit()
 
+    @staticmethod
+    def _event(topic: str, post) -> dict:
+        return {
+            "topic": topic,
+            "aggregate_id": post["id"],
+            "payload": {
+                "id": post["id"],
+                "author_id": post["author_id"],
+                "parent_post_id": post["parent_post_id"],
+            },
+        }
+
+    PURGE_LOCK_ID = 0x706F737473  # "posts"
+
+    COPY_COLUMNS = (
+        "id",
+        "author_id",
+        "parent_post_id",
+        "header",
+        "content",
+        "tags",
+        "media",
+        "created_at",
+        "is_deleted",
+        "is_visible",
+    )
+
+    @classmethod
+    async def bulk_add(cls, values: List[dict]) -> List[int]:
+        # COPY does not hand back generated keys, so the ids are drawn from
+        # the sequence first and loaded together with the rows.
+        id_query = select(
+            func.nextval(func.pg_get_serial_sequence(Posts.__tablename__, "id"))
+        ).select_from(func.generate_series(1, len(values)))
+        async with session_scope() as session:
+            query_res = await session.execute(id_query)
+            post_ids = query_res.scalars().all()
+            records = [
+                (
+                    post_id,
+                    item["author_id"],
+                    item["parent_post_id"],
+                    item["header"],
+                    item["content"],
+                    item["tags"],
+                    json.dumps(item["media"]) if item["media"] is not None else None,
+                    item["created_at"],
+                    item["is_deleted"],
+                    item["is_visible"],
+                )
+                for post_id, item in zip(post_ids, values)
+            ]
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            try:
+                await raw_connection.driver_connection.copy_records_to_table(
+                    Posts.__tablename__, records=records, columns=cls.COPY_COLUMNS
+                )
+            except Exception:
+                await session.rollback()
+                raise
+            await OutboxRepository.record(
+                session,
+                [
+                    cls._event(
+                        "post.created",
+                        {
+                            "id": post_id,
+                            "author_id": item["author_id"],
+                            "parent_post_id": item["parent_post_id"],
+                        },
+                    )
+                    for post_id, item in zip(post_ids, values)
+                ],
+            )
+            await session.commit()
+        return post_ids
+
+    @classmethod
+    async def existing_ids(cls, post_ids: Set[int]) -> Set[int]:
+        if not post_ids:
+            return set()
+        query = select(Posts.id).where(Posts.id.in_(post_ids))
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = set(query_res.scalars().all())
+        return res
+
     @classmethod
     async def get(cls, post_id: int):
         query = select(Posts).where(Posts.id == post_id)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             query_res = await session.execute(query)
             res = query_res.scalar_one()
         return res
 
     @classmethod
     async def get_comments(cls, post_id: int):
-        query = select(Posts).where(Posts.parent_post_id == post_id)
-        async with async_session_factory() as session:
+        query = select(*Posts.__table__.c).where(
+            Posts.parent_post_id == post_id, Posts.is_deleted.is_(False)
+        )
+        async with session_scope() as session:
             query_res = await session.execute(query)
-            res = query_res.scalars()
+            res = query_res.mappings().all()
+        return res
+
+    @classmethod
+    async def get_thread(
+        cls,
+        post_id: int,
+        max_depth: int,
+        max_breadth: int,
+        cursor: int | None = None,
+    ):
+        # Walk the reply tree in one recursive query. Each level is fetched
+        # through a LATERAL subquery so that at most `max_breadth` replies
+        # are expanded per parent; `cursor` pages the root's direct replies.
+        thread = (
+            select(
+                Posts.id.label("id"),
+                literal(0).label("depth"),
+                array([Posts.id]).label("path"),
+            )
+            .where(Posts.id == post_id)
+            .cte("thread", recursive=True)
+        )
+        children_filter = [Posts.parent_post_id == thread.c.id]
+        if cursor is not None:
+            children_filter.append(or_(thread.c.depth > 0, Posts.id > cursor))
+        children = (
+            select(Posts.id)
+            .where(*children_filter)
+            .order_by(Posts.id)
+            .limit(max_breadth)
+            .lateral("children")
+        )
+        thread = thread.union_all(
+            select(
+                children.c.id,
+                thread.c.depth + 1,
+                func.array_append(thread.c.path, children.c.id),
+            )
+            .select_from(thread)
+            .join(children, true())
+            .where(thread.c.depth < max_depth)
+        )
+        query = (
+            select(Posts, thread.c.depth, thread.c.path)
+            .join(thread, Posts.id == thread.c.id)
+            .order_by(thread.c.path)
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = query_res.all()
         return res
 
     @classmethod
@@ -34,31 +198,262 @@ class PostsRepository:
         filter: dict,
         limit: int | None = None,
         offset: int | None = None,
+        fields: List[str] | None = None,
     ):
-        query = select(Posts).filter_by(**filter).limit(limit).offset(offset)
-        async with async_session_factory() as session:
+        # Feeds ask for a few columns through `fields`; the rest is skipped
+        columns = Posts.__table__.c
+        if fields:
+            columns = [columns[name] for name in fields]
+        query = (
+            select(*columns)
+            .filter_by(**filter)
+            .limit(limit)
+            .offset(offset)
+        )
+        async with session_scope() as session:
             query_res = await session.execute(query)
-            res = query_res.scalars().all()
+            res = query_res.mappings().all()
         return res
 
     @classmethod
-    async def count(cls) -> int | None:
-        query = select(func.count(Posts.id))
+    async def get_counts(
+        cls, post_ids: List[int]
+    ) -> Dict[int, Tuple[int, int, int]]:
+        # Reply, like and repost counters for a whole page in one round trip:
+        # each counter is aggregated once over the page ids and left-joined.
+        if not post_ids:
+            return {}
+        replies = (
+            select(Posts.parent_post_id.label("post_id"), func.count().label("n"))
+            .where(Posts.parent_post_id.in_(post_ids), Posts.is_deleted.is_(False))
+            .group_by(Posts.parent_post_id)
+            .subquery()
+        )
+        likes = (
+            select(Likes.post_id, func.count().label("n"))
+            .where(Likes.post_id.in_(post_ids))
+            .group_by(Likes.post_id)
+            .subquery()
+        )
+        reposts = (
+            select(Reposts.post_id, func.count().label("n"))
+            .where(Reposts.post_id.in_(post_ids))
+            .group_by(Reposts.post_id)
+            .subquery()
+        )
+        query = (
+            select(
+                Posts.id,
+                func.coalesce(replies.c.n, 0),
+                func.coalesce(likes.c.n, 0),
+                func.coalesce(reposts.c.n, 0),
+            )
+            .outerjoin(replies, replies.c.post_id == Posts.id)
+            .outerjoin(likes, likes.c.post_id == Posts.id)
+            .outerjoin(reposts, reposts.c.post_id == Posts.id)
+            .where(Posts.id.in_(post_ids))
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = {post_id: tuple(counts) for post_id, *counts in query_res.all()}
+        return res
+
+    @classmethod
+    async def stream(cls, after_id: int | None = None, batch_size: int = 1000):
+        # Rows are pulled through a server-side cursor in batches, so the
+        # export never holds more than one batch in memory.
+        query = (
+            select(Posts)
+            .order_by(Posts.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if after_id is not None:
+            query = query.where(Posts.id > after_id)
         async with async_session_factory() as session:
+            result = await session.stream_scalars(query)
+            async for row in result:
+                yield row
+
+    @classmethod
+    async def count(cls, author_id: int | None = None) -> int | None:
+        query = select(func.count(Posts.id))
+        if author_id is not None:
+            # An author's live posts, counted off ix_posts_author_live
+            query = query.where(
+                Posts.author_id == author_id,
+                Posts.is_deleted.is_(False),
+                Posts.is_visible.is_(True),
+            )
+        async with session_scope() as session:
             query_res = await session.execute(query)
             res = query_res.scalar_one_or_none()
         return res
 
     @classmethod
     async def delete(cls, post_id: int):
-        stmt = delete(Posts).where(Posts.id == post_id)
-        async with async_session_factory() as session:
-            await session.execute(stmt)
+        # Replies keep pointing at the post through parent_post_id, so only
+        # mark it as a tombstone; purge_tombstones removes it later.
+        stmt = (
+            update(Posts)
+            .where(Posts.id == post_id, Posts.is_deleted.is_(False))
+            .values(
+                is_deleted=True, deleted_at=func.now(), version=Posts.version + 1
+            )
+            .returning(Posts.id, Posts.author_id, Posts.parent_post_id)
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            post = query_res.mappings().one_or_none()
+            if post is not None:
+                await OutboxRepository.record(
+                    session, [cls._event("post.deleted", post)]
+                )
+            await session.commit()
+
+    @classmethod
+    async def update(
+        cls, post_id: int, author_id: int, version: int | None, values: dict
+    ):
+        # The author and the version the caller read are part of the WHERE,
+        # so a post edited since then is never overwritten. Only when nothing
+        # matched is the post read back, to tell the caller why.
+        conditions = [
+            Posts.id == post_id,
+            Posts.author_id == author_id,
+            Posts.is_deleted.is_(False),
+        ]
+        if version is not None:
+            conditions.append(Posts.version == version)
+        stmt = (
+            update(Posts)
+            .where(*conditions)
+            .values(**values, version=Posts.version + 1)
+            .returning(*Posts.__table__.c)
+        )
+        current_query = select(Posts.author_id, Posts.version).where(
+            Posts.id == post_id, Posts.is_deleted.is_(False)
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            post = query_res.mappings().one_or_none()
+            if post is None:
+                current_res = await session.execute(current_query)
+                current = current_res.mappings().one_or_none()
+                await session.rollback()
+                return None, current
+            await OutboxRepository.record(session, [cls._event("post.updated", post)])
+            await session.commit()
+        return post, None
+
+    @classmethod
+    async def like(cls, post_id: int, user_id: int) -> bool | None:
+        # None when there is no such post; False when it was already liked
+        author_query = select(Posts.author_id).where(
+            Posts.id == post_id, Posts.is_deleted.is_(False)
+        )
+        stmt = (
+            pg_insert(Likes)
+            .values(post_id=post_id, user_id=user_id, created_at=func.now())
+            .on_conflict_do_nothing(constraint="unique_like")
+            .returning(Likes.id)
+        )
+        async with session_scope() as session:
+            author_res = await session.execute(author_query)
+            author_id = author_res.scalar_one_or_none()
+            if author_id is None:
+                return None
+            query_res = await session.execute(stmt)
+            liked = query_res.scalar_one_or_none() is not None
+            if liked:
+                await OutboxRepository.record(
+                    session,
+                    [cls._like_event("like.created", post_id, user_id, author_id)],
+                )
             await session.commit()
+        return liked
+
+    @classmethod
+    async def unlike(cls, post_id: int, user_id: int) -> bool:
+        stmt = (
+            delete(Likes)
+            .where(Likes.post_id == post_id, Likes.user_id == user_id)
+            .returning(Likes.id)
+        )
+        author_query = select(Posts.author_id).where(Posts.id == post_id)
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            unliked = query_res.scalar_one_or_none() is not None
+            if unliked:
+                author_res = await session.execute(author_query)
+                await OutboxRepository.record(
+                    session,
+                    [
+                        cls._like_event(
+                            "like.deleted", post_id, user_id, author_res.scalar_one()
+                        )
+                    ],
+                )
+            await session.commit()
+        return unliked
+
+    @staticmethod
+    def _like_event(topic: str, post_id: int, user_id: int, author_id: int) -> dict:
+        return {
+            "topic": topic,
+            "aggregate_id": post_id,
+            "payload": {"post_id": post_id, "user_id": user_id, "author_id": author_id},
+        }
+
+    @classmethod
+    async def authors(cls, post_ids: Set[int]) -> Dict[int, int]:
+        if not post_ids:
+            return {}
+        query = select(Posts.id, Posts.author_id).where(Posts.id.in_(post_ids))
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = dict(query_res.tuples().all())
+        return res
+
+    @classmethod
+    async def purge_tombstones(cls, deleted_before: datetime, batch_size: int) -> int:
+        # Only tombstones without replies are removed, so a thread is purged
+        # leaf first over successive batches.
+        child = aliased(Posts)
+        query = (
+            select(Posts.id)
+            .where(
+                Posts.is_deleted.is_(True),
+                Posts.deleted_at < deleted_before,
+                ~exists().where(child.parent_post_id == Posts.id),
+            )
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with session_scope() as session:
+            # Every worker runs the purge loop; the advisory lock lets only
+            # one of them work on a batch at a time.
+            lock_res = await session.execute(
+                select(func.pg_try_advisory_xact_lock(cls.PURGE_LOCK_ID))
+            )
+            if not lock_res.scalar_one():
+                await session.rollback()
+                return 0
+            query_res = await session.execute(query)
+            post_ids = query_res.scalars().all()
+            if post_ids:
+                await session.execute(
+                    delete(Likes).where(Likes.post_id.in_(post_ids))
+                )
+                await session.execute(
+                    delete(Reposts).where(Reposts.post_id.in_(post_ids))
+                )
+                await session.execute(delete(Posts).where(Posts.id.in_(post_ids)))
+            await session.commit()
+        return len(post_ids)
 
     @classmethod
     async def delete_all(cls):
         stmt = delete(Posts)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             await session.execute(stmt)
             await session.commit()
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class PostSchema(BaseModel):
@@ -17,6 +17,8 @@ class PostSchema(BaseModel):
     created_at: datetime | None = None
     is_deleted: bool = False
     is_visible: bool = True
+    deleted_at: datetime | None = None
+    version: int = 1
 
     def to_dict(self) -> dict:
         return self.model_dump(exclude={"id"})
@@ -30,3 +32,60 @@ class PostSchema(BaseModel):
     #         created_at          = {self.created_at}\n\
     #         is_deleted          = {self.is_deleted}"
     #     return line
+
+
+class PostBulkItemSchema(BaseModel):
+    author_id: int
+    parent_post_id: int | None = None
+
+    header: str = Field(default="", max_length=255)
+    content: str = ""
+    tags: List[str] = []
+    media: List[str] | None = None
+
+    created_at: datetime | None = None
+    is_deleted: bool = False
+    is_visible: bool = True
+
+
+class PostUpdateSchema(BaseModel):
+    # Only the author's own post is updated
+    author_id: int
+    # Version the caller read; None updates whichever version is current
+    version: int | None = None
+
+    header: str | None = Field(default=None, max_length=255)
+    content: str | None = None
+    tags: List[str] | None = None
+    media: List[str] | None = None
+    is_visible: bool | None = None
+
+    def changes(self) -> dict:
+        return self.model_dump(exclude={"author_id", "version"}, exclude_none=True)
+
+
+class LikeSchema(BaseModel):
+    user_id: int
+
+
+class BulkRowErrorSchema(BaseModel):
+    line: int
+    error: str
+
+
+class BulkResultSchema(BaseModel):
+    inserted: int = 0
+    ids: List[int | None] = []
+    errors: List[BulkRowErrorSchema] = []
+
+
+class ThreadNodeSchema(PostSchema):
+    # None on a deleted post
+    author_id: int | None
+    depth: int
+    path: List[int]
+
+
+class ThreadSchema(BaseModel):
+    items: List[ThreadNodeSchema]
+    next_cursor: int | None = None
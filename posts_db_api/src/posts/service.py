@@ -1,14 +1,107 @@
-from datetime import datetime
-from typing import List
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Tuple
+from pydantic import ValidationError
+from src.config import Settings
 from src.posts.repository import PostsRepository
-from src.posts.schemas import PostSchema
+from src.posts.schemas import (
+    BulkResultSchema,
+    BulkRowErrorSchema,
+    PostBulkItemSchema,
+    PostSchema,
+    PostUpdateSchema,
+    ThreadNodeSchema,
+    ThreadSchema,
+)
 
 class PostService:
+    @classmethod
+    async def _with_counts(cls, posts: List[dict]):
+        counts = await PostsRepository.get_counts([post["id"] for post in posts])
+        for post in posts:
+            reply_count, like_count, repost_count = counts.get(post["id"], (0, 0, 0))
+            post["reply_count"] = reply_count
+            post["like_count"] = like_count
+            post["repost_count"] = repost_count
+        return posts
+
     @classmethod
     async def add (cls, post: PostSchema):
         post_dict = post.to_dict()
         await PostsRepository.add(post_dict)
 
+    @classmethod
+    async def bulk_add(cls, body: AsyncIterator[bytes]) -> BulkResultSchema:
+        result = BulkResultSchema()
+        chunk: List[Tuple[int, PostBulkItemSchema]] = []
+        line_no = 0
+        async for line in cls._ndjson_lines(body):
+            line_no += 1
+            result.ids.append(None)
+            if not line.strip():
+                continue
+            try:
+                item = PostBulkItemSchema.model_validate_json(line)
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}"
+                    for err in e.errors()
+                )
+                result.errors.append(BulkRowErrorSchema(line=line_no, error=error))
+                continue
+            chunk.append((line_no, item))
+            if len(chunk) >= Settings.BULK_CHUNK_SIZE:
+                await cls._load_chunk(chunk, result)
+                chunk = []
+        if chunk:
+            await cls._load_chunk(chunk, result)
+        return result
+
+    @staticmethod
+    async def _ndjson_lines(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        buffer = b""
+        async for data in body:
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line
+        if buffer:
+            yield buffer
+
+    @classmethod
+    async def _load_chunk(
+        cls, chunk: List[Tuple[int, PostBulkItemSchema]], result: BulkResultSchema
+    ):
+        parent_ids = {
+            item.parent_post_id for _, item in chunk if item.parent_post_id is not None
+        }
+        existing = await PostsRepository.existing_ids(parent_ids)
+        rows = []
+        for line_no, item in chunk:
+            if item.parent_post_id is not None and item.parent_post_id not in existing:
+                result.errors.append(
+                    BulkRowErrorSchema(line=line_no, error="Parent post not found")
+                )
+                continue
+            rows.append((line_no, item))
+        if not rows:
+            return
+
+        now = datetime.now(timezone.utc)
+        values = [
+            {**item.model_dump(), "created_at": item.created_at or now}
+            for _, item in rows
+        ]
+        try:
+            post_ids = await PostsRepository.bulk_add(values)
+        except Exception as e:
+            for line_no, _ in rows:
+                result.errors.append(BulkRowErrorSchema(line=line_no, error=str(e)))
+            return
+        for (line_no, _), post_id in zip(rows, post_ids):
+            result.ids[line_no - 1] = post_id
+        result.inserted += len(post_ids)
+
     @classmethod
     async def get(cls, post_id: int):
         post = await PostsRepository.get(post_id)
@@ -16,14 +109,51 @@ class PostService:
         return res
 
     @classmethod
-    async def get_comments(cls, post_id: int):
+    async def update(cls, post_id: int, changes: PostUpdateSchema):
+        # (post, None) once written, else (None, the post's author and
+        # version) or (None, None) when there is no such post
+        post, current = await PostsRepository.update(
+            post_id, changes.author_id, changes.version, changes.changes()
+        )
+        if post is None:
+            return None, current
+        return PostSchema.model_validate(post), None
+
+    @classmethod
+    async def get_comments(cls, post_id: int, with_counts: bool = False):
         comments = await PostsRepository.get_comments(post_id)
-        res = []
-        for item in comments:
-            comment = PostSchema.model_validate(item, from_attributes=True)
-            res.append(comment)
+        res = [dict(row) for row in comments]
+        if with_counts:
+            res = await cls._with_counts(res)
         return res
 
+    @classmethod
+    async def get_thread(
+        cls,
+        post_id: int,
+        depth: int,
+        breadth: int,
+        cursor: int | None = None,
+    ):
+        rows = await PostsRepository.get_thread(
+            post_id, max_depth=depth, max_breadth=breadth, cursor=cursor
+        )
+        # The root is always the first row, so no rows means no such post
+        if not rows:
+            return None
+        items = []
+        top_level = []
+        for post, node_depth, path in rows:
+            node = PostSchema.model_validate(post, from_attributes=True).model_dump()
+            if post.is_deleted:
+                # A placeholder keeps the replies in place; the post is gone
+                node.update(author_id=None, header="", content="", tags=[], media=None)
+            items.append(ThreadNodeSchema(**node, depth=node_depth, path=path))
+            if node_depth == 1:
+                top_level.append(post.id)
+        next_cursor = top_level[-1] if len(top_level) == breadth else None
+        return ThreadSchema(items=items, next_cursor=next_cursor)
+
     @classmethod
     async def list(
         cls,
@@ -38,6 +168,8 @@ class PostService:
         is_visible: bool | None = None,
         limit: int | None = None,
         offset: int | None = None,
+        fields: List[str] | None = None,
+        with_counts: bool = False,
     ):
         filter = {
             k: v
@@ -54,22 +186,65 @@ class PostService:
             }.items()
             if v is not None
         }
-        lst = await PostsRepository.list(filter, limit=limit, offset=offset)
-        res = []
-        for item in lst:
-            post = PostSchema.model_validate(item, from_attributes=True)
-            res.append(post)
+        lst = await PostsRepository.list(
+            filter, limit=limit, offset=offset, fields=fields
+        )
+        # Mutable copies: _with_counts adds its keys to each row
+        res = [dict(row) for row in lst]
+        if with_counts:
+            res = await cls._with_counts(res)
         return res
 
     @classmethod
-    async def count(cls):
-        res = await PostsRepository.count()
+    async def export(cls, after_id: int | None = None):
+        async for item in PostsRepository.stream(
+            after_id, batch_size=Settings.EXPORT_BATCH_SIZE
+        ):
+            post = PostSchema.model_validate(item, from_attributes=True)
+            yield post.model_dump_json() + "\n"
+
+    @classmethod
+    async def count(cls, author_id: int | None = None):
+        res = await PostsRepository.count(author_id)
         return res
 
     @classmethod
     async def delete(cls, post_id):
         await PostsRepository.delete(post_id)
 
+    @classmethod
+    async def like(cls, post_id: int, user_id: int) -> bool | None:
+        res = await PostsRepository.like(post_id, user_id)
+        return res
+
+    @classmethod
+    async def unlike(cls, post_id: int, user_id: int) -> bool:
+        res = await PostsRepository.unlike(post_id, user_id)
+        return res
+
+    @classmethod
+    async def purge_tombstones(cls) -> int:
+        deleted_before = datetime.now(timezone.utc) - timedelta(
+            days=Settings.TOMBSTONE_RETENTION_DAYS
+        )
+        total = 0
+        while True:
+            purged = await PostsRepository.purge_tombstones(
+                deleted_before, Settings.TOMBSTONE_PURGE_BATCH_SIZE
+            )
+            total += purged
+            if purged < Settings.TOMBSTONE_PURGE_BATCH_SIZE:
+                return total
+
+    @classmethod
+    async def purge_tombstones_periodically(cls):
+        while True:
+            await asyncio.sleep(Settings.TOMBSTONE_PURGE_INTERVAL_SECONDS)
+            try:
+                await cls.purge_tombstones()
+            except Exception as e:
+                print(f"Warning: Failed to purge deleted posts: {str(e)}")
+
     @classmethod
     async def delete_all(cls):
         await PostsRepository.delete_all()
@@ -0,0 +1,11 @@
+import os
+
+# Settings reads these at import; the tests never open a connection
+for name, value in {
+    "DB_NAME": "posts_db",
+    "DB_USER": "postgres",
+    "DB_PASSWORD": "postgres",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+}.items():
+    os.environ.setdefault(name, value)
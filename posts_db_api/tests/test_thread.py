@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from src.api.endpoints import app
+from src.posts.models import Posts
+from src.posts.repository import PostsRepository
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def post(id, parent_post_id=None, is_deleted=False):
+    return Posts(
+        id=id,
+        author_id=7,
+        parent_post_id=parent_post_id,
+        header=f"header {id}",
+        content=f"content {id}",
+        tags=["tag"],
+        media=["media"],
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        is_deleted=is_deleted,
+        is_visible=True,
+        version=1,
+    )
+
+
+@pytest.fixture
+def thread(monkeypatch):
+    rows = []
+
+    async def get_thread(post_id, max_depth, max_breadth, cursor=None):
+        return rows
+
+    monkeypatch.setattr(PostsRepository, "get_thread", get_thread)
+    return rows
+
+
+async def get(path):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        return await c.get(path)
+
+
+async def test_deleted_reply_is_an_empty_placeholder(thread):
+    thread.extend(
+        [
+            (post(1), 0, [1]),
+            (post(2, parent_post_id=1, is_deleted=True), 1, [1, 2]),
+            (post(3, parent_post_id=2), 2, [1, 2, 3]),
+        ]
+    )
+    response = await get("/api/v1/posts/1/thread")
+    assert response.status_code == 200
+    items = response.json()["data"]["items"]
+    assert [item["id"] for item in items] == [1, 2, 3]
+    deleted = items[1]
+    assert deleted["is_deleted"]
+    assert deleted["path"] == [1, 2]
+    assert (deleted["author_id"], deleted["header"], deleted["content"]) == (
+        None,
+        "",
+        "",
+    )
+    assert (deleted["tags"], deleted["media"]) == ([], None)
+    assert "content 2" not in response.text
+    # Replies under it are still served in full
+    assert items[2]["content"] == "content 3"
+
+
+async def test_missing_root_is_not_found(thread):
+    response = await get("/api/v1/posts/1/thread")
+    assert response.status_code == 404
@@ -0,0 +1,202 @@
+import functools
+import time
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException, status
+
+from src.config import Settings
+from src.deadline import DeadlineExceeded
+from src.metrics import Metrics
+from src.upstream import CircuitOpen
+
+
+class Overloaded(HTTPException):
+    """Work shed because the limiter guarding it is full"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service overloaded, retry later",
+            headers={"Retry-After": str(Settings.ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts to how its work completes (AIMD)
+
+    The limit grows by about one for every `limit` completions that were
+    fast enough while the limiter was well used, and shrinks by `backoff`
+    when work fails or takes longer than `latency_target`. Like TCP, it
+    shrinks at most once per round trip: only work that started after the
+    last decrease can decrease it again, so one burst of timeouts does not
+    collapse the limit to its minimum.
+
+    Work whose outcome says nothing about load (shed, refused by an open
+    breaker, cut short by the caller's deadline) neither fails nor grows
+    the limit; only its latency still counts.
+
+    Writes may only take `write_share` of the limit, so under pressure they
+    are shed first and the remaining slots go to cheap reads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency_target: float,
+        initial: float = Settings.ADMISSION_INITIAL_LIMIT,
+        minimum: float = Settings.ADMISSION_MIN_LIMIT,
+        maximum: float = Settings.ADMISSION_MAX_LIMIT,
+        backoff: float = Settings.ADMISSION_BACKOFF,
+        write_share: float = Settings.ADMISSION_WRITE_SHARE,
+    ):
+        self.name = name
+        self.latency_target = latency_target
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.write_share = write_share
+        self.inflight = 0
+        self._decreased_at = 0.0
+        Metrics.set("admission_limit", self.limit, limiter=self.name)
+
+    def acquire(self, write: bool = False) -> float:
+        """Takes a slot and returns its start time, or raises Overloaded"""
+        capacity = self.limit * self.write_share if write else self.limit
+        if self.inflight >= max(capacity, 1):
+            Metrics.inc(
+                "admission_shed_total",
+                limiter=self.name,
+                kind="write" if write else "read",
+            )
+            raise Overloaded()
+        self.inflight += 1
+        Metrics.set("admission_inflight", self.inflight, limiter=self.name)
+        return time.monotonic()
+
+    def release(self, started: float, ok: Optional[bool]):
+        """Frees a slot, adjusting the limit by how the work went"""
+        now = time.monotonic()
+        utilized = self.inflight >= self.limit / 2
+        self.inflight -= 1
+        Metrics.set("admission_inflight", self.inflight, limiter=self.name)
+        if ok is False or now - started > self.latency_target:
+            if started >= self._decreased_at:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._decreased_at = now
+        elif ok and utilized:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            return
+        Metrics.set("admission_limit", self.limit, limiter=self.name)
+
+
+def _succeeded(error: BaseException | None) -> Optional[bool]:
+    """Whether an upstream call succeeded, None if it tells nothing either way"""
+    if error is None:
+        return True
+    if isinstance(error, (Overloaded, CircuitOpen, DeadlineExceeded)):
+        return None
+    if isinstance(error, httpx.HTTPStatusError):
+        # 4xx answers were fast and deliberate; 5xx means trouble upstream
+        return error.response.status_code < 500
+    return not isinstance(error, httpx.TransportError)
+
+
+def admitted(limiter: AdaptiveLimiter, write: bool = False):
+    """Decorator running an upstream call under `limiter`'s admission"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not Settings.ADMISSION_ENABLED:
+                return await fn(*args, **kwargs)
+            started = limiter.acquire(write)
+            error = None
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                limiter.release(started, _succeeded(error))
+
+        return wrapper
+
+    return decorator
+
+
+class AdmissionMiddleware:
+    """Sheds requests with 503 before routing once `limiter` is full
+
+    Requests that never finish on their own (event streams), uploads that
+    last as long as the client takes to send them, and the service's own
+    health and metrics endpoints are not counted.
+    """
+
+    EXEMPT = ("/health", "/metrics", "/api/v1/media")
+    READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, app, limiter: AdaptiveLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not Settings.ADMISSION_ENABLED
+            or scope["path"] in self.EXEMPT
+            or scope["path"].endswith("/stream")
+        ):
+            await self.app(scope, receive, send)
+            return
+        try:
+            started = self.limiter.acquire(scope["method"] not in self.READ_METHODS)
+        except Overloaded as e:
+            body = b'{"detail":"' + e.detail.encode() + b'"}'
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": e.status_code,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", e.headers["Retry-After"].encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+        status_code = 500
+
+        async def send_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            self.limiter.release(started, self._outcome(status_code))
+
+    @staticmethod
+    def _outcome(status_code: int) -> Optional[bool]:
+        # A 503 is this service shedding or an open breaker, a 504 a deadline
+        # running out, possibly one the caller chose; neither is a failure
+        if status_code in (503, 504):
+            return None
+        return status_code < 500
+
+
+# Requests to this service, and calls to each upstream it depends on
+request_limiter = AdaptiveLimiter(
+    "requests", Settings.ADMISSION_LATENCY_TARGET_SECONDS
+)
+posts_db_limiter = AdaptiveLimiter(
+    "posts_db_api", Settings.ADMISSION_UPSTREAM_LATENCY_TARGET_SECONDS
+)
+users_db_limiter = AdaptiveLimiter(
+    "users_db_api", Settings.ADMISSION_UPSTREAM_LATENCY_TARGET_SECONDS
+)
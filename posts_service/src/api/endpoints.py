@@ -1,19 +1,89 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import (
+    FastAPI,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from src.posts.schemas import (
     PostCreateSchema,
     PostUpdateSchema,
     PostSchema,
+    PostsCountSchema,
+    ThreadSchema,
     CommentCreateSchema,
 )
+from src.media.processing import shutdown_pool
+from src.media.schemas import MediaSchema
+from src.media.service import MediaService
+from src.posts.hub import hub
 from src.posts.service import PostService
+from src.notifications.schemas import NotificationPageSchema, UnreadCountSchema
+from src.notifications.service import NotificationService
 from src.posts.middleware import get_current_user_id, get_current_user_id_optional
+from src.admission import AdmissionMiddleware, request_limiter
+from src.change_feed import ChangeFeed
+from src.compression import CompressionMiddleware
+from src.conditional import entity_tag
+from src.deadline import DeadlineMiddleware
+from src.rate_limit import Limit, RateLimitMiddleware
+from src.upstream import posts_db, users_db
+from src.config import Settings
+from src.metrics import Metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [
+        asyncio.create_task(
+            hub.run_heartbeat(Settings.TIMELINE_STREAM_HEARTBEAT_SECONDS)
+        )
+    ]
+    if Settings.CHANGE_FEED_ENABLED:
+        feed = ChangeFeed(
+            "posts", Settings.POSTS_DB_API_URL, PostService.changed_scopes, hub
+        )
+        tasks.append(asyncio.create_task(feed.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    shutdown_pool()
+    await posts_db.aclose()
+    await users_db.aclose()
+
 
 app = FastAPI(
-    title="Posts Service", description="Service for working with posts", version="1.0.0"
+    title="Posts Service",
+    description="Service for working with posts",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+# Deadlines, innermost so that shed and rate-limited requests skip them
+app.add_middleware(DeadlineMiddleware, default=Settings.REQUEST_DEADLINE_SECONDS)
+
+# Load shedding, so rate-limited requests never take a slot
+app.add_middleware(AdmissionMiddleware, limiter=request_limiter)
+
+# Rate limiting; added before CORS so that 429 responses carry its headers
+app.add_middleware(
+    RateLimitMiddleware,
+    service="posts",
+    ip=Limit(Settings.RATE_LIMIT_IP_PER_SECOND, Settings.RATE_LIMIT_IP_BURST),
+    user=Limit(Settings.RATE_LIMIT_USER_PER_SECOND, Settings.RATE_LIMIT_USER_BURST),
 )
 
+# Compression, outside the limits so that it never holds a slot
+app.add_middleware(CompressionMiddleware)
+
 # CORS settings
 app.add_middleware(
     CORSMiddleware,
@@ -34,12 +104,42 @@ async def create_post(
     return await PostService.create_post(current_user_id, post_data)
 
 
+def _event_stream(topic: str, last_event_id: Optional[str]) -> StreamingResponse:
+    """Opens a server-sent event stream for one timeline"""
+    try:
+        after = int(last_event_id) if last_event_id else None
+    except ValueError:
+        after = None
+    return StreamingResponse(
+        hub.stream(topic, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/v1/posts/stream")
+async def stream_posts_feed(last_event_id: Optional[str] = Header(None)):
+    """Streams new and deleted posts of the feed as server-sent events"""
+    return _event_stream("timeline", last_event_id)
+
+
+@app.get("/api/v1/users/{user_id}/posts/stream")
+async def stream_user_posts(user_id: int, last_event_id: Optional[str] = Header(None)):
+    """Streams new and deleted posts of a user as server-sent events"""
+    return _event_stream(f"timeline:{user_id}", last_event_id)
+
+
 @app.get("/api/v1/posts/{post_id}", response_model=PostSchema)
 async def get_post(
-    post_id: int, current_user_id: Optional[int] = Depends(get_current_user_id_optional)
+    post_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user_id: Optional[int] = Depends(get_current_user_id_optional),
 ):
-    """Retrieves a post by ID"""
-    return await PostService.get_post(post_id, current_user_id)
+    """Retrieves a post by ID; 304 when If-None-Match names its ETag"""
+    post = await PostService.get_post(post_id, current_user_id, if_none_match)
+    response.headers["ETag"] = entity_tag("post", post.id, post.version)
+    return post
 
 
 @app.get("/api/v1/posts", response_model=List[PostSchema])
@@ -62,14 +162,26 @@ async def get_user_posts(user_id: int, limit: int = 20, offset: int = 0):
     return await PostService.get_user_posts(user_id, limit, offset)
 
 
+@app.get("/api/v1/users/{user_id}/posts/count", response_model=PostsCountSchema)
+async def count_user_posts(user_id: int):
+    """Counts a user's posts"""
+    return await PostService.count_user_posts(user_id)
+
+
 @app.put("/api/v1/posts/{post_id}", response_model=PostSchema)
 async def update_post(
     post_id: int,
     post_data: PostUpdateSchema,
+    response: Response,
     current_user_id: int = Depends(get_current_user_id),
+    if_match: Optional[str] = Header(None),
 ):
-    """Updates a post (author only)"""
-    return await PostService.update_post(post_id, current_user_id, post_data)
+    """Updates a post (author only); with If-Match, only the version read"""
+    post = await PostService.update_post(
+        post_id, current_user_id, post_data, if_match
+    )
+    response.headers["ETag"] = entity_tag("post", post.id, post.version)
+    return post
 
 
 @app.delete("/api/v1/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -87,6 +199,17 @@ async def get_comments(post_id: int):
     return await PostService.get_comments(post_id)
 
 
+@app.get("/api/v1/posts/{post_id}/thread", response_model=ThreadSchema)
+async def get_thread(
+    post_id: int,
+    depth: int = Query(default=10, ge=1, le=50),
+    breadth: int = Query(default=50, ge=1, le=200),
+    cursor: int | None = None,
+):
+    """Retrieves the full reply tree of a post in one request"""
+    return await PostService.get_thread(post_id, depth, breadth, cursor)
+
+
 @app.post(
     "/api/v1/posts/{post_id}/comments",
     response_model=PostSchema,
@@ -101,7 +224,84 @@ async def create_comment(
     return await PostService.create_comment(post_id, current_user_id, comment_data)
 
 
+@app.post("/api/v1/posts/{post_id}/like", status_code=status.HTTP_204_NO_CONTENT)
+async def like_post(post_id: int, current_user_id: int = Depends(get_current_user_id)):
+    """Likes a post"""
+    await PostService.like_post(post_id, current_user_id)
+    return None
+
+
+@app.delete("/api/v1/posts/{post_id}/like", status_code=status.HTTP_204_NO_CONTENT)
+async def unlike_post(
+    post_id: int, current_user_id: int = Depends(get_current_user_id)
+):
+    """Removes a like from a post"""
+    await PostService.unlike_post(post_id, current_user_id)
+    return None
+
+
+@app.get("/api/v1/notifications", response_model=NotificationPageSchema)
+async def get_notifications(
+    cursor: int | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """Retrieves the current user's notifications, newest activity first"""
+    return await NotificationService.get_notifications(current_user_id, cursor, limit)
+
+
+@app.get("/api/v1/notifications/unread_count", response_model=UnreadCountSchema)
+async def get_unread_notifications_count(
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """Retrieves the current user's unread notification counter"""
+    return await NotificationService.get_unread_count(current_user_id)
+
+
+@app.post("/api/v1/notifications/read", response_model=UnreadCountSchema)
+async def mark_notifications_read(
+    up_to: int | None = None, current_user_id: int = Depends(get_current_user_id)
+):
+    """Marks the current user's notifications up to a seq (default all) as read"""
+    return await NotificationService.mark_read(current_user_id, up_to)
+
+
+@app.post(
+    "/api/v1/media", response_model=MediaSchema, status_code=status.HTTP_201_CREATED
+)
+async def upload_media(
+    request: Request,
+    response: Response,
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """Uploads a media file (multipart/form-data, field "file"); 200 if known"""
+    media, created = await MediaService.upload(
+        request.stream(), request.headers.get("Content-Type", "")
+    )
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return media
+
+
+@app.get("/api/v1/media/{media_id}", response_model=MediaSchema)
+async def get_media(media_id: str):
+    """Retrieves an uploaded file's record, with its variants"""
+    return await MediaService.get(media_id)
+
+
+@app.get("/api/v1/media/{media_id}/{variant}")
+async def get_media_file(media_id: str, variant: str):
+    """Serves an uploaded file ("original") or one of its variants"""
+    return await MediaService.serve(media_id, variant)
+
+
 @app.get("/health")
 async def health_check():
     """Service health check"""
     return {"status": "healthy", "service": "posts-service"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Process-local counters in the Prometheus text format"""
+    return Metrics.render()
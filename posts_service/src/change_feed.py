@@ -0,0 +1,113 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import httpx
+
+from src.cache import cache
+from src.config import Settings
+from src.metrics import Metrics
+
+
+class ChangeFeed:
+    """Evicts cache scopes as change events arrive from a DB API
+
+    Follows the server-sent event stream at `{url}/api/v1/events` and
+    resumes from the last position it saw. Positions are contiguous, so any
+    other position than the next one means events were missed (the outbox
+    was purged past us, or the DB API was reset); there is no telling which
+    keys those events touched, so the whole cache is flushed instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        scopes: Callable[[str, dict], Iterable[str]],
+        listener: Any = None,
+    ):
+        self.name = name
+        self.url = url
+        # Maps an event's topic and payload to the cache scopes it affects
+        self.scopes = scopes
+        # Optionally told about every event, publish(position, event), and
+        # about every (re)start of the feed, reset(position)
+        self.listener = listener
+        self.position: Optional[int] = None
+
+    def _position_key(self) -> str:
+        return f"{cache.namespace}:feed:{self.name}:position"
+
+    async def run(self):
+        # The position is kept next to the cache it describes, so a restarted
+        # replica resumes where the shared cache was last brought up to date.
+        raw = await cache.backend.get(self._position_key())
+        if raw is not None:
+            self.position = int(raw)
+            if self.listener is not None:
+                self.listener.reset(self.position)
+        while True:
+            try:
+                await self._follow()
+            except Exception as e:
+                print(f"Warning: Change feed {self.name} disconnected: {str(e)}")
+            await asyncio.sleep(Settings.CHANGE_FEED_RETRY_SECONDS)
+
+    async def _follow(self):
+        headers = {"Accept": "text/event-stream"}
+        if self.position is not None:
+            headers["Last-Event-ID"] = str(self.position)
+        # The stream sends a keepalive at least every heartbeat, so a read
+        # that takes longer means the connection is gone.
+        timeout = httpx.Timeout(10.0, read=Settings.CHANGE_FEED_READ_TIMEOUT_SECONDS)
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async with client.stream(
+                "GET", f"{self.url}/api/v1/events", headers=headers
+            ) as response:
+                response.raise_for_status()
+                frame: Dict[str, str] = {}
+                async for line in response.aiter_lines():
+                    if line:
+                        if not line.startswith(":"):
+                            field, _, value = line.partition(":")
+                            frame[field] = value.removeprefix(" ")
+                        continue
+                    if "id" in frame:
+                        await self._apply(frame)
+                    frame = {}
+
+    async def _apply(self, frame: Dict[str, str]):
+        position = int(frame["id"])
+        if "data" not in frame:
+            # Id-only frame: the stream starts at the DB API's head
+            if position != self.position:
+                await self._resync(position)
+        elif self.position is not None and position == self.position + 1:
+            event = json.loads(frame["data"])
+            scopes = list(self.scopes(event["topic"], event["payload"]))
+            if scopes:
+                await cache.invalidate(*scopes)
+            Metrics.inc("change_feed_events_total", feed=self.name)
+            if self.listener is not None:
+                self.listener.publish(position, event)
+            created_at = datetime.fromisoformat(event["created_at"])
+            Metrics.set(
+                "change_feed_lag_seconds",
+                (datetime.now(timezone.utc) - created_at).total_seconds(),
+                feed=self.name,
+            )
+        else:
+            await self._resync(position)
+        self.position = position
+        await cache.backend.set(
+            self._position_key(),
+            str(position).encode(),
+            Settings.CHANGE_FEED_POSITION_TTL_SECONDS,
+        )
+
+    async def _resync(self, position: int):
+        Metrics.inc("change_feed_resyncs_total", feed=self.name)
+        await cache.flush()
+        if self.listener is not None:
+            self.listener.reset(position)
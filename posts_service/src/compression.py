@@ -0,0 +1,106 @@
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.config import Settings
+
+try:
+    import brotli
+except ImportError:  # Without it every client that accepts gzip gets gzip
+    brotli = None
+
+# Content codings CompressionMiddleware produces, in order of preference
+ENCODINGS = ("br", "gzip")
+# Already compressed by their own format
+INCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/")
+
+
+class CompressionMiddleware:
+    """Compresses response bodies of at least `minimum_size` bytes
+
+    Brotli goes to clients that accept it (when the brotli package is
+    installed), gzip to the rest. Only bodies sent in one piece are
+    compressed: streamed responses such as event streams pass untouched, so
+    no event sits in a compressor's buffer. A compressed body is a different
+    representation, so a strong ETag gets the coding appended to it.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = Settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = Settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = Settings.COMPRESSION_BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http":
+            encoding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether to compress
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith(INCOMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                start = None
+                await send(message)
+                return
+            body = self._compress(encoding, body)
+            headers.add_vary_header("Accept-Encoding")
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            await send(start)
+            start = None
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _negotiate(accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for item in accept_encoding.lower().split(","):
+            coding, _, params = item.partition(";")
+            name, _, value = params.partition("=")
+            try:
+                # q=0 is the client saying it does not want this coding
+                if name.strip() == "q" and float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+            accepted.add(coding.strip())
+        for encoding in ENCODINGS:
+            if encoding in accepted and (encoding != "br" or brotli is not None):
+                return encoding
+        return None
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
@@ -0,0 +1,63 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from src.compression import ENCODINGS
+
+
+class NotModified(HTTPException):
+    """The copy the client named in If-None-Match is still current"""
+
+    def __init__(self, etag: str):
+        super().__init__(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+
+
+class PreconditionFailed(HTTPException):
+    """The copy the client named in If-Match is no longer current"""
+
+    def __init__(self, detail: str = "Precondition failed"):
+        super().__init__(
+            status_code=status.HTTP_412_PRECONDITION_FAILED, detail=detail
+        )
+
+
+def entity_tag(kind: str, entity_id: int, version: int) -> str:
+    """Strong ETag of one row, from its id and the version its writes bump"""
+    return f'"{kind}-{entity_id}-v{version}"'
+
+
+def check_not_modified(if_none_match: Optional[str], etag: str):
+    """Raises NotModified when `if_none_match` names `etag`
+
+    Tags the client got with a compressed body carry the coding as a suffix
+    (see CompressionMiddleware) and still match; the tag it sent is echoed.
+    """
+    if not if_none_match:
+        return
+    opaque = etag.strip('"')
+    variants = {opaque, *(f"{opaque}-{encoding}" for encoding in ENCODINGS)}
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == "*" or tag.strip('"') in variants:
+            raise NotModified(tag if tag != "*" else etag)
+
+
+def if_match_version(
+    if_match: Optional[str], kind: str, entity_id: int
+) -> Optional[int]:
+    """Version an If-Match header names, for a write conditional on it
+
+    None when the write is unconditional (no header, or `*`). Weak tags,
+    tags of another entity and lists of several tags raise PreconditionFailed.
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    prefix = f"{kind}-{entity_id}-v"
+    opaque = if_match.strip().strip('"')
+    if opaque.startswith(prefix):
+        version, _, encoding = opaque.removeprefix(prefix).partition("-")
+        if version.isdigit() and encoding in ("", *ENCODINGS):
+            return int(version)
+    raise PreconditionFailed()
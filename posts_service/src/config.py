@@ -10,3 +10,125 @@ class Settings:
     # JWT settings for token validation
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
     JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+
+    # Shared with the gateway: a request carrying it in X-Gateway-Secret is
+    # taken to be from the user in X-User-Id. Empty trusts tokens only.
+    GATEWAY_SECRET = os.getenv("GATEWAY_SECRET", "")
+
+    # Single-user lookups arriving within this window go out as one batchGet
+    USERS_BATCH_WINDOW_MS = float(os.getenv("USERS_BATCH_WINDOW_MS", "2"))
+    USERS_BATCH_MAX_SIZE = int(os.getenv("USERS_BATCH_MAX_SIZE", "1000"))
+
+    # Shared cache: "memory://" keeps it in-process, "redis://host:6379/0"
+    # shares it between replicas
+    CACHE_URL = os.getenv("CACHE_URL", "memory://")
+    CACHE_NAMESPACE = os.getenv("CACHE_NAMESPACE", "ssm")
+    CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "10000"))
+    CACHE_LOCK_TTL_SECONDS = float(os.getenv("CACHE_LOCK_TTL_SECONDS", "5"))
+    CACHE_LOCK_POLL_SECONDS = float(os.getenv("CACHE_LOCK_POLL_SECONDS", "0.05"))
+    # How long scope versions outlive their last use; above every entry TTL
+    CACHE_VERSION_TTL_SECONDS = float(os.getenv("CACHE_VERSION_TTL_SECONDS", "86400"))
+    CACHE_POST_TTL_SECONDS = float(os.getenv("CACHE_POST_TTL_SECONDS", "60"))
+    CACHE_TIMELINE_TTL_SECONDS = float(os.getenv("CACHE_TIMELINE_TTL_SECONDS", "15"))
+    # Media records never change once written
+    CACHE_MEDIA_TTL_SECONDS = float(os.getenv("CACHE_MEDIA_TTL_SECONDS", "3600"))
+
+    # Change events from the DB APIs evict cache scopes as they happen
+    CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "true").lower() == "true"
+    CHANGE_FEED_RETRY_SECONDS = float(os.getenv("CHANGE_FEED_RETRY_SECONDS", "1"))
+    CHANGE_FEED_READ_TIMEOUT_SECONDS = float(
+        os.getenv("CHANGE_FEED_READ_TIMEOUT_SECONDS", "45")
+    )
+    # Matches the DB APIs' outbox retention; an older position has a gap anyway
+    CHANGE_FEED_POSITION_TTL_SECONDS = float(
+        os.getenv("CHANGE_FEED_POSITION_TTL_SECONDS", "259200")
+    )
+
+    # Live timeline streams (server-sent events) fed by the change feed
+    TIMELINE_STREAM_QUEUE_SIZE = int(os.getenv("TIMELINE_STREAM_QUEUE_SIZE", "64"))
+    TIMELINE_STREAM_HISTORY_SIZE = int(
+        os.getenv("TIMELINE_STREAM_HISTORY_SIZE", "1024")
+    )
+    TIMELINE_STREAM_HEARTBEAT_SECONDS = float(
+        os.getenv("TIMELINE_STREAM_HEARTBEAT_SECONDS", "15")
+    )
+
+    # Token buckets: "memory://" counts per process, "redis://host:6379/0"
+    # shares the counts between replicas
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "memory://")
+    RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "100000"))
+    RATE_LIMIT_IP_PER_SECOND = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "20"))
+    RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "40"))
+    RATE_LIMIT_USER_PER_SECOND = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "10"))
+    RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+
+    # Adaptive concurrency limits (AIMD) for incoming requests and for the
+    # calls to each upstream; work over a limit is shed with 503
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_INITIAL_LIMIT = float(os.getenv("ADMISSION_INITIAL_LIMIT", "50"))
+    ADMISSION_MIN_LIMIT = float(os.getenv("ADMISSION_MIN_LIMIT", "4"))
+    ADMISSION_MAX_LIMIT = float(os.getenv("ADMISSION_MAX_LIMIT", "500"))
+    ADMISSION_BACKOFF = float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+    # Writes are shed once in-flight work reaches this share of the limit
+    ADMISSION_WRITE_SHARE = float(os.getenv("ADMISSION_WRITE_SHARE", "0.75"))
+    # Latency a limit backs off above; a healthy p99 under load stays below
+    ADMISSION_LATENCY_TARGET_SECONDS = float(
+        os.getenv("ADMISSION_LATENCY_TARGET_SECONDS", "2")
+    )
+    ADMISSION_UPSTREAM_LATENCY_TARGET_SECONDS = float(
+        os.getenv("ADMISSION_UPSTREAM_LATENCY_TARGET_SECONDS", "1")
+    )
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+
+    # Response bodies from this size up go out as brotli or gzip, whichever
+    # the client accepts
+    COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    # Media uploads are kept in a blob store under the SHA-256 of their
+    # content: "file:///path" stores them on local disk
+    MEDIA_STORE_URL = os.getenv("MEDIA_STORE_URL", "file:///data/media")
+    # Where clients fetch the stored files from
+    MEDIA_PUBLIC_URL = os.getenv("MEDIA_PUBLIC_URL", "/api/v1/media")
+    MEDIA_MAX_UPLOAD_BYTES = int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", "20971520"))
+    MEDIA_ALLOWED_TYPES = os.getenv(
+        "MEDIA_ALLOWED_TYPES", "image/jpeg,image/png,image/gif,image/webp,video/mp4"
+    ).split(",")
+    # Images are probed and scaled down to these widths by a pool of
+    # MEDIA_PROCESS_WORKERS processes, off the event loop
+    MEDIA_VARIANT_WIDTHS = [
+        int(width) for width in os.getenv("MEDIA_VARIANT_WIDTHS", "320,1080").split(",")
+    ]
+    MEDIA_VARIANT_QUALITY = int(os.getenv("MEDIA_VARIANT_QUALITY", "80"))
+    MEDIA_PROCESS_WORKERS = int(os.getenv("MEDIA_PROCESS_WORKERS", "2"))
+    MEDIA_PROCESS_TIMEOUT_SECONDS = float(
+        os.getenv("MEDIA_PROCESS_TIMEOUT_SECONDS", "30")
+    )
+
+    # Deadlines: a request without an X-Deadline-Ms header gets this budget,
+    # and each upstream call waits at most the smaller of it and
+    # UPSTREAM_TIMEOUT_SECONDS. Only a call that timed out after the full
+    # UPSTREAM_TIMEOUT_SECONDS counts against the breaker, so it is kept
+    # below the deadline.
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+    UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "5"))
+    UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    # Idle pooled connections are dropped before the upstream's 5s keep-alive
+    # closes them, so a request never goes out on a socket being shut
+    UPSTREAM_KEEPALIVE_SECONDS = float(os.getenv("UPSTREAM_KEEPALIVE_SECONDS", "2"))
+    # Circuit breakers: open after this many failures in a row, probe again
+    # after BREAKER_OPEN_SECONDS
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "5"))
+
+    # Serving mode
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+    SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(
+        os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "25")
+    )
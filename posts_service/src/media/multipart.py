@@ -0,0 +1,107 @@
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+
+class InvalidUpload(HTTPException):
+    """The request body is not a multipart form with the expected file"""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+class MultipartFile:
+    """The file in one field of a multipart/form-data body, read as it arrives
+
+    `chunks()` yields the file's bytes while the body is still coming in, so
+    no more than one network read of it is held at a time. Other fields are
+    skipped. `content_type` and `filename` are set once the file's part
+    headers are parsed, before its first chunk.
+    """
+
+    def __init__(
+        self, body: AsyncIterator[bytes], content_type: str, field: str = "file"
+    ):
+        media_type, params = parse_options_header(content_type)
+        if media_type != b"multipart/form-data" or not params.get(b"boundary"):
+            raise InvalidUpload("Expected a multipart/form-data body")
+        self.body = body
+        self.field = field.encode()
+        self.content_type: Optional[str] = None
+        self.filename: Optional[str] = None
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._in_file = False
+        self._found = False
+        self._done = False
+        self._ready: Deque[bytes] = deque()
+        self._parser = MultipartParser(
+            params[b"boundary"],
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        try:
+            async for data in self.body:
+                self._parser.write(data)
+                while self._ready:
+                    yield self._ready.popleft()
+                if self._done:
+                    # The rest of the body is left unread
+                    return
+            self._parser.finalize()
+        except MultipartParseError as e:
+            raise InvalidUpload(f"Malformed multipart body: {e}")
+        while self._ready:
+            yield self._ready.popleft()
+        if not self._found:
+            raise InvalidUpload(f"No file in the '{self.field.decode()}' field")
+
+    def _on_part_begin(self):
+        self._headers = []
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers.append((self._header_name.lower(), self._header_value))
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        headers = dict(self._headers)
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        # Only the first part with the field's name is read
+        if options.get(b"name") != self.field or self._found:
+            return
+        self._in_file = self._found = True
+        self.filename = options.get(b"filename", b"").decode(errors="replace")
+        content_type, _ = parse_options_header(
+            headers.get(b"content-type", b"application/octet-stream")
+        )
+        self.content_type = content_type.decode("latin-1").lower()
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._ready.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._done = True
@@ -0,0 +1,108 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from src.config import Settings
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # Without it files are stored as sent, with no variants
+    Image = None
+
+# Pillow's formats by the content type they are served with
+IMAGE_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+# Scaled-down variants keep transparency as WebP, the rest go out as JPEG
+VARIANT_FORMATS = {"RGBA": ("WEBP", "image/webp"), "RGB": ("JPEG", "image/jpeg")}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def probe_image(data: bytes, widths: List[int], quality: int) -> Optional[dict]:
+    """Runs in the pool: the image's type and size, and its scaled variants
+
+    Variants are made for every width narrower than the image. None when
+    `data` is not an image of one of IMAGE_TYPES.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        content_type = IMAGE_TYPES.get(image.format)
+        if content_type is None:
+            return None
+        image.load()
+        # Phones store the rotation in EXIF; variants come out upright
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+    width, height = image.size
+    mode = "RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB"
+    variant_format, variant_type = VARIANT_FORMATS[mode]
+    variants: Dict[str, dict] = {}
+    for variant_width in sorted(set(widths)):
+        if variant_width >= width:
+            continue
+        scaled = image.convert(mode)
+        scaled.thumbnail((variant_width, height), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        scaled.save(out, variant_format, quality=quality)
+        variants[f"w{variant_width}"] = {
+            "content_type": variant_type,
+            "width": scaled.width,
+            "height": scaled.height,
+            "data": out.getvalue(),
+        }
+    return {
+        "content_type": content_type,
+        "width": width,
+        "height": height,
+        "variants": variants,
+    }
+
+
+def pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Worker processes start from a clean server process rather than a
+        # fork of this one, with its event loop and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=Settings.MEDIA_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+    return _pool
+
+
+def can_process_images() -> bool:
+    return Image is not None
+
+
+async def process_image(data: bytes) -> Optional[dict]:
+    """probe_image in the process pool"""
+    loop = asyncio.get_running_loop()
+    try:
+        async with asyncio.timeout(Settings.MEDIA_PROCESS_TIMEOUT_SECONDS):
+            return await loop.run_in_executor(
+                pool(),
+                probe_image,
+                data,
+                Settings.MEDIA_VARIANT_WIDTHS,
+                Settings.MEDIA_VARIANT_QUALITY,
+            )
+    except BrokenProcessPool:
+        # A worker died, out of memory on a huge image say; the pool cannot
+        # be used again, so the next call starts a new one
+        shutdown_pool()
+        raise
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,24 @@
+from typing import Dict
+from pydantic import BaseModel, Field
+
+
+class MediaVariantSchema(BaseModel):
+    """One stored rendition of a media file"""
+
+    url: str
+    content_type: str
+    width: int | None = None
+    height: int | None = None
+
+
+class MediaSchema(BaseModel):
+    """Uploaded media file, with the variants made from it"""
+
+    id: str = Field(..., description="SHA-256 of the file's content")
+    content_type: str
+    size: int
+    width: int | None = None
+    height: int | None = None
+    variants: Dict[str, MediaVariantSchema] = Field(
+        default={}, description="'original', and scaled images named by width"
+    )
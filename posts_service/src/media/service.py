@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import json
+import re
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException, status
+from starlette.responses import Response
+from src.cache import cache
+from src.config import Settings
+from src.media.multipart import InvalidUpload, MultipartFile
+from src.media.processing import can_process_images, process_image
+from src.media.schemas import MediaSchema, MediaVariantSchema
+from src.media.storage import store
+from src.metrics import Metrics
+
+MEDIA_ID = re.compile(r"[0-9a-f]{64}")
+
+
+class MediaService:
+    """Service for uploaded media files
+
+    A file is stored once under the SHA-256 of its content, next to the
+    variants made from it and a JSON record of both. The record is written
+    last, so a file without one was never completely processed.
+    """
+
+    @staticmethod
+    def is_media_id(value: str) -> bool:
+        return MEDIA_ID.fullmatch(value) is not None
+
+    @staticmethod
+    def _key(media_id: str, suffix: str | None = None) -> str:
+        key = f"{media_id[:2]}/{media_id}"
+        return key if suffix is None else f"{key}.{suffix}"
+
+    @staticmethod
+    async def upload(
+        body: AsyncIterator[bytes], content_type: str
+    ) -> Tuple[MediaSchema, bool]:
+        """Stores the file of a multipart upload; True if it was not stored yet
+
+        The file goes to the blob store and through the hash as it arrives,
+        so it is never held in memory whole.
+        """
+        upload = MultipartFile(body, content_type)
+        writer = await store.writer()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async for chunk in upload.chunks():
+                if upload.content_type not in Settings.MEDIA_ALLOWED_TYPES:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail=f"Unsupported media type: {upload.content_type}",
+                    )
+                size += len(chunk)
+                if size > Settings.MEDIA_MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="File too large",
+                    )
+                digest.update(chunk)
+                await writer.write(chunk)
+            if size == 0:
+                raise InvalidUpload("Empty file")
+        except BaseException:
+            await writer.abort()
+            raise
+
+        media_id = digest.hexdigest()
+        record = await MediaService._record(media_id)
+        if record is not None:
+            await writer.abort()
+            Metrics.inc("media_uploads_total", result="duplicate")
+            return MediaService._schema(record), False
+        await writer.commit(MediaService._key(media_id))
+
+        record = {
+            "id": media_id,
+            "content_type": upload.content_type,
+            "size": size,
+            "width": None,
+            "height": None,
+            "variants": {"original": {"content_type": upload.content_type}},
+        }
+        if upload.content_type.startswith("image/") and can_process_images():
+            await MediaService._process_image(record)
+        # Written last: from here on the file is served and can be attached
+        await store.put(
+            MediaService._key(media_id, "json"), json.dumps(record).encode()
+        )
+        Metrics.inc("media_uploads_total", result="stored")
+        return MediaService._schema(record), True
+
+    @staticmethod
+    async def _process_image(record: dict):
+        # The image is decoded whole by Pillow anyway, in the worker process
+        key = MediaService._key(record["id"])
+        try:
+            image = await process_image(await store.get(key))
+        except (TimeoutError, BrokenProcessPool):
+            image = None
+        if image is None:
+            await store.delete(key)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Not an image that can be processed",
+            )
+        original = {
+            "content_type": image["content_type"],
+            "width": image["width"],
+            "height": image["height"],
+        }
+        record.update(original, variants={"original": original})
+        for name, variant in image["variants"].items():
+            await store.put(MediaService._key(record["id"], name), variant.pop("data"))
+            record["variants"][name] = variant
+
+    @staticmethod
+    def _schema(record: dict) -> MediaSchema:
+        # URLs are built on the way out, so MEDIA_PUBLIC_URL can change
+        return MediaSchema(
+            id=record["id"],
+            content_type=record["content_type"],
+            size=record["size"],
+            width=record.get("width"),
+            height=record.get("height"),
+            variants={
+                name: MediaVariantSchema(
+                    url=f"{Settings.MEDIA_PUBLIC_URL}/{record['id']}/{name}",
+                    **variant,
+                )
+                for name, variant in record["variants"].items()
+            },
+        )
+
+    @staticmethod
+    async def _record(media_id: str) -> Optional[dict]:
+        if not MediaService.is_media_id(media_id):
+            return None
+        return await cache.get_or_load(
+            "media",
+            media_id,
+            lambda: MediaService._load_record(media_id),
+            ttl=Settings.CACHE_MEDIA_TTL_SECONDS,
+        )
+
+    @staticmethod
+    async def _load_record(media_id: str) -> Optional[dict]:
+        raw = await store.get(MediaService._key(media_id, "json"))
+        return json.loads(raw) if raw is not None else None
+
+    @staticmethod
+    async def get(media_id: str) -> MediaSchema:
+        """Retrieves an uploaded file's record"""
+        record = await MediaService._record(media_id)
+        if record is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Media not found"
+            )
+        return MediaService._schema(record)
+
+    @staticmethod
+    async def get_many(media_ids: Iterable[str]) -> Dict[str, MediaSchema]:
+        """Records of the uploaded files among `media_ids`, by id"""
+        ids = list(dict.fromkeys(media_ids))
+        records = await asyncio.gather(*(MediaService._record(i) for i in ids))
+        return {
+            media_id: MediaService._schema(record)
+            for media_id, record in zip(ids, records)
+            if record is not None
+        }
+
+    @staticmethod
+    async def check_attached(media: Optional[List[str]]):
+        """Rejects a post whose media names an id that was never uploaded
+
+        Entries that are not media ids are links, kept as they are.
+        """
+        media_ids = [m for m in media or () if MediaService.is_media_id(m)]
+        missing = set(media_ids) - set(await MediaService.get_many(media_ids))
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Unknown media: {', '.join(sorted(missing))}",
+            )
+
+    @staticmethod
+    async def serve(media_id: str, variant: str) -> Response:
+        """Serves a stored file or one of its variants"""
+        record = await MediaService._record(media_id)
+        if record is None or variant not in record["variants"]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Media not found"
+            )
+        key = MediaService._key(media_id, None if variant == "original" else variant)
+        response = await store.response(
+            key, record["variants"][variant]["content_type"]
+        )
+        # Content-addressed, so a URL always names the same bytes
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        return response
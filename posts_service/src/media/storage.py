@@ -0,0 +1,135 @@
+import asyncio
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+from urllib.parse import urlparse
+
+from fastapi.responses import FileResponse
+from starlette.responses import Response
+
+from src.config import Settings
+
+
+class BlobWriter(ABC):
+    """A blob being written; it gets its key only once it is complete"""
+
+    @abstractmethod
+    async def write(self, data: bytes):
+        ...
+
+    @abstractmethod
+    async def commit(self, key: str):
+        """Keeps the blob under `key`; a blob already there is left as it is"""
+
+    @abstractmethod
+    async def abort(self):
+        ...
+
+
+class BlobStore(ABC):
+    """Where media files are kept; keys are slash-separated relative paths"""
+
+    @abstractmethod
+    async def writer(self) -> BlobWriter:
+        ...
+
+    async def put(self, key: str, data: bytes):
+        writer = await self.writer()
+        try:
+            await writer.write(data)
+        except BaseException:
+            await writer.abort()
+            raise
+        await writer.commit(key)
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def response(self, key: str, media_type: str) -> Response:
+        """A response that serves the blob under `key`"""
+
+
+class LocalBlobWriter(BlobWriter):
+    def __init__(self, store: "LocalBlobStore", file):
+        self.store = store
+        self.file = file
+
+    async def write(self, data: bytes):
+        await asyncio.to_thread(self.file.write, data)
+
+    async def commit(self, key: str):
+        await asyncio.to_thread(self._commit, self.store.path(key))
+
+    def _commit(self, path: str):
+        self.file.close()
+        if os.path.exists(path):
+            os.unlink(self.file.name)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Renamed into place whole, so a reader never sees half a file
+        os.replace(self.file.name, path)
+
+    async def abort(self):
+        await asyncio.to_thread(self._abort)
+
+    def _abort(self):
+        self.file.close()
+        os.unlink(self.file.name)
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under `root`; partial writes go to `root`/.tmp"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.tmp = os.path.join(self.root, ".tmp")
+
+    def path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    async def writer(self) -> BlobWriter:
+        return LocalBlobWriter(self, await asyncio.to_thread(self._open))
+
+    def _open(self):
+        os.makedirs(self.tmp, exist_ok=True)
+        return open(os.path.join(self.tmp, uuid.uuid4().hex), "xb")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, self.path(key))
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    async def delete(self, key: str):
+        try:
+            await asyncio.to_thread(os.unlink, self.path(key))
+        except FileNotFoundError:
+            pass
+
+    async def response(self, key: str, media_type: str) -> Response:
+        # Sent in chunks straight from the file
+        return FileResponse(self.path(key), media_type=media_type)
+
+
+def create_store(url: str) -> BlobStore:
+    if url.startswith("file://"):
+        return LocalBlobStore(urlparse(url).path)
+    raise ValueError(f"Unsupported MEDIA_STORE_URL: {url}")
+
+
+store = create_store(Settings.MEDIA_STORE_URL)
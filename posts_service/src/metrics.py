@@ -0,0 +1,32 @@
+from typing import Dict
+
+
+class Metrics:
+    """Process-local counters and gauges exposed in the Prometheus text format"""
+
+    _values: Dict[str, float] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> str:
+        if not labels:
+            return name
+        label_str = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+        return f"{name}{{{label_str}}}"
+
+    @classmethod
+    def inc(cls, name: str, value: float = 1.0, **labels: str):
+        key = cls._key(name, labels)
+        cls._values[key] = cls._values.get(key, 0.0) + value
+
+    @classmethod
+    def set(cls, name: str, value: float, **labels: str):
+        cls._values[cls._key(name, labels)] = value
+
+    @classmethod
+    def set_max(cls, name: str, value: float, **labels: str):
+        key = cls._key(name, labels)
+        cls._values[key] = max(cls._values.get(key, 0.0), value)
+
+    @classmethod
+    def render(cls) -> str:
+        return "".join(f"{key} {value}\n" for key, value in sorted(cls._values.items()))
@@ -0,0 +1,47 @@
+from typing import Optional, Dict, Any
+from src.admission import admitted, posts_db_limiter
+from src.upstream import posts_db
+
+
+class NotificationsDBClient:
+    """HTTP client for the notification inbox kept by posts_db_api"""
+
+    @staticmethod
+    @admitted(posts_db_limiter)
+    async def get_notifications(
+        user_id: int, cursor: Optional[int] = None, limit: int = 20
+    ) -> Dict[str, Any]:
+        """Retrieves one page of a user's notifications, newest activity first"""
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = await posts_db.get(
+            f"/api/v1/users/{user_id}/notifications",
+            params=params,
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get("data") if data.get("success") else {"items": []}
+
+    @staticmethod
+    @admitted(posts_db_limiter)
+    async def get_unread_count(user_id: int) -> int:
+        """Retrieves the user's unread notification counter"""
+        response = await posts_db.get(
+            f"/api/v1/users/{user_id}/notifications/unread_count"
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get("data", 0) if data.get("success") else 0
+
+    @staticmethod
+    @admitted(posts_db_limiter, write=True)
+    async def mark_read(user_id: int, up_to: Optional[int] = None) -> int:
+        """Marks notifications up to a seq as read; returns how many were"""
+        response = await posts_db.post(
+            f"/api/v1/users/{user_id}/notifications/read",
+            json={"up_to": up_to},
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get("data", 0) if data.get("success") else 0
@@ -0,0 +1,31 @@
+from typing import List
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class NotificationSchema(BaseModel):
+    """Notification for responses; one entry stands for a burst of actors"""
+
+    id: int
+    seq: int
+    kind: str
+    subject_id: int
+    actor_count: int
+    actor_ids: List[int]
+    text: str
+    created_at: datetime
+    updated_at: datetime
+    is_read: bool
+
+
+class NotificationPageSchema(BaseModel):
+    """Page of notifications; pass next_cursor back to get the next one"""
+
+    items: List[NotificationSchema]
+    next_cursor: int | None = None
+
+
+class UnreadCountSchema(BaseModel):
+    """Unread notifications counter"""
+
+    unread_count: int
@@ -0,0 +1,81 @@
+from typing import Dict, Optional
+from src.notifications.http_clients import NotificationsDBClient
+from src.notifications.schemas import (
+    NotificationPageSchema,
+    NotificationSchema,
+    UnreadCountSchema,
+)
+from src.posts.http_clients import UsersDBClient
+
+
+class NotificationService:
+    """Service for working with the notification inbox"""
+
+    VERBS = {
+        "like": "liked your post",
+        "comment": "commented on your post",
+        "follow": "followed you",
+    }
+
+    @staticmethod
+    def _text(kind: str, actor_count: int, names: list) -> str:
+        """Renders the summary line, e.g. alice and 41 others liked your post"""
+        verb = NotificationService.VERBS.get(kind, kind)
+        if actor_count == 1:
+            return f"{names[0]} {verb}"
+        if actor_count == 2 and len(names) >= 2:
+            return f"{names[0]} and {names[1]} {verb}"
+        others = actor_count - 1
+        return f"{names[0]} and {others} {'other' if others == 1 else 'others'} {verb}"
+
+    @staticmethod
+    async def get_notifications(
+        user_id: int, cursor: Optional[int] = None, limit: int = 20
+    ) -> NotificationPageSchema:
+        """Retrieves a page of the user's inbox"""
+        page = await NotificationsDBClient.get_notifications(user_id, cursor, limit)
+        items = page.get("items", [])
+
+        # Actor names for the whole page in one batch request
+        actor_ids = list(
+            dict.fromkeys(actor_id for item in items for actor_id in item["actor_ids"])
+        )
+        usernames: Dict[int, str] = {}
+        if actor_ids:
+            users = await UsersDBClient.get_users(actor_ids, fields=["id", "username"])
+            usernames = {user["id"]: user["username"] for user in users}
+
+        result = []
+        for item in items:
+            names = [
+                usernames.get(actor_id, "Someone") for actor_id in item["actor_ids"]
+            ]
+            result.append(
+                NotificationSchema(
+                    id=item["id"],
+                    seq=item["seq"],
+                    kind=item["kind"],
+                    subject_id=item["subject_id"],
+                    actor_count=item["actor_count"],
+                    actor_ids=item["actor_ids"],
+                    text=NotificationService._text(
+                        item["kind"], item["actor_count"], names or ["Someone"]
+                    ),
+                    created_at=item["created_at"],
+                    updated_at=item["updated_at"],
+                    is_read=item.get("read_at") is not None,
+                )
+            )
+        return NotificationPageSchema(items=result, next_cursor=page.get("next_cursor"))
+
+    @staticmethod
+    async def get_unread_count(user_id: int) -> UnreadCountSchema:
+        """Retrieves the unread counter"""
+        count = await NotificationsDBClient.get_unread_count(user_id)
+        return UnreadCountSchema(unread_count=count)
+
+    @staticmethod
+    async def mark_read(user_id: int, up_to: Optional[int] = None) -> UnreadCountSchema:
+        """Marks notifications as read and returns what is left unread"""
+        await NotificationsDBClient.mark_read(user_id, up_to)
+        return await NotificationService.get_unread_count(user_id)
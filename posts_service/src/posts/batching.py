@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+
+class BatchLoader:
+    """Coalesces concurrent single-key lookups into one batch call
+
+    Keys requested within `window` seconds of the first pending one are sent
+    to `fetch` together; a batch also goes out as soon as it reaches
+    `max_size` keys. `fetch` returns the items it found, and each caller gets
+    the item whose `key_field` matches its key, or None.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[Hashable]], Awaitable[List[Dict[str, Any]]]],
+        window: float,
+        max_size: int,
+        key_field: str = "id",
+    ):
+        self._fetch = fetch
+        self._window = window
+        self._max_size = max_size
+        self._key_field = key_field
+        self._pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Returns the item for `key` once its batch has been fetched"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        if len(self._pending) >= self._max_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        task = asyncio.create_task(self._run(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending: Dict[Hashable, List[asyncio.Future]]):
+        try:
+            items = await self._fetch(list(pending))
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        by_key = {item[self._key_field]: item for item in items}
+        for key, futures in pending.items():
+            item = by_key.get(key)
+            for future in futures:
+                if not future.done():
+                    future.set_result(dict(item) if item is not None else None)
@@ -1,109 +1,223 @@
 import httpx
 from typing import Optional, Dict, Any, List
+from src.admission import admitted, posts_db_limiter, users_db_limiter
 from src.config import Settings
+from src.upstream import posts_db, users_db
+from src.posts.batching import BatchLoader
+from src.posts.singleflight import singleflight
 
 
 class PostsDBClient:
     """HTTP client for interacting with posts_db_api"""
 
-    BASE_URL = Settings.POSTS_DB_API_URL
+    # Columns PostSchema renders
+    POST_FIELDS = (
+        "id,author_id,parent_post_id,header,content,tags,media,"
+        "created_at,is_deleted,is_visible,version"
+    )
 
     @staticmethod
+    @admitted(posts_db_limiter, write=True)
     async def create_post(post_data: Dict[str, Any]) -> Dict[str, Any]:
         """Creates a new post"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{PostsDBClient.BASE_URL}/api/v1/posts", json=post_data, timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await posts_db.post("/api/v1/posts", json=post_data)
+        response.raise_for_status()
+        return response.json()
 
     @staticmethod
+    @singleflight(key=lambda post_id: post_id)
+    @admitted(posts_db_limiter)
     async def get_post(post_id: int) -> Optional[Dict[str, Any]]:
         """Retrieves a post by ID"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{PostsDBClient.BASE_URL}/api/v1/posts/{post_id}", timeout=10.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("data") if data.get("success") else None
-            except httpx.HTTPStatusError:
-                return None
+        try:
+            response = await posts_db.get(f"/api/v1/posts/{post_id}")
+            response.raise_for_status()
+            data = response.json()
+            return data.get("data") if data.get("success") else None
+        except httpx.HTTPStatusError as e:
+            # Only "not there" is an answer; a 5xx goes on through admitted,
+            # which counts it against the upstream
+            if e.response.is_server_error:
+                raise
+            return None
 
     @staticmethod
+    @singleflight()
+    @admitted(posts_db_limiter)
     async def get_posts(
         author_id: int | None = None,
         parent_post_id: int | None = None,
         limit: int | None = None,
         offset: int | None = None,
+        with_counts: bool = False,
+        fields: str | None = None,
     ) -> List[Dict[str, Any]]:
         """Retrieves a filtered list of posts"""
-        async with httpx.AsyncClient() as client:
-            params = {}
-            if author_id:
-                params["author_id"] = author_id
-            if parent_post_id:
-                params["parent_post_id"] = parent_post_id
-            if limit:
-                params["limit"] = limit
-            if offset:
-                params["offset"] = offset
-            params["is_deleted"] = False
-            params["is_visible"] = True
-
-            response = await client.get(
-                f"{PostsDBClient.BASE_URL}/api/v1/posts", params=params, timeout=10.0
+        params = {}
+        if author_id:
+            params["author_id"] = author_id
+        if parent_post_id:
+            params["parent_post_id"] = parent_post_id
+        if limit:
+            params["limit"] = limit
+        if offset:
+            params["offset"] = offset
+        if with_counts:
+            params["with_counts"] = True
+        if fields:
+            params["fields"] = fields
+        params["is_deleted"] = False
+        params["is_visible"] = True
+
+        response = await posts_db.get("/api/v1/posts", params=params)
+        response.raise_for_status()
+        data = response.json()
+        return data.get("data", []) if data.get("success") else []
+
+    @staticmethod
+    @singleflight(key=lambda post_id, with_counts=False: (post_id, with_counts))
+    @admitted(posts_db_limiter)
+    async def get_comments(
+        post_id: int, with_counts: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Retrieves comments for a post"""
+        try:
+            response = await posts_db.get(
+                f"/api/v1/posts/{post_id}/comments",
+                params={"with_counts": True} if with_counts else None,
             )
             response.raise_for_status()
             data = response.json()
             return data.get("data", []) if data.get("success") else []
+        except httpx.HTTPStatusError as e:
+            if e.response.is_server_error:
+                raise
+            return []
 
     @staticmethod
-    async def get_comments(post_id: int) -> List[Dict[str, Any]]:
-        """Retrieves comments for a post"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{PostsDBClient.BASE_URL}/api/v1/posts/{post_id}/comments",
-                    timeout=10.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("data", []) if data.get("success") else []
-            except httpx.HTTPStatusError:
-                return []
+    @singleflight()
+    @admitted(posts_db_limiter)
+    async def count_posts(author_id: int | None = None) -> int:
+        """Counts all posts, or only the live ones of `author_id`"""
+        response = await posts_db.get(
+            "/api/v1/posts/count",
+            params={"author_id": author_id} if author_id else None,
+        )
+        response.raise_for_status()
+        return response.json()["data"]
+
+    @staticmethod
+    @singleflight()
+    @admitted(posts_db_limiter)
+    async def get_thread(
+        post_id: int, depth: int, breadth: int, cursor: int | None = None
+    ) -> Optional[Dict[str, Any]]:
+        """Retrieves the reply tree of a post in a single call"""
+        params = {"depth": depth, "breadth": breadth}
+        if cursor:
+            params["cursor"] = cursor
+        try:
+            response = await posts_db.get(
+                f"/api/v1/posts/{post_id}/thread",
+                params=params,
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data.get("data") if data.get("success") else None
+        except httpx.HTTPStatusError as e:
+            if e.response.is_server_error:
+                raise
+            return None
 
     @staticmethod
+    @admitted(posts_db_limiter, write=True)
+    async def update_post(
+        post_id: int,
+        author_id: int,
+        changes: Dict[str, Any],
+        version: int | None = None,
+    ) -> Dict[str, Any]:
+        """Updates the author's post, only at `version` when one is given
+
+        Raises HTTPStatusError: 404 no post, 403 not the author, 409 the post
+        is at another version.
+        """
+        response = await posts_db.patch(
+            f"/api/v1/posts/{post_id}",
+            json={"author_id": author_id, "version": version, **changes},
+        )
+        response.raise_for_status()
+        return response.json()["data"]
+
+    @staticmethod
+    @admitted(posts_db_limiter, write=True)
     async def delete_post(post_id: int) -> bool:
         """Deletes a post (marks it as is_deleted=True)"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.delete(
-                    f"{PostsDBClient.BASE_URL}/api/v1/posts/{post_id}", timeout=10.0
-                )
-                response.raise_for_status()
-                return True
-            except httpx.HTTPStatusError:
-                return False
+        try:
+            response = await posts_db.delete(f"/api/v1/posts/{post_id}")
+            response.raise_for_status()
+            return True
+        except httpx.HTTPStatusError as e:
+            if e.response.is_server_error:
+                raise
+            return False
+
+    @staticmethod
+    @admitted(posts_db_limiter, write=True)
+    async def like_post(post_id: int, user_id: int) -> Optional[bool]:
+        """Likes a post; None if there is no such post"""
+        response = await posts_db.post(
+            f"/api/v1/posts/{post_id}/likes",
+            json={"user_id": user_id},
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        data = response.json()
+        return data.get("data") if data.get("success") else None
+
+    @staticmethod
+    @admitted(posts_db_limiter, write=True)
+    async def unlike_post(post_id: int, user_id: int) -> bool:
+        """Removes a like; False if there was none"""
+        response = await posts_db.delete(f"/api/v1/posts/{post_id}/likes/{user_id}")
+        response.raise_for_status()
+        data = response.json()
+        return bool(data.get("data")) if data.get("success") else False
 
 
 class UsersDBClient:
     """HTTP client for interacting with users_db_api"""
 
-    BASE_URL = Settings.USERS_DB_API_URL
-
     @staticmethod
+    @singleflight(key=lambda user_id: user_id)
     async def get_user(user_id: int) -> Optional[Dict[str, Any]]:
-        """Retrieves a user by ID"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{UsersDBClient.BASE_URL}/api/v1/users/{user_id}", timeout=10.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("data") if data.get("success") else None
-            except httpx.HTTPStatusError:
-                return None
+        """Retrieves a user by ID, batched with concurrent lookups"""
+        try:
+            return await _user_loader.load(user_id)
+        except httpx.HTTPStatusError:
+            return None
+
+    @staticmethod
+    @singleflight(
+        key=lambda user_ids, fields=None: (tuple(user_ids), tuple(fields or ()))
+    )
+    @admitted(users_db_limiter)
+    async def get_users(
+        user_ids: List[int], fields: List[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        """Retrieves up to 1000 users by ID in one request"""
+        response = await users_db.post(
+            "/api/v1/users:batchGet",
+            json={"ids": user_ids, "fields": fields},
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get("data", []) if data.get("success") else []
+
+
+_user_loader = BatchLoader(
+    UsersDBClient.get_users,
+    window=Settings.USERS_BATCH_WINDOW_MS / 1000,
+    max_size=Settings.USERS_BATCH_MAX_SIZE,
+)
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from src.config import Settings
+from src.metrics import Metrics
+
+KEEPALIVE = b": keepalive\n\n"
+# Tells a client it missed events the hub no longer has; it should reload the
+# timeline over GET and reconnect without Last-Event-ID.
+RESET = b"event: reset\ndata: {}\n\n"
+# Change feed topics pushed to timelines, by the SSE event name they go out as
+EVENT_NAMES = {
+    "post.created": "post",
+    "post.updated": "update",
+    "post.deleted": "delete",
+}
+
+
+class Subscription:
+    """One connected stream: a bounded queue of frames for one topic"""
+
+    __slots__ = ("topic", "queue", "dropped")
+
+    def __init__(self, topic: str, queue_size: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+
+class TimelineHub:
+    """In-process pub/sub that fans timeline events out to open streams
+
+    Frames are encoded once per event and shared by every subscriber. A
+    subscriber whose queue is full is too slow to keep up and is dropped;
+    its client reconnects with Last-Event-ID and catches up from the
+    history, which keeps the latest events so resumes are served from
+    memory. Event ids are the posts_db_api change feed positions.
+    """
+
+    def __init__(self, queue_size: int, history_size: int):
+        self._queue_size = queue_size
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._history: Deque[Tuple[int, Tuple[str, ...], bytes]] = deque(
+            maxlen=history_size
+        )
+        # Resumes from before this position cannot be replayed completely
+        self._floor: Optional[int] = None
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._topics.values())
+
+    def publish(self, position: int, event: dict):
+        """Change feed listener: pushes new, edited and deleted posts to timelines"""
+        name = EVENT_NAMES.get(event["topic"])
+        if name is None:
+            return
+        payload = event["payload"]
+        frame = (
+            f"id: {position}\nevent: {name}\ndata: ".encode()
+            + json.dumps(payload, separators=(",", ":")).encode()
+            + b"\n\n"
+        )
+        topics = ("timeline", f"timeline:{payload['author_id']}")
+        if len(self._history) == self._history.maxlen:
+            self._floor = self._history[0][0]
+        self._history.append((position, topics, frame))
+        for topic in topics:
+            for subscription in list(self._topics.get(topic, ())):
+                self._offer(subscription, frame)
+
+    def reset(self, position: int):
+        """Change feed listener: the feed (re)starts after `position`
+
+        Nothing before it can be replayed, so open streams are told to reload.
+        """
+        self._history.clear()
+        self._floor = position
+        for subscriptions in self._topics.values():
+            for subscription in list(subscriptions):
+                self._offer(subscription, RESET)
+
+    def heartbeat(self):
+        # Idle streams only; a busy one already proves the connection alive
+        for subscriptions in self._topics.values():
+            for subscription in subscriptions:
+                if subscription.queue.empty():
+                    subscription.queue.put_nowait(KEEPALIVE)
+
+    def _offer(self, subscription: Subscription, frame: bytes):
+        try:
+            subscription.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            subscription.dropped = True
+            self._unsubscribe(subscription)
+            Metrics.inc("timeline_stream_dropped_total")
+
+    def _unsubscribe(self, subscription: Subscription):
+        subscriptions = self._topics.get(subscription.topic)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._topics[subscription.topic]
+
+    def _replay(self, topic: str, last_event_id: int) -> List[bytes]:
+        if self._floor is None or last_event_id < self._floor:
+            return [RESET]
+        return [
+            frame
+            for position, topics, frame in self._history
+            if position > last_event_id and topic in topics
+        ]
+
+    async def stream(
+        self, topic: str, last_event_id: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Server-sent events for one timeline until the client goes away"""
+        subscription = Subscription(topic, self._queue_size)
+        # Replay and subscribe without yielding in between, so no event can
+        # fall between the two
+        backlog = []
+        if last_event_id is not None:
+            backlog = self._replay(topic, last_event_id)
+        self._topics.setdefault(topic, set()).add(subscription)
+        Metrics.inc("timeline_stream_connections_total")
+        try:
+            yield b"retry: 3000\n\n"
+            for frame in backlog:
+                yield frame
+            while True:
+                frame = await subscription.queue.get()
+                if subscription.dropped:
+                    return
+                yield frame
+        finally:
+            self._unsubscribe(subscription)
+
+    async def run_heartbeat(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.heartbeat()
+            Metrics.set("timeline_stream_connections", self.connections)
+
+
+hub = TimelineHub(
+    Settings.TIMELINE_STREAM_QUEUE_SIZE, Settings.TIMELINE_STREAM_HISTORY_SIZE
+)
@@ -1,17 +1,24 @@
 from typing import Optional
-from fastapi import Request, HTTPException, status
+from fastapi import Depends, Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from src.config import Settings
+from src.rate_limit import get_gateway_user_id
 
 
 security = HTTPBearer(auto_error=False)
 
 
 async def get_current_user_id(
-    request: Request, credentials: HTTPAuthorizationCredentials | None = None
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
 ) -> int:
     """Extracts user_id from the JWT token"""
+    # Already verified by the gateway
+    user_id = get_gateway_user_id(request)
+    if user_id is not None:
+        return user_id
+
     token = None
     if credentials:
         token = credentials.credentials
@@ -65,7 +72,8 @@ async def get_current_user_id(
 
 
 async def get_current_user_id_optional(
-    request: Request, credentials: HTTPAuthorizationCredentials | None = None
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
 ) -> Optional[int]:
     """Optionally extracts user_id from the token"""
     try:
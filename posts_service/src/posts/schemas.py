@@ -1,6 +1,7 @@
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
+from src.media.schemas import MediaSchema
 
 
 class PostCreateSchema(BaseModel):
@@ -12,7 +13,7 @@ class PostCreateSchema(BaseModel):
     content: str = Field(default="", max_length=10000, description="Post content")
     tags: List[str] = Field(default=[], description="Post tags")
     media: Optional[List[str]] = Field(
-        default=None, description="Links to media files"
+        default=None, description="Uploaded media ids or links to media files"
     )
     parent_post_id: Optional[int] = Field(
         default=None, description="Parent post ID (for comments)"
@@ -42,6 +43,10 @@ class PostSchema(BaseModel):
     created_at: datetime
     is_deleted: bool
     is_visible: bool
+    version: int = 1
+    attachments: List[MediaSchema] = Field(
+        default=[], description="Uploaded files among media, with their variants"
+    )
     likes_count: int = 0
     reposts_count: int = 0
     comments_count: int = 0
@@ -49,6 +54,27 @@ class PostSchema(BaseModel):
     is_reposted: bool = False
 
 
+class ThreadNodeSchema(PostSchema):
+    """Post inside a reply tree; a deleted one is an empty placeholder"""
+
+    author_id: int | None
+    depth: int
+    path: List[int]
+
+
+class ThreadSchema(BaseModel):
+    """Reply tree of a post, ordered depth-first"""
+
+    items: List[ThreadNodeSchema]
+    next_cursor: int | None = None
+
+
+class PostsCountSchema(BaseModel):
+    """Number of live posts a user has written"""
+
+    posts_count: int
+
+
 class CommentCreateSchema(BaseModel):
     """Schema for creating a comment"""
 
@@ -57,5 +83,5 @@ class CommentCreateSchema(BaseModel):
     )
     tags: List[str] = Field(default=[], description="Comment tags")
     media: Optional[List[str]] = Field(
-        default=None, description="Links to media files"
+        default=None, description="Uploaded media ids or links to media files"
     )
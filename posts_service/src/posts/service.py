@@ -1,20 +1,56 @@
 from typing import Optional, List
+import httpx
 from fastapi import HTTPException, status
 from src.posts.schemas import (
     PostCreateSchema,
     PostUpdateSchema,
     PostSchema,
+    PostsCountSchema,
+    ThreadNodeSchema,
+    ThreadSchema,
     CommentCreateSchema,
 )
+from src.cache import cache
+from src.conditional import (
+    PreconditionFailed,
+    check_not_modified,
+    entity_tag,
+    if_match_version,
+)
+from src.config import Settings
+from src.media.service import MediaService
 from src.posts.http_clients import PostsDBClient, UsersDBClient
 
 
 class PostService:
     """Service for working with posts"""
 
+    @staticmethod
+    def changed_scopes(topic: str, payload: dict) -> List[str]:
+        """Cache scopes affected by a posts_db_api change event"""
+        if topic == "post.created":
+            return ["timeline", f"timeline:{payload['author_id']}"]
+        if topic in ("post.updated", "post.deleted"):
+            return [
+                f"post:{payload['id']}",
+                "timeline",
+                f"timeline:{payload['author_id']}",
+            ]
+        return []
+
+    @staticmethod
+    async def _attach_media(posts: List[PostSchema]):
+        """Fills in the uploaded files posts carry among their media"""
+        media = await MediaService.get_many(
+            m for post in posts for m in post.media or ()
+        )
+        for post in posts:
+            post.attachments = [media[m] for m in post.media or () if m in media]
+
     @staticmethod
     async def create_post(author_id: int, post_data: PostCreateSchema) -> PostSchema:
         """Creates a new post"""
+        await MediaService.check_attached(post_data.media)
         post_dict = {
             "author_id": author_id,
             "header": post_data.header,
@@ -28,12 +64,13 @@ class PostService:
 
         try:
             await PostsDBClient.create_post(post_dict)
+            await cache.invalidate("timeline", f"timeline:{author_id}")
             # Fetch the created post (need a method to get the latest post)
             # For now, return a simplified version
             posts = await PostsDBClient.get_posts(author_id=author_id, limit=1)
             if posts:
                 post = posts[0]
-                return PostSchema(
+                result = PostSchema(
                     id=post["id"],
                     author_id=post["author_id"],
                     parent_post_id=post.get("parent_post_id"),
@@ -44,11 +81,16 @@ class PostService:
                     created_at=post["created_at"],
                     is_deleted=post.get("is_deleted", False),
                     is_visible=post.get("is_visible", True),
+                    version=post.get("version", 1),
                 )
+                await PostService._attach_media([result])
+                return result
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error while creating post",
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -57,10 +99,17 @@ class PostService:
 
     @staticmethod
     async def get_post(
-        post_id: int, current_user_id: int | None = None
+        post_id: int,
+        current_user_id: int | None = None,
+        if_none_match: str | None = None,
     ) -> PostSchema:
-        """Retrieves a post by ID"""
-        post = await PostsDBClient.get_post(post_id)
+        """Retrieves a post by ID; NotModified if the client's copy is current"""
+        post = await cache.get_or_load(
+            f"post:{post_id}",
+            post_id,
+            lambda: PostsDBClient.get_post(post_id),
+            ttl=Settings.CACHE_POST_TTL_SECONDS,
+        )
         if not post:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
@@ -71,9 +120,14 @@ class PostService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
             )
 
+        # Answered before any of the body is built
+        check_not_modified(
+            if_none_match, entity_tag("post", post["id"], post.get("version", 1))
+        )
+
         # Fetch stats (likes, reposts, comments)
         # For now, return basic information
-        return PostSchema(
+        result = PostSchema(
             id=post["id"],
             author_id=post["author_id"],
             parent_post_id=post.get("parent_post_id"),
@@ -84,14 +138,27 @@ class PostService:
             created_at=post["created_at"],
             is_deleted=post.get("is_deleted", False),
             is_visible=post.get("is_visible", True),
+            version=post.get("version", 1),
         )
+        await PostService._attach_media([result])
+        return result
 
     @staticmethod
     async def get_feed(
         current_user_id: int, limit: int = 20, offset: int = 0
     ) -> List[PostSchema]:
         """Retrieves the post feed (currently just all posts)"""
-        posts = await PostsDBClient.get_posts(limit=limit, offset=offset)
+        posts = await cache.get_or_load(
+            "timeline",
+            f"{limit}:{offset}",
+            lambda: PostsDBClient.get_posts(
+                limit=limit,
+                offset=offset,
+                with_counts=True,
+                fields=PostsDBClient.POST_FIELDS,
+            ),
+            ttl=Settings.CACHE_TIMELINE_TTL_SECONDS,
+        )
         result = []
         for post in posts:
             result.append(
@@ -106,8 +173,13 @@ class PostService:
                     created_at=post["created_at"],
                     is_deleted=post.get("is_deleted", False),
                     is_visible=post.get("is_visible", True),
+                    version=post.get("version", 1),
+                    likes_count=post.get("like_count", 0),
+                    reposts_count=post.get("repost_count", 0),
+                    comments_count=post.get("reply_count", 0),
                 )
             )
+        await PostService._attach_media(result)
         return result
 
     @staticmethod
@@ -115,8 +187,17 @@ class PostService:
         user_id: int, limit: int = 20, offset: int = 0
     ) -> List[PostSchema]:
         """Retrieves posts for a user"""
-        posts = await PostsDBClient.get_posts(
-            author_id=user_id, limit=limit, offset=offset
+        posts = await cache.get_or_load(
+            f"timeline:{user_id}",
+            f"{limit}:{offset}",
+            lambda: PostsDBClient.get_posts(
+                author_id=user_id,
+                limit=limit,
+                offset=offset,
+                with_counts=True,
+                fields=PostsDBClient.POST_FIELDS,
+            ),
+            ttl=Settings.CACHE_TIMELINE_TTL_SECONDS,
         )
         result = []
         for post in posts:
@@ -132,30 +213,78 @@ class PostService:
                     created_at=post["created_at"],
                     is_deleted=post.get("is_deleted", False),
                     is_visible=post.get("is_visible", True),
+                    version=post.get("version", 1),
+                    likes_count=post.get("like_count", 0),
+                    reposts_count=post.get("repost_count", 0),
+                    comments_count=post.get("reply_count", 0),
                 )
             )
+        await PostService._attach_media(result)
         return result
 
+    @staticmethod
+    async def count_user_posts(user_id: int) -> PostsCountSchema:
+        """Counts a user's posts"""
+        # In the user's timeline scope, so a new or deleted post refreshes it
+        count = await cache.get_or_load(
+            f"timeline:{user_id}",
+            "count",
+            lambda: PostsDBClient.count_posts(author_id=user_id),
+            ttl=Settings.CACHE_TIMELINE_TTL_SECONDS,
+        )
+        return PostsCountSchema(posts_count=count)
+
     @staticmethod
     async def update_post(
-        post_id: int, author_id: int, post_data: PostUpdateSchema
+        post_id: int,
+        author_id: int,
+        post_data: PostUpdateSchema,
+        if_match: str | None = None,
     ) -> PostSchema:
-        """Updates a post (only the author can update)"""
-        post = await PostsDBClient.get_post(post_id)
-        if not post:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
-            )
+        """Updates a post (only the author can update)
 
-        if post["author_id"] != author_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You do not have permission to edit this post",
+        One conditional write checks the author and, given If-Match, the
+        version the client read, so a concurrent edit is never overwritten.
+        """
+        version = if_match_version(if_match, "post", post_id)
+        await MediaService.check_attached(post_data.media)
+        try:
+            post = await PostsDBClient.update_post(
+                post_id,
+                author_id,
+                post_data.model_dump(exclude_none=True),
+                version=version,
             )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == status.HTTP_404_NOT_FOUND:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+                )
+            if e.response.status_code == status.HTTP_403_FORBIDDEN:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="You do not have permission to edit this post",
+                )
+            if e.response.status_code == status.HTTP_409_CONFLICT:
+                raise PreconditionFailed("Post has changed since it was read")
+            raise
 
-        # Post update (need to add a method in PostsDBClient)
-        # For now, return the existing post
-        return await PostService.get_post(post_id, author_id)
+        await cache.invalidate(f"post:{post_id}", "timeline", f"timeline:{author_id}")
+        result = PostSchema(
+            id=post["id"],
+            author_id=post["author_id"],
+            parent_post_id=post.get("parent_post_id"),
+            header=post["header"],
+            content=post["content"],
+            tags=post.get("tags", []),
+            media=post.get("media"),
+            created_at=post["created_at"],
+            is_deleted=post.get("is_deleted", False),
+            is_visible=post.get("is_visible", True),
+            version=post.get("version", 1),
+        )
+        await PostService._attach_media([result])
+        return result
 
     @staticmethod
     async def delete_post(post_id: int, author_id: int) -> bool:
@@ -172,12 +301,31 @@ class PostService:
                 detail="You do not have permission to delete this post",
             )
 
-        return await PostsDBClient.delete_post(post_id)
+        deleted = await PostsDBClient.delete_post(post_id)
+        if deleted:
+            await cache.invalidate(
+                f"post:{post_id}", "timeline", f"timeline:{author_id}"
+            )
+        return deleted
+
+    @staticmethod
+    async def like_post(post_id: int, user_id: int) -> None:
+        """Likes a post; liking it again is a no-op"""
+        liked = await PostsDBClient.like_post(post_id, user_id)
+        if liked is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+            )
+
+    @staticmethod
+    async def unlike_post(post_id: int, user_id: int) -> None:
+        """Removes the user's like from a post"""
+        await PostsDBClient.unlike_post(post_id, user_id)
 
     @staticmethod
     async def get_comments(post_id: int) -> List[PostSchema]:
         """Retrieves comments for a post"""
-        comments = await PostsDBClient.get_comments(post_id)
+        comments = await PostsDBClient.get_comments(post_id, with_counts=True)
         result = []
         for comment in comments:
             result.append(
@@ -192,10 +340,48 @@ class PostService:
                     created_at=comment["created_at"],
                     is_deleted=comment.get("is_deleted", False),
                     is_visible=comment.get("is_visible", True),
+                    version=comment.get("version", 1),
+                    likes_count=comment.get("like_count", 0),
+                    reposts_count=comment.get("repost_count", 0),
+                    comments_count=comment.get("reply_count", 0),
                 )
             )
+        await PostService._attach_media(result)
         return result
 
+    @staticmethod
+    async def get_thread(
+        post_id: int, depth: int = 10, breadth: int = 50, cursor: int | None = None
+    ) -> ThreadSchema:
+        """Retrieves the whole reply tree of a post"""
+        thread = await PostsDBClient.get_thread(post_id, depth, breadth, cursor)
+        if not thread or not thread.get("items"):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+            )
+
+        items = []
+        for node in thread["items"]:
+            items.append(
+                ThreadNodeSchema(
+                    id=node["id"],
+                    author_id=node.get("author_id"),
+                    parent_post_id=node.get("parent_post_id"),
+                    header=node.get("header", ""),
+                    content=node.get("content", ""),
+                    tags=node.get("tags", []),
+                    media=node.get("media"),
+                    created_at=node["created_at"],
+                    is_deleted=node.get("is_deleted", False),
+                    is_visible=node.get("is_visible", True),
+                    version=node.get("version", 1),
+                    depth=node["depth"],
+                    path=node["path"],
+                )
+            )
+        await PostService._attach_media(items)
+        return ThreadSchema(items=items, next_cursor=thread.get("next_cursor"))
+
     @staticmethod
     async def create_comment(
         post_id: int, author_id: int, comment_data: CommentCreateSchema
@@ -208,6 +394,7 @@ class PostService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
             )
 
+        await MediaService.check_attached(comment_data.media)
         post_dict = {
             "author_id": author_id,
             "header": "",  # Comments do not have a header
@@ -221,10 +408,11 @@ class PostService:
 
         try:
             await PostsDBClient.create_post(post_dict)
+            await cache.invalidate("timeline", f"timeline:{author_id}")
             comments = await PostsDBClient.get_comments(post_id)
             if comments:
                 comment = comments[-1]  # Latest comment
-                return PostSchema(
+                result = PostSchema(
                     id=comment["id"],
                     author_id=comment["author_id"],
                     parent_post_id=comment.get("parent_post_id"),
@@ -235,11 +423,16 @@ class PostService:
                     created_at=comment["created_at"],
                     is_deleted=comment.get("is_deleted", False),
                     is_visible=comment.get("is_visible", True),
+                    version=comment.get("version", 1),
                 )
+                await PostService._attach_media([result])
+                return result
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error while creating comment",
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
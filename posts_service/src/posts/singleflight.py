@@ -0,0 +1,51 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from src.metrics import Metrics
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits the call already running for `key`, or starts `fn()` for it"""
+        call = self._calls.get(key)
+        if call is None:
+            Metrics.inc("singleflight_issued_total", call=self.name)
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            Metrics.inc("singleflight_coalesced_total", call=self.name)
+        # A caller that gets cancelled must not cancel the shared call
+        return await asyncio.shield(call)
+
+
+def singleflight(key: Optional[Callable[..., Hashable]] = None):
+    """Decorator coalescing concurrent calls of an async function
+
+    `key` maps the call arguments to the coalescing key; by default the
+    positional and keyword arguments themselves are used, so they must be
+    hashable. Results are shared between callers and must not be mutated.
+    """
+
+    def decorator(fn):
+        group = SingleFlight(fn.__qualname__)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            call_key = (
+                key(*args, **kwargs)
+                if key is not None
+                else (args, tuple(sorted(kwargs.items())))
+            )
+            return await group.do(call_key, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,175 @@
+import math
+import time
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException, status
+
+from src.config import Settings
+from src.deadline import DeadlineExceeded, propagate, remaining
+from src.metrics import Metrics
+
+
+class CircuitOpen(HTTPException):
+    """Call refused because its upstream's circuit breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{name} is unavailable, retry later",
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+        )
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing, then probes it
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    fail fast for `open_seconds`. Then it is half-open: one call at a time
+    goes through as a probe; a success closes the circuit, a failure opens
+    it again.
+    """
+
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+    def __init__(self, name: str, failure_threshold: int, open_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        Metrics.set("circuit_state", self.state, upstream=self.name)
+
+    def before(self) -> bool:
+        """Lets a call through, raising CircuitOpen otherwise; True for probes"""
+        if self.state == self.CLOSED:
+            return False
+        retry_after = self.opened_at + self.open_seconds - time.monotonic()
+        if self.state == self.OPEN and retry_after > 0:
+            raise CircuitOpen(self.name, retry_after)
+        if self.probing:
+            raise CircuitOpen(self.name, self.open_seconds)
+        self._set(self.HALF_OPEN)
+        self.probing = True
+        return True
+
+    def record(self, ok: Optional[bool], probe: bool):
+        """Counts a call's outcome; None when it says nothing about upstream"""
+        if probe:
+            self.probing = False
+        if ok is None:
+            return
+        if ok:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+            return
+        self.failures += 1
+        if probe or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                Metrics.inc("circuit_opened_total", upstream=self.name)
+            self.opened_at = time.monotonic()
+            self._set(self.OPEN)
+
+    def _set(self, state: int):
+        self.state = state
+        Metrics.set("circuit_state", state, upstream=self.name)
+
+
+class Upstream:
+    """Shared HTTP client for one upstream API, behind a circuit breaker
+
+    Each call's timeout is the smaller of UPSTREAM_TIMEOUT_SECONDS and what
+    is left of the current request's deadline, and that timeout travels on
+    as the upstream's own deadline, so it can stop working when we stop
+    waiting. Calls past the deadline fail with 504 before they are sent.
+    """
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.base_url = base_url
+        self.breaker = CircuitBreaker(
+            name, Settings.BREAKER_FAILURE_THRESHOLD, Settings.BREAKER_OPEN_SECONDS
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client per upstream instead of one per call: setting a
+        # client up costs far more than the requests it makes
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=Settings.UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=Settings.UPSTREAM_MAX_CONNECTIONS,
+                    keepalive_expiry=Settings.UPSTREAM_KEEPALIVE_SECONDS,
+                ),
+            )
+        return self._client
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[httpx.Headers] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        timeout = Settings.UPSTREAM_TIMEOUT_SECONDS
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise DeadlineExceeded()
+            timeout = min(timeout, left)
+        # A wait cut short by our caller's deadline says nothing about the
+        # upstream, or any caller could open the circuit for everyone
+        shortened = timeout < Settings.UPSTREAM_TIMEOUT_SECONDS
+        headers = httpx.Headers(headers)
+        headers.update(propagate(timeout))
+        probe = self.breaker.before()
+        ok = None
+        try:
+            response = await self.client.request(
+                method, url, timeout=timeout, headers=headers, **kwargs
+            )
+        except httpx.TimeoutException as e:
+            if shortened:
+                raise DeadlineExceeded() from e
+            ok = False
+            raise
+        except httpx.TransportError:
+            ok = False
+            raise
+        else:
+            # A 504 is the upstream honouring the deadline we passed on
+            if response.status_code == 504:
+                raise DeadlineExceeded()
+            ok = response.status_code < 500
+            return response
+        finally:
+            self.breaker.record(ok, probe)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+posts_db = Upstream("posts_db_api", Settings.POSTS_DB_API_URL)
+users_db = Upstream("users_db_api", Settings.USERS_DB_API_URL)
@@ -0,0 +1,43 @@
+import httpx
+import pytest
+
+from src.admission import AdaptiveLimiter, AdmissionMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def answering(status_code):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status_code})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+async def limit_after(status_code, requests=20):
+    limiter = AdaptiveLimiter("test", latency_target=1, initial=10, minimum=1)
+    app = AdmissionMiddleware(answering(status_code), limiter)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        for _ in range(requests):
+            await c.get("/api/v1/posts/1")
+    return limiter.limit
+
+
+async def test_server_errors_back_the_limit_off():
+    assert await limit_after(500) < 10
+
+
+@pytest.mark.parametrize("status_code", [503, 504])
+async def test_shedding_and_deadlines_leave_the_limit_alone(status_code):
+    # e.g. a caller sending X-Deadline-Ms: 100 on every request
+    assert await limit_after(status_code) == 10
+
+
+async def test_client_errors_are_successes():
+    assert await limit_after(404) == 10
@@ -0,0 +1,186 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.cache import Cache, MemoryBackend, RedisBackend
+from src.config import Settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=100)
+    # Same protocol as a real server, run in-process
+    backend = RedisBackend("redis://localhost")
+    backend._client = fakeredis.FakeAsyncRedis()
+    return backend
+
+
+class Loader:
+    """Loader that counts its calls and returns `value`"""
+
+    def __init__(self, value, delay: float = 0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+async def test_set_get_and_expire(backend):
+    await backend.set("a", b"1", ttl=0.05)
+    assert await backend.get_many(["a", "b"]) == [b"1", None]
+    await asyncio.sleep(0.1)
+    assert await backend.get("a") is None
+
+
+async def test_add_only_when_missing(backend):
+    assert await backend.add("lock", b"1", ttl=5)
+    assert not await backend.add("lock", b"2", ttl=5)
+    assert await backend.get("lock") == b"1"
+    await backend.delete("lock")
+    assert await backend.add("lock", b"3", ttl=5)
+
+
+async def test_counters_expire_unless_touched(backend):
+    assert await backend.incr("v", ttl=0.1) == 1
+    assert await backend.incr("v", ttl=0.1) == 2
+    await asyncio.sleep(0.06)
+    await backend.touch(["v", "missing"], ttl=0.1)
+    await asyncio.sleep(0.06)
+    assert await backend.get("v") == b"2"
+    assert await backend.get("missing") is None
+    await asyncio.sleep(0.1)
+    assert await backend.get("v") is None
+    assert await backend.incr("v", ttl=0.1) == 1
+
+
+async def test_memory_counters_are_bounded():
+    backend = MemoryBackend(max_entries=100)
+    for i in range(1000):
+        await backend.incr(f"post:{i}:version", ttl=0.01)
+    await asyncio.sleep(0.02)
+    await backend.incr("post:0:version", ttl=0.01)
+    assert len(backend._counters) == 1
+
+
+async def test_get_or_load_caches(backend):
+    cache = Cache(backend, "test")
+    loader = Loader({"id": 1})
+    assert await cache.get_or_load("post:1", 1, loader, ttl=5) == {"id": 1}
+    assert await cache.get_or_load("post:1", 1, loader, ttl=5) == {"id": 1}
+    assert loader.calls == 1
+
+
+async def test_none_is_not_cached(backend):
+    cache = Cache(backend, "test")
+    loader = Loader(None)
+    assert await cache.get_or_load("post:1", 1, loader, ttl=5) is None
+    assert await cache.get_or_load("post:1", 1, loader, ttl=5) is None
+    assert loader.calls == 2
+
+
+async def test_invalidate_orphans_only_its_scope(backend):
+    cache = Cache(backend, "test")
+    post, other = Loader("post"), Loader("other")
+    await cache.get_or_load("post:1", 1, post, ttl=5)
+    await cache.get_or_load("post:2", 2, other, ttl=5)
+    await cache.invalidate("post:1")
+    await cache.get_or_load("post:1", 1, post, ttl=5)
+    await cache.get_or_load("post:2", 2, other, ttl=5)
+    assert (post.calls, other.calls) == (2, 1)
+    assert await cache.version("post:1") == "0.1"
+
+
+async def test_flush_orphans_every_scope(backend):
+    cache = Cache(backend, "test")
+    post, timeline = Loader("post"), Loader("timeline")
+    await cache.get_or_load("post:1", 1, post, ttl=5)
+    await cache.get_or_load("timeline", "20:0", timeline, ttl=5)
+    await cache.flush()
+    await cache.get_or_load("post:1", 1, post, ttl=5)
+    await cache.get_or_load("timeline", "20:0", timeline, ttl=5)
+    assert (post.calls, timeline.calls) == (2, 2)
+    assert await cache.version("post:1") == "1.0"
+
+
+async def test_versions_outlive_entries_written_under_them(backend, monkeypatch):
+    monkeypatch.setattr(Settings, "CACHE_VERSION_TTL_SECONDS", 0.1)
+    cache = Cache(backend, "test")
+    await cache.invalidate("post:1")
+    await asyncio.sleep(0.06)
+    # Written under version 1, which a write keeps alive
+    await cache.get_or_load("post:1", 1, Loader("fresh"), ttl=5)
+    await asyncio.sleep(0.06)
+    assert await cache.version("post:1") == "0.1"
+    await asyncio.sleep(0.1)
+    assert await cache.version("post:1") == "0.0"
+
+
+async def test_concurrent_misses_share_one_load(backend):
+    cache = Cache(backend, "test")
+    loader = Loader("post", delay=0.05)
+    results = await asyncio.gather(
+        *(cache.get_or_load("post:1", 1, loader, ttl=5) for _ in range(10))
+    )
+    assert results == ["post"] * 10
+    assert loader.calls == 1
+
+
+async def test_lock_lets_one_replica_load(backend, monkeypatch):
+    monkeypatch.setattr(Settings, "CACHE_LOCK_POLL_SECONDS", 0.01)
+    # Two replicas: separate Cache objects over the same backend
+    first, second = Cache(backend, "test"), Cache(backend, "test")
+    loader = Loader("post", delay=0.05)
+    results = await asyncio.gather(
+        first.get_or_load("post:1", 1, loader, ttl=5),
+        second.get_or_load("post:1", 1, loader, ttl=5),
+    )
+    assert results == ["post", "post"]
+    assert loader.calls == 1
+    assert await backend.get("test:post:1:v0.0:1:lock") is None
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_backend(redis_server):
+    backend = RedisBackend("redis://localhost")
+    backend._client = fakeredis.FakeAsyncRedis(server=redis_server)
+    return backend
+
+
+async def test_reads_go_to_the_loader_while_redis_is_down(
+    redis_backend, redis_server
+):
+    cache = Cache(redis_backend, "test")
+    loader = Loader("post")
+    redis_server.connected = False
+    assert await cache.get_or_load("post:1", 1, loader, ttl=5) == "post"
+    assert await cache.get_or_load("post:1", 1, loader, ttl=5) == "post"
+    assert loader.calls == 2
+
+
+async def test_cache_picks_up_again_once_redis_is_back(redis_backend, redis_server):
+    cache = Cache(redis_backend, "test")
+    loader = Loader("post")
+    redis_server.connected = False
+    await cache.get_or_load("post:1", 1, loader, ttl=5)
+    redis_server.connected = True
+    await cache.get_or_load("post:1", 1, loader, ttl=5)
+    await cache.get_or_load("post:1", 1, loader, ttl=5)
+    assert loader.calls == 2
@@ -0,0 +1,53 @@
+import fakeredis
+import pytest
+from starlette.requests import Request
+
+from src.config import Settings
+from src.metrics import Metrics
+from src.rate_limit import Limit, RedisLimiter, get_client_ip
+
+
+@pytest.fixture(autouse=True)
+def gateway_secret(monkeypatch):
+    monkeypatch.setattr(Settings, "GATEWAY_SECRET", "secret")
+
+
+def request(**headers):
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+            "client": ("10.0.0.9", 1234),
+        }
+    )
+
+
+def test_forwarded_for_from_anyone_is_ignored():
+    assert get_client_ip(request(x_forwarded_for="1.2.3.4")) == "10.0.0.9"
+    assert get_client_ip(request(x_real_ip="1.2.3.4")) == "10.0.0.9"
+
+
+def test_wrong_secret_is_ignored():
+    headers = {"x_forwarded_for": "1.2.3.4", "x_gateway_secret": "guess"}
+    assert get_client_ip(request(**headers)) == "10.0.0.9"
+
+
+def test_gateway_hop_is_believed():
+    headers = {"x_forwarded_for": "6.6.6.6, 1.2.3.4", "x_gateway_secret": "secret"}
+    assert get_client_ip(request(**headers)) == "1.2.3.4"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_redis_outage_lets_requests_in(anyio_backend):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    limiter = RedisLimiter("redis://localhost")
+    limiter._client = fakeredis.FakeAsyncRedis(server=server)
+    limiter._script = limiter._client.register_script(RedisLimiter.SCRIPT)
+    errors = Metrics._values.get("rate_limit_errors_total", 0)
+    assert await limiter.take("rl:posts:ip:1.2.3.4", Limit(1, 1)) == 0
+    assert Metrics._values["rate_limit_errors_total"] == errors + 1
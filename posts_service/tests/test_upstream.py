@@ -0,0 +1,25 @@
+import httpx
+import pytest
+
+from src.upstream import Upstream
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def test_caller_headers_go_out_with_the_deadline():
+    sent = []
+    upstream = Upstream("test", "http://test")
+    upstream._client = httpx.AsyncClient(
+        base_url="http://test",
+        transport=httpx.MockTransport(
+            lambda request: sent.append(request) or httpx.Response(200)
+        ),
+    )
+    await upstream.get("/posts/1", headers={"If-None-Match": '"post-1-v2"'})
+    assert sent[0].headers["If-None-Match"] == '"post-1-v2"'
+    assert "X-Deadline-Ms" in sent[0].headers
@@ -0,0 +1,110 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+if [[ $# -lt 1 ]]; then
+  echo "Usage: $0 <db-api-path> [iterations=500]" >&2
+  exit 1
+fi
+
+SERVICE_PATH=$(realpath "$1")
+ITERATIONS="${2:-500}"
+
+if [[ ! -d "$SERVICE_PATH" ]]; then
+  echo "Service path '$SERVICE_PATH' does not exist" >&2
+  exit 1
+fi
+
+SERVICE_NAME=$(basename "$SERVICE_PATH")
+
+# Needs the service's DB_* variables and at least 100 rows in its main table.
+echo "[bench-list:$SERVICE_NAME] Timing $ITERATIONS pages of 100 rows, ORM+Pydantic vs rows+orjson..."
+cd "$SERVICE_PATH"
+ITERATIONS="$ITERATIONS" python - <<'PY'
+import asyncio
+import importlib
+import os
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import select
+
+from src.api.responses import FastJSONResponse
+from src.api.schemas import ResponseData
+from src.core import session_scope
+
+PAGE = 100
+ITERATIONS = int(os.environ["ITERATIONS"])
+
+for package, model, repository, schema in (
+    ("posts", "Posts", "PostsRepository", "PostSchema"),
+    ("users", "Users", "UsersRepository", "UserSchema"),
+    ("auth", "Tokens", "TokensRepository", "TokenSchema"),
+):
+    try:
+        models = importlib.import_module(f"src.{package}.models")
+    except ModuleNotFoundError:
+        continue
+    Model = getattr(models, model)
+    Repository = getattr(importlib.import_module(f"src.{package}.repository"), repository)
+    Schema = getattr(importlib.import_module(f"src.{package}.schemas"), schema)
+    break
+
+field = create_model_field("Response", ResponseData, mode="serialization")
+
+
+async def before():
+    # What the endpoints did: ORM entities, model_validate per row, then
+    # FastAPI validating and serializing the ResponseData envelope.
+    t0 = time.perf_counter()
+    async with session_scope() as session:
+        query_res = await session.execute(select(Model).limit(PAGE))
+        rows = query_res.scalars().all()
+    t1 = time.perf_counter()
+    data = [Schema.model_validate(row, from_attributes=True) for row in rows]
+    content = await serialize_response(
+        field=field, response_content={"success": True, "data": data}
+    )
+    body = JSONResponse(content).body
+    return t1 - t0, time.perf_counter() - t1, len(rows), len(body)
+
+
+async def after():
+    t0 = time.perf_counter()
+    rows = await Repository.list({}, limit=PAGE)
+    t1 = time.perf_counter()
+    data = [dict(row) for row in rows]
+    body = FastJSONResponse({"success": True, "data": data}).body
+    return t1 - t0, time.perf_counter() - t1, len(rows), len(body)
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run(name, path):
+    for _ in range(20):
+        await path()
+    totals, sers = [], []
+    for _ in range(ITERATIONS):
+        fetch, ser, n, size = await path()
+        totals.append(fetch + ser)
+        sers.append(ser)
+    p99 = pct(totals, 0.99)
+    ser99 = pct(sers, 0.99)
+    print(
+        f"{name:>6}: rows={n} body={size}B "
+        f"p50={pct(totals, 0.5) * 1000:.2f}ms p99={p99 * 1000:.2f}ms "
+        f"serialize_p99={ser99 * 1000:.2f}ms ({ser99 / p99:.0%} of p99)"
+    )
+
+
+async def main():
+    await run("before", before)
+    await run("after", after)
+
+
+asyncio.run(main())
+PY
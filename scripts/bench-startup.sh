@@ -0,0 +1,42 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+if [[ $# -lt 1 ]]; then
+  echo "Usage: $0 <service-path> [runs=10]" >&2
+  exit 1
+fi
+
+SERVICE_PATH=$(realpath "$1")
+RUNS="${2:-10}"
+
+if [[ ! -d "$SERVICE_PATH" ]]; then
+  echo "Service path '$SERVICE_PATH' does not exist" >&2
+  exit 1
+fi
+
+SERVICE_NAME=$(basename "$SERVICE_PATH")
+
+# The *_db_api settings require DB variables; nothing connects while importing.
+export DB_NAME="${DB_NAME:-bench}" DB_USER="${DB_USER:-bench}" DB_PASSWORD="${DB_PASSWORD:-bench}"
+export DB_HOST="${DB_HOST:-localhost}" DB_PORT="${DB_PORT:-5432}"
+
+echo "[bench-startup:$SERVICE_NAME] Importing src.main $RUNS times in fresh interpreters..."
+cd "$SERVICE_PATH"
+for _ in $(seq "$RUNS"); do
+  python - <<'PY'
+import resource
+import sys
+import time
+
+start = time.perf_counter()
+import src.main  # noqa: F401
+elapsed = time.perf_counter() - start
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(f"{elapsed * 1000:.1f} {rss_mb:.1f} {int('psycopg2' in sys.modules)}")
+PY
+done | awk -v name="$SERVICE_NAME" '
+  { t += $1; r += $2; p += $3; if (min == "" || $1 < min) min = $1 }
+  END {
+    printf "[bench-startup:%s] import avg %.1f ms (min %.1f ms), max RSS avg %.1f MB, psycopg2 loaded in %d/%d runs\n",
+      name, t / NR, min, r / NR, p, NR
+  }'
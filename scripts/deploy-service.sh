@@ -55,7 +55,7 @@ pip install --upgrade pip && \
 pip install uv && \
 uv pip install --editable . && \
 tmux kill-session -t '$SERVICE_NAME' >/dev/null 2>&1 || true && \
-tmux new -ds '$SERVICE_NAME' \"source .venv/bin/activate && uv run uvicorn src.main:app --host 0.0.0.0 --port $APP_PORT\""
+tmux new -ds '$SERVICE_NAME' \"source .venv/bin/activate && SERVER_PORT=$APP_PORT python -m src.main\""
 
 echo "[deploy:$SERVICE_NAME] Установка зависимостей и запуск сервиса..."
 ssh -p "$SSH_PORT" -o StrictHostKeyChecking=no dev@localhost "$START_CMD"
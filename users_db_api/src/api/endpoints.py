@@ -1,10 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI
-from src.users.schemas import UserSchema
-from src.users.service import UserService
+from typing import List
+from fastapi import FastAPI, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from src.users.schemas import (
+    FollowSchema,
+    UserBatchGetSchema,
+    UserSchema,
+    UserUpdateSchema,
+)
+from src.users.models import Users
+from src.users.service import FollowService, UserService
+from src.outbox.service import OutboxService
+from src.api.fields import fields_param, project
+from src.api.responses import FastJSONResponse
 from src.api.schemas import ResponseData, ResponseOK
+from src.core import get_session, render_metrics
+from src.deadline import DeadlineMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [
+        asyncio.create_task(OutboxService.listen()),
+        asyncio.create_task(OutboxService.relay()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+
+
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(get_session)])
+
+# Stops work once the caller's X-Deadline-Ms budget has run out
+app.add_middleware(DeadlineMiddleware)
 
 
 @app.post("/api/v1/users", response_model=ResponseOK)
@@ -24,7 +55,8 @@ async def get_all_users(
         is_admin: bool | None = None,
         limit: int | None = 5,
         offset: int | None = 0,
-) -> dict:
+        fields: List[str] | None = Depends(fields_param(Users.__table__)),
+) -> FastJSONResponse:
     data = await UserService.list(
         username = username,
         email = email,
@@ -35,9 +67,22 @@ async def get_all_users(
         is_verified = is_verified,
         is_admin = is_admin,
         limit = limit,
-        offset = offset
+        offset = offset,
+        fields = fields
+    )
+    return FastJSONResponse({"success": True, "data": data})
+
+@app.post("/api/v1/users:batchGet", response_model=ResponseData)
+async def batch_get_users(body: UserBatchGetSchema) -> FastJSONResponse:
+    fields = project(Users.__table__, body.fields) if body.fields else None
+    data = await UserService.get_many(body.ids, fields=fields)
+    return FastJSONResponse({"success": True, "data": data})
+
+@app.get("/api/v1/users/export")
+async def export_users(after_id: int | None = None) -> StreamingResponse:
+    return StreamingResponse(
+        UserService.export(after_id=after_id), media_type="application/x-ndjson"
     )
-    return {"success": True, "data": data}
 
 @app.get("/api/v1/users/count", response_model=ResponseData)
 async def count_all_users() -> dict:
@@ -50,6 +95,26 @@ async def get_users_by_id(user_id: int) -> dict:
     data = await UserService.get(user_id)
     return {"success": True, "data": data}
 
+@app.patch("/api/v1/users/{user_id}", response_model=ResponseData)
+async def update_user(user_id: int, changes: UserUpdateSchema) -> dict:
+    try:
+        user, current = await UserService.update(user_id, changes)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Username or email is already taken",
+        )
+    if user is not None:
+        return {"success": True, "data": user}
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=f"User is at version {current}",
+    )
+
 @app.delete("/api/v1/users", response_model=ResponseOK)
 async def delete_all_users() -> dict:
     await UserService.delete_all()
@@ -59,3 +124,34 @@ async def delete_all_users() -> dict:
 async def delete_user_by_id(user_id: int) -> dict:
     await UserService.delete(user_id=user_id)
     return {"success": True}
+
+@app.post("/api/v1/follows", response_model=ResponseData)
+async def follow_user(follow: FollowSchema) -> dict:
+    created = await FollowService.follow(follow)
+    return {"success": True, "data": created}
+
+@app.delete("/api/v1/follows/{follower_id}/{following_id}", response_model=ResponseData)
+async def unfollow_user(follower_id: int, following_id: int) -> dict:
+    deleted = await FollowService.unfollow(follower_id, following_id)
+    return {"success": True, "data": deleted}
+
+@app.get("/api/v1/users/{user_id}/follows/count", response_model=ResponseData)
+async def count_follows(user_id: int) -> dict:
+    counts = await FollowService.counts(user_id)
+    return {"success": True, "data": counts}
+
+@app.get("/api/v1/events")
+async def stream_events(
+    after: int | None = None,
+    last_event_id: int | None = Header(default=None),
+) -> StreamingResponse:
+    # A reconnecting EventSource sends Last-Event-ID, which wins over `after`
+    return StreamingResponse(
+        OutboxService.stream(last_event_id if last_event_id is not None else after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    return render_metrics()
@@ -0,0 +1,10 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    # Encodes plain dicts/lists straight to bytes. Returning it from an
+    # endpoint skips response_model validation and jsonable_encoder, so it
+    # is only used where the payload is already built from table columns.
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
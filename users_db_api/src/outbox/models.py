@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import JSON, TIMESTAMP, BigInteger, Index, String, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.core import Base
+
+
+class OutboxEvents(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # The relay only ever scans rows it has not published yet.
+        Index(
+            "ix_outbox_events_pending",
+            "id",
+            postgresql_where=text("position IS NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # Assigned by the relay once the writing transaction has committed
+    position: Mapped[int | None] = mapped_column(
+        BigInteger, unique=True, nullable=True
+    )
+
+    topic: Mapped[str] = mapped_column(String(64), nullable=False)
+    aggregate_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+    published_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+    )
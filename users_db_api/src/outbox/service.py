@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+import orjson
+
+from src.config import Settings
+from src.core import async_engine
+from src.outbox.repository import OutboxRepository
+
+
+class OutboxService:
+    # Replaced on every notification; waiters hold on to the one they saw
+    _pending = asyncio.Event()
+    _published = asyncio.Event()
+
+    @classmethod
+    def _wake(cls, name: str):
+        event = getattr(cls, name)
+        setattr(cls, name, asyncio.Event())
+        event.set()
+
+    @classmethod
+    async def listen(cls):
+        # One connection per worker LISTENs for both channels; when it drops,
+        # the relay and the streams fall back to polling until it is back.
+        def on_notify(connection, pid, channel, payload):
+            if channel == OutboxRepository.PENDING_CHANNEL:
+                cls._wake("_pending")
+            else:
+                cls._wake("_published")
+
+        channels = (
+            OutboxRepository.PENDING_CHANNEL,
+            OutboxRepository.PUBLISHED_CHANNEL,
+        )
+        while True:
+            try:
+                async with async_engine.connect() as conn:
+                    raw_connection = await conn.get_raw_connection()
+                    driver = raw_connection.driver_connection
+                    for channel in channels:
+                        await driver.add_listener(channel, on_notify)
+                    try:
+                        while not driver.is_closed():
+                            await asyncio.sleep(Settings.OUTBOX_POLL_INTERVAL_SECONDS)
+                    finally:
+                        if not driver.is_closed():
+                            for channel in channels:
+                                await driver.remove_listener(channel, on_notify)
+            except Exception as e:
+                print(f"Warning: Outbox listener disconnected: {str(e)}")
+            await asyncio.sleep(Settings.OUTBOX_POLL_INTERVAL_SECONDS)
+
+    @classmethod
+    async def relay(cls):
+        last_purge = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = cls._pending
+            try:
+                while (
+                    await OutboxRepository.publish(Settings.OUTBOX_RELAY_BATCH_SIZE)
+                    == Settings.OUTBOX_RELAY_BATCH_SIZE
+                ):
+                    pass
+                if loop.time() - last_purge > Settings.OUTBOX_PURGE_INTERVAL_SECONDS:
+                    last_purge = loop.time()
+                    published_before = datetime.now(timezone.utc) - timedelta(
+                        hours=Settings.OUTBOX_RETENTION_HOURS
+                    )
+                    await OutboxRepository.purge(
+                        published_before, Settings.OUTBOX_RELAY_BATCH_SIZE
+                    )
+            except Exception as e:
+                print(f"Warning: Failed to relay outbox events: {str(e)}")
+            try:
+                await asyncio.wait_for(
+                    pending.wait(), Settings.OUTBOX_POLL_INTERVAL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    @classmethod
+    async def stream(cls, after: int | None = None) -> AsyncIterator[bytes]:
+        # Server-sent events; the position is the event id, so a reconnecting
+        # client resumes through Last-Event-ID. Without a position the stream
+        # starts at the current head, announced in an id-only frame that sets
+        # the client's position without dispatching an event.
+        if after is None:
+            after = await OutboxRepository.head()
+            yield f"id: {after}\n\n".encode()
+        while True:
+            published = cls._published
+            events = await OutboxRepository.read(after, Settings.OUTBOX_READ_BATCH_SIZE)
+            for event in events:
+                after = event["position"]
+                data = orjson.dumps(dict(event), option=orjson.OPT_UTC_Z)
+                yield (
+                    f"id: {after}\nevent: {event['topic']}\n".encode()
+                    + b"data: " + data + b"\n\n"
+                )
+            if events:
+                continue
+            try:
+                await asyncio.wait_for(
+                    published.wait(), Settings.OUTBOX_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
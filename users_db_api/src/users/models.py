@@ -1,6 +1,14 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import TIMESTAMP, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import (
+    TIMESTAMP,
+    Boolean,
+    ForeignKey,
+    Index,
+    Integer,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.core import Base
@@ -36,11 +44,18 @@ class Users(Base):
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    # Bumped by every write that changes the user; ETags are built from it
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default=text("1")
+    )
+
 
 class Follows(Base):
     __tablename__ = "follows"
     __table_args__ = (
         UniqueConstraint("follower_id", "following_id", name="unique_follow"),
+        # Follower counts; the unique constraint already serves the other way
+        Index("ix_follows_following_id", "following_id"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
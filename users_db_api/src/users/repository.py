@@ -1,56 +1,236 @@
-from sqlalchemy import delete, select, func, insert
+from typing import List
 
-from src.core import async_session_factory
-from src.users.models import Users
+from sqlalchemy import (
+    Integer,
+    any_,
+    bindparam,
+    delete,
+    select,
+    func,
+    insert,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+
+from src.core import async_session_factory, session_scope
+from src.outbox.repository import OutboxRepository
+from src.users.models import Follows, Users
 
 
 class UsersRepository:
     @classmethod
     async def add(cls, values: dict):
-        stmt = insert(Users).values(**values)
-        async with async_session_factory() as session:
-            await session.execute(stmt)
+        stmt = insert(Users).values(**values).returning(Users.id)
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            user_id = query_res.scalar_one()
+            await OutboxRepository.record(
+                session, [cls._event("user.created", user_id)]
+            )
             await session.commit()
 
+    @staticmethod
+    def _event(topic: str, user_id: int) -> dict:
+        return {"topic": topic, "aggregate_id": user_id, "payload": {"id": user_id}}
+
     @classmethod
     async def get(cls, user_id: int):
         query = select(Users).where(Users.id == user_id)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             query_res = await session.execute(query)
             res = query_res.scalar_one()
         return res
 
+    @classmethod
+    async def get_many(cls, user_ids: List[int], fields: List[str] | None = None):
+        # `id = ANY($1)` binds the whole id list as one array parameter, so
+        # every batch size shares the same prepared statement.
+        columns = Users.__table__.c
+        if fields:
+            columns = [columns[name] for name in fields]
+        query = select(*columns).where(
+            Users.id == any_(bindparam("user_ids", user_ids, type_=ARRAY(Integer)))
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = query_res.mappings().all()
+        return res
+
     @classmethod
     async def list(
         cls,
         filter: dict,
         limit: int | None = None,
         offset: int | None = None,
+        fields: List[str] | None = None,
     ):
-        query = select(Users).filter_by(**filter).limit(limit).offset(offset)
-        async with async_session_factory() as session:
+        columns = Users.__table__.c
+        if fields:
+            columns = [columns[name] for name in fields]
+        query = (
+            select(*columns)
+            .filter_by(**filter)
+            .limit(limit)
+            .offset(offset)
+        )
+        async with session_scope() as session:
             query_res = await session.execute(query)
-            res = query_res.scalars().all()
+            res = query_res.mappings().all()
         return res
 
+    @classmethod
+    async def stream(cls, after_id: int | None = None, batch_size: int = 1000):
+        # Rows are pulled through a server-side cursor in batches, so the
+        # export never holds more than one batch in memory.
+        query = (
+            select(Users)
+            .order_by(Users.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if after_id is not None:
+            query = query.where(Users.id > after_id)
+        async with async_session_factory() as session:
+            result = await session.stream_scalars(query)
+            async for row in result:
+                yield row
+
     @classmethod
     async def count(cls) -> int | None:
         query = select(func.count(Users.id))
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             query_res = await session.execute(query)
             res = query_res.scalar_one_or_none()
         return res
 
+    @classmethod
+    async def update(cls, user_id: int, version: int | None, values: dict):
+        # Only the given columns are written, and the new row comes back from
+        # the same statement. With `version` a user changed since the caller
+        # read it is left alone; only then is it read back, to tell why.
+        # A username or email taken by another user raises IntegrityError.
+        conditions = [Users.id == user_id]
+        if version is not None:
+            conditions.append(Users.version == version)
+        stmt = (
+            update(Users)
+            .where(*conditions)
+            .values(**values, version=Users.version + 1)
+            .returning(*Users.__table__.c)
+        )
+        current_query = select(Users.version).where(Users.id == user_id)
+        async with session_scope() as session:
+            try:
+                query_res = await session.execute(stmt)
+            except IntegrityError:
+                await session.rollback()
+                raise
+            user = query_res.mappings().one_or_none()
+            if user is None:
+                current_res = await session.execute(current_query)
+                current = current_res.scalar_one_or_none()
+                await session.rollback()
+                return None, current
+            await OutboxRepository.record(
+                session, [cls._event("user.updated", user_id)]
+            )
+            await session.commit()
+        return user, None
+
     @classmethod
     async def delete(cls, user_id: int):
-        stmt = delete(Users).where(Users.id == user_id)
-        async with async_session_factory() as session:
-            await session.execute(stmt)
+        stmt = delete(Users).where(Users.id == user_id).returning(Users.id)
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            if query_res.scalar_one_or_none() is not None:
+                await OutboxRepository.record(
+                    session, [cls._event("user.deleted", user_id)]
+                )
             await session.commit()
 
     @classmethod
     async def delete_all(cls):
         stmt = delete(Users)
-        async with async_session_factory() as session:
+        async with session_scope() as session:
             await session.execute(stmt)
             await session.commit()
+
+
+class FollowsRepository:
+    @classmethod
+    async def follow(cls, follower_id: int, following_id: int) -> bool:
+        stmt = (
+            pg_insert(Follows)
+            .values(follower_id=follower_id, following_id=following_id)
+            .on_conflict_do_nothing(constraint="unique_follow")
+            .returning(Follows.id)
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            follow_id = query_res.scalar_one_or_none()
+            if follow_id is not None:
+                await OutboxRepository.record(
+                    session,
+                    [
+                        cls._event(
+                            "follow.created", follow_id, follower_id, following_id
+                        )
+                    ],
+                )
+            await session.commit()
+        return follow_id is not None
+
+    @classmethod
+    async def unfollow(cls, follower_id: int, following_id: int) -> bool:
+        stmt = (
+            delete(Follows)
+            .where(
+                Follows.follower_id == follower_id,
+                Follows.following_id == following_id,
+            )
+            .returning(Follows.id)
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(stmt)
+            follow_id = query_res.scalar_one_or_none()
+            if follow_id is not None:
+                await OutboxRepository.record(
+                    session,
+                    [
+                        cls._event(
+                            "follow.deleted", follow_id, follower_id, following_id
+                        )
+                    ],
+                )
+            await session.commit()
+        return follow_id is not None
+
+    @classmethod
+    async def counts(cls, user_id: int) -> dict:
+        # Both counters in one round trip; unique_follow leads with
+        # follower_id and ix_follows_following_id covers the other side
+        query = select(
+            select(func.count())
+            .where(Follows.following_id == user_id)
+            .scalar_subquery()
+            .label("followers_count"),
+            select(func.count())
+            .where(Follows.follower_id == user_id)
+            .scalar_subquery()
+            .label("following_count"),
+        )
+        async with session_scope() as session:
+            query_res = await session.execute(query)
+            res = dict(query_res.one()._mapping)
+        return res
+
+    @staticmethod
+    def _event(
+        topic: str, follow_id: int, follower_id: int, following_id: int
+    ) -> dict:
+        return {
+            "topic": topic,
+            "aggregate_id": follow_id,
+            "payload": {"follower_id": follower_id, "following_id": following_id},
+        }
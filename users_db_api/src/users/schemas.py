@@ -1,6 +1,7 @@
 from datetime import datetime
+from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class UserSchema(BaseModel):
@@ -17,6 +18,7 @@ class UserSchema(BaseModel):
 
     is_verified: bool = False
     is_admin: bool = False
+    version: int = 1
 
     def to_dict(self) -> dict:
         return self.model_dump(exclude={"id"})
@@ -30,3 +32,42 @@ class UserSchema(BaseModel):
     #         created_at          = {self.created_at}\n\
     #         is_deleted          = {self.is_deleted}"
     #     return line
+
+
+# NOT NULL columns: a null sent for one of them leaves it unchanged
+NOT_NULL_COLUMNS = {"username", "email", "is_verified", "is_admin"}
+
+
+class UserUpdateSchema(BaseModel):
+    # Version the caller read; None updates whichever version is current
+    version: int | None = None
+
+    username: str | None = None
+    avatar_url: str | None = None
+    email: str | None = None
+    password_hash: str | None = None
+
+    disactivated_at: datetime | None = None
+    birth_date: datetime | None = None
+
+    is_verified: bool | None = None
+    is_admin: bool | None = None
+
+    def changes(self) -> dict:
+        # Only the fields the caller sent, so the others are not written
+        values = self.model_dump(exclude_unset=True, exclude={"version"})
+        return {
+            name: value
+            for name, value in values.items()
+            if value is not None or name not in NOT_NULL_COLUMNS
+        }
+
+
+class UserBatchGetSchema(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=1000)
+    fields: List[str] | None = None
+
+
+class FollowSchema(BaseModel):
+    follower_id: int
+    following_id: int
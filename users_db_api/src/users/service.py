@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import List
-from src.users.repository import UsersRepository
-from src.users.schemas import UserSchema
+from src.config import Settings
+from src.users.repository import FollowsRepository, UsersRepository
+from src.users.schemas import FollowSchema, UserSchema, UserUpdateSchema
 
 class UserService:
     @classmethod
@@ -15,6 +16,26 @@ class UserService:
         res = UserSchema.model_validate(user, from_attributes=True)
         return res
 
+    @classmethod
+    async def update(cls, user_id: int, changes: UserUpdateSchema):
+        # (user, None) once written, else (None, the user's version) or
+        # (None, None) when there is no such user
+        user, current = await UsersRepository.update(
+            user_id, changes.version, changes.changes()
+        )
+        if user is None:
+            return None, current
+        return UserSchema.model_validate(user), None
+
+    @classmethod
+    async def get_many(cls, user_ids: List[int], fields: List[str] | None = None):
+        unique_ids = list(dict.fromkeys(user_ids))
+        rows = await UsersRepository.get_many(unique_ids, fields=fields)
+        by_id = {row["id"]: dict(row) for row in rows}
+        # Request order, duplicates collapsed, unknown ids left out
+        res = [by_id[user_id] for user_id in unique_ids if user_id in by_id]
+        return res
+
     @classmethod
     async def list(
         cls,
@@ -28,7 +49,7 @@ class UserService:
         is_admin: bool | None = None,
         limit: int | None = 5,
         offset: int | None = 0,
-
+        fields: List[str] | None = None,
     ):
         filter = {
             k: v
@@ -44,13 +65,20 @@ class UserService:
             }.items()
             if v is not None
         }
-        lst = await UsersRepository.list(filter, limit=limit, offset=offset)
-        res = []
-        for item in lst:
-            user = UserSchema.model_validate(item, from_attributes=True)
-            res.append(user)
+        lst = await UsersRepository.list(
+            filter, limit=limit, offset=offset, fields=fields
+        )
+        res = [dict(row) for row in lst]
         return res
 
+    @classmethod
+    async def export(cls, after_id: int | None = None):
+        async for item in UsersRepository.stream(
+            after_id, batch_size=Settings.EXPORT_BATCH_SIZE
+        ):
+            user = UserSchema.model_validate(item, from_attributes=True)
+            yield user.model_dump_json() + "\n"
+
     @classmethod
     async def count(cls):
         res = await UsersRepository.count()
@@ -63,3 +91,20 @@ class UserService:
     @classmethod
     async def delete_all(cls):
         await UsersRepository.delete_all()
+
+
+class FollowService:
+    @classmethod
+    async def follow(cls, follow: FollowSchema) -> bool:
+        res = await FollowsRepository.follow(follow.follower_id, follow.following_id)
+        return res
+
+    @classmethod
+    async def unfollow(cls, follower_id: int, following_id: int) -> bool:
+        res = await FollowsRepository.unfollow(follower_id, following_id)
+        return res
+
+    @classmethod
+    async def counts(cls, user_id: int) -> dict:
+        res = await FollowsRepository.counts(user_id)
+        return res
@@ -1,16 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from src.users.schemas import UserUpdateSchema, UserSchema
+from fastapi.responses import PlainTextResponse
+from src.users.schemas import FollowCountsSchema, UserUpdateSchema, UserSchema
 from src.users.service import UserService
 from src.users.middleware import get_current_user_id
+from src.change_feed import ChangeFeed
+from src.compression import CompressionMiddleware
+from src.conditional import entity_tag
+from src.deadline import DeadlineMiddleware
+from src.rate_limit import Limit, RateLimitMiddleware
+from src.upstream import users_db
+from src.config import Settings
+from src.metrics import Metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    if Settings.CHANGE_FEED_ENABLED:
+        feed = ChangeFeed(
+            "users", Settings.USERS_DB_API_URL, UserService.changed_scopes
+        )
+        tasks.append(asyncio.create_task(feed.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await users_db.aclose()
+
 
 app = FastAPI(
     title="Users Service",
     description="Service for working with users",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Deadlines, innermost so that shed and rate-limited requests skip them
+app.add_middleware(DeadlineMiddleware, default=Settings.REQUEST_DEADLINE_SECONDS)
+
+# Rate limiting; added before CORS so that 429 responses carry its headers
+app.add_middleware(
+    RateLimitMiddleware,
+    service="users",
+    ip=Limit(Settings.RATE_LIMIT_IP_PER_SECOND, Settings.RATE_LIMIT_IP_BURST),
+    user=Limit(Settings.RATE_LIMIT_USER_PER_SECOND, Settings.RATE_LIMIT_USER_BURST),
+)
+
+# Compression
+app.add_middleware(CompressionMiddleware)
+
 # CORS settings
 app.add_middleware(
     CORSMiddleware,
@@ -24,20 +65,36 @@ app.add_middleware(
 @app.get("/api/v1/users/{user_id}", response_model=UserSchema)
 async def get_user_profile(
     user_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user_id: Optional[int] = Depends(get_current_user_id)
 ):
-    """Retrieves a user profile"""
-    return await UserService.get_user_profile(user_id, current_user_id)
+    """Retrieves a user profile; 304 when If-None-Match names its ETag"""
+    user = await UserService.get_user_profile(user_id, current_user_id, if_none_match)
+    response.headers["ETag"] = entity_tag("user", user.id, user.version)
+    return user
 
 
 @app.put("/api/v1/users/{user_id}", response_model=UserSchema)
 async def update_user_profile(
     user_id: int,
     user_data: UserUpdateSchema,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Updates a user profile (only their own profile)"""
-    return await UserService.update_profile(user_id, current_user_id, user_data)
+    user = await UserService.update_profile(
+        user_id, current_user_id, user_data, if_match
+    )
+    response.headers["ETag"] = entity_tag("user", user.id, user.version)
+    return user
+
+
+@app.get("/api/v1/users/{user_id}/follows/count", response_model=FollowCountsSchema)
+async def get_follow_counts(user_id: int):
+    """Retrieves how many users follow a user and how many it follows"""
+    return await UserService.get_follow_counts(user_id)
 
 
 @app.get("/api/v1/users/search", response_model=List[UserSchema])
@@ -55,3 +112,8 @@ async def health_check():
     """Service health check"""
     return {"status": "healthy", "service": "users-service"}
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Process-local counters in the Prometheus text format"""
+    return Metrics.render()
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.config import Settings
+from src.metrics import Metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
+
+
+class CacheBackend(ABC):
+    """Byte-string key/value store that Cache is built on"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Sets `key` only if it is missing; returns whether it was set"""
+
+    @abstractmethod
+    async def incr(self, key: str, ttl: float) -> int:
+        """Increments a counter, which then expires `ttl` seconds from now"""
+
+    @abstractmethod
+    async def touch(self, keys: List[str], ttl: float):
+        """Pushes the expiry of the existing counters among `keys` to `ttl`"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+
+class MemoryBackend(CacheBackend):
+    """Process-local LRU store, the default when no Redis is configured"""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        # Counters live outside the LRU so a version is never evicted and
+        # reset while entries written under it are still alive. They expire
+        # instead, and as Cache gives them all the same TTL, least recently
+        # bumped or touched first is also expiry order.
+        self._counters: OrderedDict[str, Tuple[float, int]] = OrderedDict()
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        counter = self._counters.get(key)
+        if counter is not None:
+            expires_at, value = counter
+            if expires_at > time.monotonic():
+                return str(value).encode()
+            del self._counters[key]
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: bytes, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._lookup(key)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self._lookup(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._store(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if self._lookup(key) is not None:
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    def _expire_counters(self, now: float):
+        while self._counters:
+            expires_at, _ = next(iter(self._counters.values()))
+            if expires_at > now:
+                break
+            self._counters.popitem(last=False)
+
+    async def incr(self, key: str, ttl: float) -> int:
+        now = time.monotonic()
+        self._expire_counters(now)
+        _, value = self._counters.pop(key, (now, 0))
+        self._counters[key] = (now + ttl, value + 1)
+        return value + 1
+
+    async def touch(self, keys: List[str], ttl: float):
+        now = time.monotonic()
+        self._expire_counters(now)
+        for key in keys:
+            if key in self._counters:
+                _, value = self._counters.pop(key)
+                self._counters[key] = (now + ttl, value)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+
+class RedisBackend(CacheBackend):
+    """Store shared by every replica, spoken to over the Redis protocol"""
+
+    def __init__(self, url: str):
+        # Imported here so the in-memory default works without redis installed
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await self._client.mget(keys)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._client.set(key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(await self._client.set(key, value, px=int(ttl * 1000), nx=True))
+
+    async def incr(self, key: str, ttl: float) -> int:
+        async with self._client.pipeline() as pipe:
+            pipe.incr(key)
+            pipe.pexpire(key, int(ttl * 1000))
+            value, _ = await pipe.execute()
+        return value
+
+    async def touch(self, keys: List[str], ttl: float):
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.pexpire(key, int(ttl * 1000))
+            await pipe.execute()
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+
+def create_backend(url: str) -> CacheBackend:
+    if url.startswith("memory://"):
+        return MemoryBackend(Settings.CACHE_MEMORY_MAX_ENTRIES)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+class Cache:
+    """JSON values under versioned keys, with stampede protection
+
+    Keys look like `{namespace}:{scope}:v{epoch}.{version}:{key}`.
+    Invalidating a scope bumps its version, and flushing bumps the epoch
+    shared by every scope; either orphans the keys written before, which
+    age out through their TTL. The counters themselves expire
+    CACHE_VERSION_TTL_SECONDS after they were last bumped or written under,
+    by which time no entry from before can still be alive. On a miss,
+    concurrent loads of a key in this process share one loader call, and a
+    short lock in the backend lets a single replica load it while the
+    others wait for the result.
+
+    Reads fail open: while the backend is unreachable every value comes
+    straight from its loader.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str):
+        self.backend = backend
+        self.namespace = namespace
+        self._loads: Dict[str, asyncio.Future] = {}
+        self._failing = False
+
+    async def _try(self, call: Awaitable[T], default: T) -> T:
+        """Result of a backend call, or `default` when the backend fails"""
+        try:
+            result = await call
+        except Exception as e:
+            Metrics.inc("cache_errors_total")
+            if not self._failing:
+                logger.warning("Cache backend failed, reading through: %s", e)
+            self._failing = True
+            return default
+        if self._failing:
+            logger.warning("Cache backend is back")
+        self._failing = False
+        return result
+
+    def _version_key(self, scope: str) -> str:
+        return f"{self.namespace}:{scope}:version"
+
+    def _epoch_key(self) -> str:
+        return f"{self.namespace}:epoch"
+
+    async def version(self, scope: str) -> str:
+        epoch, version = await self.backend.get_many(
+            [self._epoch_key(), self._version_key(scope)]
+        )
+        return f"{int(epoch or 0)}.{int(version or 0)}"
+
+    async def invalidate(self, *scopes: str):
+        for scope in scopes:
+            await self.backend.incr(
+                self._version_key(scope), Settings.CACHE_VERSION_TTL_SECONDS
+            )
+
+    async def flush(self):
+        """Invalidates every scope at once"""
+        await self.backend.incr(self._epoch_key(), Settings.CACHE_VERSION_TTL_SECONDS)
+
+    async def get_or_load(
+        self,
+        scope: str,
+        key: Any,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+    ) -> Any:
+        """Returns the cached value, calling `loader` on a miss
+
+        A None result from `loader` is returned but not cached.
+        """
+        version = await self._try(self.version(scope), None)
+        if version is None:
+            return await loader()
+        cache_key = f"{self.namespace}:{scope}:v{version}:{key}"
+        raw = await self._try(self.backend.get(cache_key), None)
+        if raw is not None:
+            Metrics.inc("cache_requests_total", result="hit")
+            return json.loads(raw)
+        Metrics.inc("cache_requests_total", result="miss")
+
+        load = self._loads.get(cache_key)
+        if load is None:
+            load = asyncio.ensure_future(self._load(scope, cache_key, loader, ttl))
+            self._loads[cache_key] = load
+            load.add_done_callback(lambda _: self._loads.pop(cache_key, None))
+        return await asyncio.shield(load)
+
+    async def _load(
+        self,
+        scope: str,
+        cache_key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+    ) -> Any:
+        lock_key = f"{cache_key}:lock"
+        # None when the backend failed, and then there is nobody to wait for
+        locked = await self._try(
+            self.backend.add(lock_key, b"1", Settings.CACHE_LOCK_TTL_SECONDS), None
+        )
+        if locked is False:
+            # Another replica is loading this key: wait for its result until
+            # it lets go of the lock, then fall back to loading it ourselves.
+            deadline = time.monotonic() + Settings.CACHE_LOCK_TTL_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(Settings.CACHE_LOCK_POLL_SECONDS)
+                raw, held = await self._try(
+                    self.backend.get_many([cache_key, lock_key]), [None, None]
+                )
+                if raw is not None:
+                    return json.loads(raw)
+                if held is None:
+                    break
+        try:
+            value = await loader()
+            if value is not None:
+                await self._try(self._store(scope, cache_key, value, ttl), None)
+            return value
+        finally:
+            if locked:
+                await self._try(self.backend.delete(lock_key), None)
+
+    async def _store(self, scope: str, cache_key: str, value: Any, ttl: float):
+        await self.backend.set(cache_key, json.dumps(value).encode(), ttl)
+        # Kept alive at least as long as the entry written under them
+        await self.backend.touch(
+            [self._epoch_key(), self._version_key(scope)],
+            Settings.CACHE_VERSION_TTL_SECONDS,
+        )
+
+
+cache = Cache(create_backend(Settings.CACHE_URL), namespace=Settings.CACHE_NAMESPACE)
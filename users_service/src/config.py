@@ -8,3 +8,71 @@ class Settings:
     # JWT settings for token validation
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
     JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+
+    # Shared with the gateway: a request carrying it in X-Gateway-Secret is
+    # taken to be from the user in X-User-Id. Empty trusts tokens only.
+    GATEWAY_SECRET = os.getenv("GATEWAY_SECRET", "")
+
+    # Shared cache: "memory://" keeps it in-process, "redis://host:6379/0"
+    # shares it between replicas
+    CACHE_URL = os.getenv("CACHE_URL", "memory://")
+    CACHE_NAMESPACE = os.getenv("CACHE_NAMESPACE", "ssm")
+    CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "10000"))
+    CACHE_LOCK_TTL_SECONDS = float(os.getenv("CACHE_LOCK_TTL_SECONDS", "5"))
+    CACHE_LOCK_POLL_SECONDS = float(os.getenv("CACHE_LOCK_POLL_SECONDS", "0.05"))
+    # How long scope versions outlive their last use; above every entry TTL
+    CACHE_VERSION_TTL_SECONDS = float(os.getenv("CACHE_VERSION_TTL_SECONDS", "86400"))
+    CACHE_USER_TTL_SECONDS = float(os.getenv("CACHE_USER_TTL_SECONDS", "300"))
+
+    # Change events from the DB APIs evict cache scopes as they happen
+    CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "true").lower() == "true"
+    CHANGE_FEED_RETRY_SECONDS = float(os.getenv("CHANGE_FEED_RETRY_SECONDS", "1"))
+    CHANGE_FEED_READ_TIMEOUT_SECONDS = float(
+        os.getenv("CHANGE_FEED_READ_TIMEOUT_SECONDS", "45")
+    )
+    # Matches the DB APIs' outbox retention; an older position has a gap anyway
+    CHANGE_FEED_POSITION_TTL_SECONDS = float(
+        os.getenv("CHANGE_FEED_POSITION_TTL_SECONDS", "259200")
+    )
+
+    # Token buckets: "memory://" counts per process, "redis://host:6379/0"
+    # shares the counts between replicas
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "memory://")
+    RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "100000"))
+    RATE_LIMIT_IP_PER_SECOND = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "20"))
+    RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "40"))
+    RATE_LIMIT_USER_PER_SECOND = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "10"))
+    RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+
+    # Response bodies from this size up go out as brotli or gzip, whichever
+    # the client accepts
+    COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    # Deadlines: a request without an X-Deadline-Ms header gets this budget,
+    # and each upstream call waits at most the smaller of it and
+    # UPSTREAM_TIMEOUT_SECONDS. Only a call that timed out after the full
+    # UPSTREAM_TIMEOUT_SECONDS counts against the breaker, so it is kept
+    # below the deadline.
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+    UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "5"))
+    UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    # Idle pooled connections are dropped before the upstream's 5s keep-alive
+    # closes them, so a request never goes out on a socket being shut
+    UPSTREAM_KEEPALIVE_SECONDS = float(os.getenv("UPSTREAM_KEEPALIVE_SECONDS", "2"))
+    # Circuit breakers: open after this many failures in a row, probe again
+    # after BREAKER_OPEN_SECONDS
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "5"))
+
+    # Serving mode
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+    SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(
+        os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "25")
+    )
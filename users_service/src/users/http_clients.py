@@ -1,49 +1,86 @@
 import httpx
 from typing import Optional, Dict, Any, List
-from src.config import Settings
+from src.upstream import users_db
 
 
 class UsersDBClient:
     """HTTP client for interacting with users_db_api"""
 
-    BASE_URL = Settings.USERS_DB_API_URL
+    # Columns UserSchema renders; keeps password_hash out of search results
+    PROFILE_FIELDS = (
+        "id,username,avatar_url,email,created_at,"
+        "disactivated_at,birth_date,is_verified,is_admin,version"
+    )
 
     @staticmethod
     async def get_user(user_id: int) -> Optional[Dict[str, Any]]:
         """Retrieves a user by ID"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{UsersDBClient.BASE_URL}/api/v1/users/{user_id}", timeout=10.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("data") if data.get("success") else None
-            except httpx.HTTPStatusError:
-                return None
+        try:
+            response = await users_db.get(f"/api/v1/users/{user_id}")
+            response.raise_for_status()
+            data = response.json()
+            return data.get("data") if data.get("success") else None
+        except httpx.HTTPStatusError:
+            return None
 
     @staticmethod
-    async def update_user(user_id: int, user_data: Dict[str, Any]) -> bool:
-        """Updates user data"""
-        # users_db_api does not expose a PUT endpoint yet
-        # Need to add it later
-        return False
+    async def get_user_summary(user_id: int) -> Optional[Dict[str, Any]]:
+        """Retrieves only the profile columns of a user by ID"""
+        try:
+            response = await users_db.post(
+                "/api/v1/users:batchGet",
+                json={
+                    "ids": [user_id],
+                    "fields": UsersDBClient.PROFILE_FIELDS.split(","),
+                },
+            )
+            response.raise_for_status()
+            data = response.json()
+            users = data.get("data", []) if data.get("success") else []
+            return users[0] if users else None
+        except httpx.HTTPStatusError:
+            return None
+
+    @staticmethod
+    async def update_user(
+        user_id: int, user_data: Dict[str, Any], version: int | None = None
+    ) -> Dict[str, Any]:
+        """Writes only the given fields and returns the updated user
+
+        Raises HTTPStatusError: 404 no user, 409 username or email taken, 412
+        the user is at another version than `version`.
+        """
+        response = await users_db.patch(
+            f"/api/v1/users/{user_id}", json={"version": version, **user_data}
+        )
+        response.raise_for_status()
+        return response.json()["data"]
+
+    @staticmethod
+    async def get_follow_counts(user_id: int) -> Dict[str, int]:
+        """Retrieves how many users follow a user and how many it follows"""
+        response = await users_db.get(f"/api/v1/users/{user_id}/follows/count")
+        response.raise_for_status()
+        return response.json()["data"]
 
     @staticmethod
     async def search_users(
         query: str, limit: int = 20, offset: int = 0
     ) -> List[Dict[str, Any]]:
         """Searches users by username or email"""
-        async with httpx.AsyncClient() as client:
-            try:
-                # Search by username
-                response = await client.get(
-                    f"{UsersDBClient.BASE_URL}/api/v1/users",
-                    params={"username": query, "limit": limit, "offset": offset},
-                    timeout=10.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("data", []) if data.get("success") else []
-            except httpx.HTTPStatusError:
-                return []
+        try:
+            # Search by username
+            response = await users_db.get(
+                "/api/v1/users",
+                params={
+                    "username": query,
+                    "limit": limit,
+                    "offset": offset,
+                    "fields": UsersDBClient.PROFILE_FIELDS,
+                },
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data.get("data", []) if data.get("success") else []
+        except httpx.HTTPStatusError:
+            return []
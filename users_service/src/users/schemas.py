@@ -23,6 +23,7 @@ class UserSchema(BaseModel):
     birth_date: datetime | None = None
     is_verified: bool
     is_admin: bool
+    version: int = 1
     followers_count: int = 0
     following_count: int = 0
     posts_count: int = 0
@@ -35,3 +36,10 @@ class FollowSchema(BaseModel):
     follower_id: int
     following_id: int
     created_at: datetime
+
+
+class FollowCountsSchema(BaseModel):
+    """Follow counters of a user"""
+
+    followers_count: int
+    following_count: int
@@ -1,22 +1,52 @@
 from typing import Optional, List
+import httpx
 from fastapi import HTTPException, status
-from src.users.schemas import UserUpdateSchema, UserSchema
+from src.users.schemas import FollowCountsSchema, UserUpdateSchema, UserSchema
 from src.users.http_clients import UsersDBClient
+from src.cache import cache
+from src.conditional import (
+    PreconditionFailed,
+    check_not_modified,
+    entity_tag,
+    if_match_version,
+)
+from src.config import Settings
 
 
 class UserService:
     """Service for working with users"""
+
+    @staticmethod
+    def changed_scopes(topic: str, payload: dict) -> List[str]:
+        """Cache scopes affected by a users_db_api change event"""
+        if topic in ("user.created", "user.updated", "user.deleted"):
+            return [f"user:{payload['id']}"]
+        return []
     
     @staticmethod
-    async def get_user_profile(user_id: int, current_user_id: int | None = None) -> UserSchema:
-        """Retrieves a user profile"""
-        user = await UsersDBClient.get_user(user_id)
+    async def get_user_profile(
+        user_id: int,
+        current_user_id: int | None = None,
+        if_none_match: str | None = None,
+    ) -> UserSchema:
+        """Retrieves a user profile; NotModified if the client's copy is current"""
+        user = await cache.get_or_load(
+            f"user:{user_id}",
+            user_id,
+            lambda: UsersDBClient.get_user_summary(user_id),
+            ttl=Settings.CACHE_USER_TTL_SECONDS,
+        )
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         
+        # Answered before any of the body is built
+        check_not_modified(
+            if_none_match, entity_tag("user", user["id"], user.get("version", 1))
+        )
+
         # Check whether the current user is following the profile owner
         is_following = False
         # TODO: Implement follow check via the Follows model
@@ -31,22 +61,70 @@ class UserService:
             birth_date=user.get("birth_date"),
             is_verified=user.get("is_verified", False),
             is_admin=user.get("is_admin", False),
+            version=user.get("version", 1),
             is_following=is_following
         )
     
     @staticmethod
-    async def update_profile(user_id: int, current_user_id: int, user_data: UserUpdateSchema) -> UserSchema:
-        """Updates a user profile (only their own profile)"""
+    async def update_profile(
+        user_id: int,
+        current_user_id: int,
+        user_data: UserUpdateSchema,
+        if_match: str | None = None,
+    ) -> UserSchema:
+        """Updates a user profile (only their own profile)
+
+        Only the fields sent are written, in one statement that also returns
+        the stored profile; with If-Match, only the version the client read.
+        """
         if user_id != current_user_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You do not have permission to edit this profile"
             )
-        
-        # Profile update (need to add a method in UsersDBClient)
-        # For now, return the existing profile
-        return await UserService.get_user_profile(user_id, current_user_id)
+
+        version = if_match_version(if_match, "user", user_id)
+        try:
+            user = await UsersDBClient.update_user(
+                user_id,
+                user_data.model_dump(mode="json", exclude_unset=True),
+                version=version,
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == status.HTTP_404_NOT_FOUND:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found"
+                )
+            if e.response.status_code == status.HTTP_409_CONFLICT:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Username is already taken"
+                )
+            if e.response.status_code == status.HTTP_412_PRECONDITION_FAILED:
+                raise PreconditionFailed("Profile has changed since it was read")
+            raise
+
+        await cache.invalidate(f"user:{user_id}")
+        return UserSchema(
+            id=user["id"],
+            username=user["username"],
+            avatar_url=user.get("avatar_url"),
+            email=user["email"],
+            created_at=user["created_at"],
+            disactivated_at=user.get("disactivated_at"),
+            birth_date=user.get("birth_date"),
+            is_verified=user.get("is_verified", False),
+            is_admin=user.get("is_admin", False),
+            version=user.get("version", 1)
+        )
     
+    @staticmethod
+    async def get_follow_counts(user_id: int) -> FollowCountsSchema:
+        """Retrieves a user's follower and following counters"""
+        counts = await UsersDBClient.get_follow_counts(user_id)
+        return FollowCountsSchema(**counts)
+
     @staticmethod
     async def search_users(query: str, limit: int = 20, offset: int = 0) -> List[UserSchema]:
         """Searches users"""
@@ -62,7 +140,8 @@ class UserService:
                 disactivated_at=user.get("disactivated_at"),
                 birth_date=user.get("birth_date"),
                 is_verified=user.get("is_verified", False),
-                is_admin=user.get("is_admin", False)
+                is_admin=user.get("is_admin", False),
+                version=user.get("version", 1)
             ))
         return result
 